@@ -0,0 +1,58 @@
+"""Benchmarks and load tests for the levelup API
+
+Run them from the repository root as modules, eg.
+
+    python -m benchmarks.signup_load --gamers 300 --seats 50
+
+Every script works on a throwaway test database created with Django's test database machinery
+(a temporary SQLite file when DATABASES uses SQLite), so db.sqlite3 is never touched.
+"""
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+
+def setup():
+    """Configure Django for a standalone script"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'levelup.settings')
+    # levelup.settings reads the secret key from the environment
+    os.environ.setdefault('SECRET_KEY', 'benchmarks')
+    import django  # pylint: disable=import-outside-toplevel
+    django.setup()
+    # Expected 4xx responses would otherwise print a warning per request
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+
+@contextmanager
+def bench_database():
+    """Create a test database, point every connection (in every thread) at it, and drop it afterwards"""
+    from django.db import connection  # pylint: disable=import-outside-toplevel
+    from django.test.utils import setup_test_environment, teardown_test_environment  # pylint: disable=import-outside-toplevel
+
+    setup_test_environment()
+    tmp_dir = None
+    if connection.vendor == 'sqlite':
+        # A file, not the default in-memory database, so worker threads share it;
+        # and a long busy timeout so concurrent writers wait for the lock instead of failing
+        tmp_dir = tempfile.mkdtemp(prefix='levelup-bench-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmp_dir, 'bench.sqlite3')
+        connection.settings_dict.setdefault('OPTIONS', {})['timeout'] = 60
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
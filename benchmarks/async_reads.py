@@ -0,0 +1,164 @@
+"""Benchmark: read throughput of the sync ViewSets under WSGI and ASGI, and of the async read views
+
+    python -m benchmarks.async_reads --concurrency 200 --requests 2000
+
+Sends --requests GET requests (a mix of /games, /games/<id>, /events, /events/<id>, /gameTypes
+and /profile), --concurrency of them in flight at once, to the app three ways, all in this
+process without an HTTP server in front:
+
+    wsgi        the WSGI handler, from a pool of --concurrency threads, like a threaded server
+    asgi-sync   the ASGI app with ASYNC_READ_VIEWS = False: the ViewSets, one at a time on
+                Django's thread for sync code
+    asgi-async  the ASGI app with the async read views (levelupapi/views/asynchronous.py)
+
+and reports requests per second and the latency percentiles of each.
+"""
+import argparse
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks import bench_database, percentile, setup
+
+PATHS = ['/games', '/games/{game}', '/events', '/events/{event}', '/gameTypes', '/profile']
+
+
+def seed(gamers, games, events):
+    """Gamers with tokens, and games and events for them to read. Returns the token keys"""
+    # pylint: disable=import-outside-toplevel
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+    from levelupapi.models import Event, Game, Gamer, Gametype, Status
+
+    # Created one by one: bulk_create doesn't set primary keys on SQLite
+    users = [User.objects.create(username=f'reader{i}', first_name='Bench', last_name=str(i), password='!')
+             for i in range(gamers)]
+    players = [Gamer.objects.create(user=user, bio='') for user in users]
+    tokens = [Token.objects.create(user=user) for user in users]
+
+    gametypes = [Gametype.objects.create(label=label) for label in ('Board game', 'Card game', 'Dice game')]
+    status_open = Status.objects.create(title='Open')
+    rows = [Game.objects.create(name=f'Game {i}', player_limit=6, gametype=gametypes[i % 3],
+                                created_by=players[i % gamers]) for i in range(games)]
+    Event.objects.bulk_create(
+        Event(name=f'Night {i}', time='2021-04-20T08:00:00Z', host=players[i % gamers],
+              game=rows[i % games], status=status_open)
+        for i in range(events))
+    return [token.key for token in tokens]
+
+
+def workload(tokens, requests, games, events):
+    """(path, token) of every request to send"""
+    return [
+        (PATHS[i % len(PATHS)].format(game=1 + i % games, event=1 + i % events), tokens[i % len(tokens)])
+        for i in range(requests)
+    ]
+
+
+def run_wsgi(requests, concurrency):
+    # pylint: disable=import-outside-toplevel
+    from django.core.handlers.wsgi import WSGIHandler
+
+    handler = WSGIHandler()
+
+    def call(request):
+        path, token = request
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', 'HTTP_HOST': 'testserver',
+                   'HTTP_AUTHORIZATION': f'Token {token}', 'wsgi.input': io.BytesIO()}
+        setup_testing_defaults(environ)
+        started = time.perf_counter()
+        statuses = []
+        body = b''.join(handler(environ, lambda status, headers: statuses.append(status)))
+        return time.perf_counter() - started, statuses[0], len(body)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(call, requests))
+
+
+async def run_asgi(requests, concurrency):
+    # pylint: disable=import-outside-toplevel
+    from levelup.asgi import application
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def call(request):
+        path, token = request
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'query_string': b'', 'server': ('testserver', 80),
+            'client': ('127.0.0.1', 0), 'headers': [(b'authorization', f'Token {token}'.encode())],
+        }
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        async with limit:
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            elapsed = time.perf_counter() - started
+        status = sent[0]['status']
+        return elapsed, status, sum(len(message.get('body', b'')) for message in sent[1:])
+
+    return await asyncio.gather(*(call(request) for request in requests))
+
+
+def summarize(mode, results, wall):
+    latencies = [elapsed for elapsed, _, _ in results]
+    errors = sum(1 for _, status, _ in results if not str(status).startswith('200'))
+    return {
+        'mode': mode,
+        'requests_per_second': round(len(results) / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'errors': errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=200, help='requests in flight at once')
+    parser.add_argument('--requests', type=int, default=2000, help='requests sent in each mode')
+    parser.add_argument('--gamers', type=int, default=50)
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    setup()
+    # pylint: disable=import-outside-toplevel
+    from django.test import override_settings
+
+    results = []
+    with bench_database():
+        tokens = seed(args.gamers, args.games, args.events)
+        requests = workload(tokens, args.requests, args.games, args.events)
+
+        started = time.perf_counter()
+        outcome = run_wsgi(requests, args.concurrency)
+        results.append(summarize('wsgi', outcome, time.perf_counter() - started))
+
+        for mode, enabled in (('asgi-sync', False), ('asgi-async', True)):
+            with override_settings(ASYNC_READ_VIEWS=enabled):
+                started = time.perf_counter()
+                outcome = asyncio.run(run_asgi(requests, args.concurrency))
+                results.append(summarize(mode, outcome, time.perf_counter() - started))
+
+    for result in results:
+        print('  '.join(f'{key}={value}' for key, value in result.items()))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Micro-benchmark: rendering the /events response with djangorestframework_camel_case and levelupapi.camel_case
+
+    python -m benchmarks.camel_case --events 10000
+
+Generates --events events (levelupapi/synthetic.py), GETs /events once for the serialized data
+of the whole list, then renders that data --repeat times with:
+
+    library          djangorestframework_camel_case's CamelCaseJSONRenderer
+    memoized         levelupapi.camel_case.CamelCaseJSONRenderer, with the json module
+    memoized+orjson  the same with orjson (skipped when it isn't installed)
+
+checking they all give the same bytes, and reports the median time of each. It then times the
+whole GET /events request the way it's served now, with orjson on and off.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from benchmarks import bench_database, setup
+
+
+def timed(function, repeat):
+    """Median seconds of `repeat` calls, and the last result"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=10000, help='events in the /events list')
+    parser.add_argument('--repeat', type=int, default=10, help='renders (and requests) timed per renderer')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    setup()
+    # pylint: disable=import-outside-toplevel
+    from django.test import Client, override_settings
+    from djangorestframework_camel_case.render import CamelCaseJSONRenderer as LibraryRenderer
+    from rest_framework.authtoken.models import Token
+    from levelupapi import camel_case
+    from levelupapi.synthetic import generate
+
+    results = {}
+    with bench_database(), override_settings(DEBUG=False, PROFILE_CACHE_TIMEOUT=0):
+        generate(gamers=max(args.events // 100, 1), games=max(args.events // 10, 1), events=args.events)
+        client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.first().key}')
+        data = client.get('/events').data
+        print(f'/events: {len(data)} events')
+
+        renderers = {'library': (LibraryRenderer(), False), 'memoized': (camel_case.CamelCaseJSONRenderer(), False)}
+        if camel_case.orjson is not None:
+            renderers['memoized+orjson'] = (camel_case.CamelCaseJSONRenderer(), True)
+        expected = None
+        for name, (renderer, fast) in renderers.items():
+            with override_settings(FAST_JSON_ENCODER=fast):
+                seconds, body = timed(lambda: renderer.render(data), args.repeat)
+            expected = expected or body
+            assert body == expected, f'{name} rendered different bytes'
+            results[name] = {'render_ms': round(seconds * 1000, 1)}
+        for name, result in results.items():
+            result['speedup'] = round(results['library']['render_ms'] / result['render_ms'], 1)
+            print(f'{name:>16}: render {result["render_ms"]:>8} ms  {result["speedup"]}x')
+
+        for fast in (False, True) if camel_case.orjson is not None else (False,):
+            with override_settings(FAST_JSON_ENCODER=fast):
+                seconds, response = timed(lambda: client.get('/events'), args.repeat)
+            assert response.status_code == 200
+            name = 'GET /events' + (' (orjson)' if fast else '')
+            results[name] = {'request_ms': round(seconds * 1000, 1), 'kb': round(len(response.content) / 1024)}
+            print(f'{name:>20}: {results[name]["request_ms"]:>8} ms  {results[name]["kb"]} KB')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
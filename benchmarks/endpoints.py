@@ -0,0 +1,222 @@
+"""Benchmark suite: the main read endpoints at several dataset sizes, saved to compare commits
+
+    python -m benchmarks.endpoints --scales 10000,100000 --output before.json
+    python -m benchmarks.endpoints --scales 10000,100000 --compare before.json
+
+At each scale (a number of events, with a tenth as many games and a hundredth as many gamers)
+the database is grown with the synthetic data generator (levelupapi/synthetic.py), then every
+endpoint below is requested --repeat times through the Django test client, as the most active
+gamer, with DEBUG and the profile cache off:
+
+    events            /events?pageSize=50
+    events by game    /events?gameId=<a game>&pageSize=50
+    events hosted     /events?host=me&pageSize=50
+    games             /games (every game)
+    games page        /games?pageSize=50
+    game              /games/<a game>
+    profile           /profile
+    usergames report  /reports/usergames (every game, as HTML)
+
+For each one it records the latency percentiles, the queries per request, the peak memory
+allocated while serving one request (traced separately, tracemalloc slows things down) and the
+response size. The report reads a SQLite database through its own connection
+(levelupreports/views/connection.py), so its queries aren't counted there. --output writes them to a JSON file, --compare prints the change from an
+earlier one, and exits with an error when a p50 grew more than --max-slowdown times.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks import bench_database, percentile, setup
+
+ENDPOINTS = {
+    'events': lambda ctx: '/events?pageSize=50',
+    'events by game': lambda ctx: f'/events?gameId={ctx.game()}&pageSize=50',
+    'events hosted': lambda ctx: '/events?host=me&pageSize=50',
+    'games': lambda ctx: '/games',
+    'games page': lambda ctx: '/games?pageSize=50',
+    'game': lambda ctx: f'/games/{ctx.game()}',
+    'profile': lambda ctx: '/profile',
+    'usergames report': lambda ctx: '/reports/usergames',
+}
+
+
+class Context:
+    """What the URLs are built from"""
+
+    def __init__(self, game_ids):
+        self.game_ids = game_ids
+        self.rng = random.Random(7)
+
+    def game(self):
+        return self.rng.choice(self.game_ids)
+
+
+def grow(events, seed):
+    """Generate data until there are `events` events, with a tenth as many games and a hundredth as many gamers"""
+    # pylint: disable=import-outside-toplevel
+    from levelupapi.models import Event, Game, Gamer
+    from levelupapi.synthetic import generate
+
+    return generate(
+        gamers=max(events // 100 - Gamer.objects.count(), 0),
+        games=max(events // 10 - Game.objects.count(), 0),
+        events=max(events - Event.objects.count(), 0),
+        seed=seed)
+
+
+def most_active_gamer():
+    """Token key of the gamer hosting the most events"""
+    # pylint: disable=import-outside-toplevel
+    from django.db.models import Count
+    from rest_framework.authtoken.models import Token
+    from levelupapi.models import Gamer
+
+    gamer = Gamer.objects.annotate(hosted=Count('hosting_events')).order_by('-hosted').first()
+    return Token.objects.get(user_id=gamer.user_id).key
+
+
+def measure(client, url_for, repeat):
+    # pylint: disable=import-outside-toplevel
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    def get():
+        url = url_for()
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        # A streamed response does its work as it is read
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    get()  # warm up the caches and the code paths
+
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        get()
+        latencies.append(time.perf_counter() - started)
+
+    # Each request empties the query log, so it has to start empty too
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        body = get()
+    query_count = len(queries)
+
+    tracemalloc.start()
+    get()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'queries': query_count,
+        'peak_kb': round(peak / 1024, 1),
+        'response_kb': round(len(body) / 1024, 1),
+    }
+
+
+def metadata(args):
+    # pylint: disable=import-outside-toplevel
+    import django
+    from django.db import connection
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'repeat': args.repeat,
+        'seed': args.seed,
+    }
+
+
+def compare(results, baseline, max_slowdown):
+    """Print the change of every endpoint against an earlier run. Returns the regressions"""
+    regressions = []
+    print(f'\ncompared with {baseline["meta"].get("commit")} ({baseline["meta"].get("created")}):')
+    for scale, endpoints in results.items():
+        for name, now in endpoints.items():
+            before = baseline['results'].get(scale, {}).get(name)
+            if before is None:
+                continue
+            ratio = now['p50_ms'] / max(before['p50_ms'], 1e-6)
+            line = (f'{scale:>10}  {name:<17} p50 {before["p50_ms"]:>9} -> {now["p50_ms"]:>9} ms ({ratio:.2f}x)'
+                    f'  queries {before["queries"]} -> {now["queries"]}')
+            if max_slowdown and ratio > max_slowdown:
+                regressions.append(line)
+                line += '  SLOWER'
+            print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='10000,100000', help='comma separated event counts')
+    parser.add_argument('--repeat', type=int, default=20, help='timed requests per endpoint and scale')
+    parser.add_argument('--endpoints', help=f'comma separated subset of: {", ".join(ENDPOINTS)}')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the generated data')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+    parser.add_argument('--max-slowdown', type=float, default=0,
+                        help='with --compare, fail when a p50 grew more than this many times (eg. 1.25)')
+    args = parser.parse_args(argv)
+    scales = sorted(int(scale) for scale in args.scales.split(','))
+    names = [name.strip() for name in args.endpoints.split(',')] if args.endpoints else list(ENDPOINTS)
+    unknown = set(names) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f'unknown endpoints: {", ".join(sorted(unknown))}')
+
+    setup()
+    # pylint: disable=import-outside-toplevel
+    from django.test import Client, override_settings
+    from levelupapi.models import Game
+
+    results = {}
+    # DEBUG would log every query, which is slower and grows memory
+    with bench_database(), override_settings(DEBUG=False, PROFILE_CACHE_TIMEOUT=0):
+        meta = metadata(args)
+        for scale in scales:
+            started = time.perf_counter()
+            grow(scale, args.seed + scale)
+            print(f'{scale:>10} events: generated in {time.perf_counter() - started:.1f}s')
+
+            client = Client(HTTP_AUTHORIZATION=f'Token {most_active_gamer()}')
+            context = Context(list(Game.objects.values_list('id', flat=True)))
+            results[str(scale)] = {}
+            for name in names:
+                timing = measure(client, lambda: ENDPOINTS[name](context), args.repeat)
+                results[str(scale)][name] = timing
+                print(f'{scale:>10}  {name:<17} p50 {timing["p50_ms"]:>9} ms  p95 {timing["p95_ms"]:>9} ms'
+                      f'  {timing["queries"]:>3} queries  peak {timing["peak_kb"]:>9} KB'
+                      f'  {timing["response_kb"]:>9} KB sent')
+
+    document = {'meta': meta, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(document, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline), args.max_slowdown)
+        if regressions:
+            print(f'FAIL: {len(regressions)} endpoints more than {args.max_slowdown}x slower', file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
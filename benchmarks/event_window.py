@@ -0,0 +1,156 @@
+"""Benchmark: /events time-window queries as the events table grows
+
+    python -m benchmarks.event_window --scales 10000,100000,1000000
+
+At each scale the events table is grown with bulk inserts, then these requests are timed:
+
+    game window  /events?gameId=<random game>&from=<day>&to=<day + 7>
+    host page    /events?host=me&pageSize=20
+    status page  /events?status=1&from=<day>&pageSize=20
+
+With the (column, time) indexes on Event the latency should stay roughly flat while the table
+grows 100x; the query plans are printed so a missing index (a SCAN instead of a SEARCH) shows.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks import bench_database, percentile, setup
+
+START = datetime(2021, 1, 1, tzinfo=timezone.utc)
+GAMERS = 1000
+GAMES = 1000
+
+
+def seed_base():
+    """Gamers, games and statuses the events point at. Returns (tokens, game ids, status ids)"""
+    # pylint: disable=import-outside-toplevel
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+    from levelupapi.models import Game, Gamer, Gametype, Status
+
+    User.objects.bulk_create([User(username=f'bench{i}', password='!') for i in range(GAMERS)])
+    users = list(User.objects.order_by('id'))
+    Gamer.objects.bulk_create([Gamer(user=user, bio='') for user in users])
+    Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+    gamer_ids = list(Gamer.objects.order_by('id').values_list('id', flat=True))
+
+    gametype = Gametype.objects.create(label='Board game')
+    Game.objects.bulk_create([
+        Game(name=f'Game {i}', player_limit=8, created_by_id=random.choice(gamer_ids), gametype=gametype)
+        for i in range(GAMES)
+    ])
+    Status.objects.bulk_create([Status(title=title) for title in ('Open', 'Full', 'Cancelled')])
+
+    tokens = list(Token.objects.filter(user__gamer__id__in=gamer_ids[:10]).values_list('key', flat=True))
+    return (tokens,
+            list(Game.objects.values_list('id', flat=True)),
+            list(Status.objects.values_list('id', flat=True)),
+            gamer_ids)
+
+
+def grow_events(total, game_ids, status_ids, gamer_ids, batch=10000):
+    """Bulk insert events until there are `total`, spread over a year"""
+    # pylint: disable=import-outside-toplevel
+    from levelupapi.models import Event
+
+    count = Event.objects.count()
+    while count < total:
+        size = min(batch, total - count)
+        Event.objects.bulk_create([
+            Event(
+                name=f'Event {count + i}',
+                time=START + timedelta(minutes=random.randrange(365 * 24 * 60)),
+                game_id=random.choice(game_ids),
+                host_id=random.choice(gamer_ids),
+                status_id=random.choice(status_ids),
+            ) for i in range(size)
+        ], batch_size=batch)
+        count += size
+
+
+def measure(client, urls, repeat):
+    latencies = []
+    for _ in range(repeat):
+        url = urls()
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, (url, response.status_code)
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+    }
+
+
+def query_plans(game_id, status_id, gamer_id):
+    # pylint: disable=import-outside-toplevel
+    from levelupapi.models import Event
+
+    day = START + timedelta(days=100)
+    window = Event.objects.filter(game_id=game_id, time__gte=day, time__lt=day + timedelta(days=7)).order_by('time', 'id')
+    hosted = Event.objects.filter(host_id=gamer_id).order_by('time', 'id')[:21]
+    by_status = Event.objects.filter(status_id=status_id, time__gte=day).order_by('time', 'id')[:21]
+    return {
+        'game window': window.explain(),
+        'host page': hosted.explain(),
+        'status page': by_status.explain(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='10000,100000,1000000', help='comma separated event counts')
+    parser.add_argument('--repeat', type=int, default=50, help='requests timed per query and scale')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+    scales = sorted(int(scale) for scale in args.scales.split(','))
+
+    setup()
+    # pylint: disable=import-outside-toplevel
+    from django.test import Client
+
+    random.seed(42)
+    results = {}
+    with bench_database():
+        tokens, game_ids, status_ids, gamer_ids = seed_base()
+        client = Client(HTTP_AUTHORIZATION=f'Token {tokens[0]}')
+
+        def random_day():
+            return (START + timedelta(days=random.randrange(358))).date()
+
+        queries = {
+            'game window': lambda: (
+                f'/events?gameId={random.choice(game_ids)}'
+                f'&from={random_day()}&to={random_day() + timedelta(days=7)}'),
+            'host page': lambda: '/events?host=me&pageSize=20',
+            'status page': lambda: f'/events?status={random.choice(status_ids)}&from={random_day()}&pageSize=20',
+        }
+
+        for scale in scales:
+            grow_events(scale, game_ids, status_ids, gamer_ids)
+            results[scale] = {name: measure(client, urls, args.repeat) for name, urls in queries.items()}
+            for name, timing in results[scale].items():
+                print(f'{scale:>10} events  {name:<12} p50 {timing["p50_ms"]:>8} ms  p95 {timing["p95_ms"]:>8} ms')
+
+        for name, plan in query_plans(game_ids[0], status_ids[0], gamer_ids[0]).items():
+            print(f'\n{name}:\n{plan}')
+
+    smallest, largest = scales[0], scales[-1]
+    if smallest != largest:
+        print(f'\ntable grew {largest / smallest:.0f}x:')
+        for name in queries:
+            ratio = results[largest][name]['p50_ms'] / max(results[smallest][name]['p50_ms'], 1e-6)
+            print(f'  {name:<12} p50 grew {ratio:.1f}x')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
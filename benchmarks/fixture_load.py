@@ -0,0 +1,109 @@
+"""Benchmark: loading a large fixture with loaddata and with bulk_loaddata
+
+    python -m benchmarks.fixture_load --events 100000
+
+Generates a dataset (levelupapi/synthetic.py: --events events, a tenth as many games and a
+hundredth as many gamers), dumps it to a JSON fixture with dumpdata, and loads it into the
+emptied database with `manage.py loaddata` and with `manage.py bulk_loaddata`, reporting the
+time and rows per second of each. With --memory the loads are run again under tracemalloc
+for their peak memory (that run is slower, its times aren't reported). --skip-loaddata only
+runs bulk_loaddata, eg. for a million events, where loaddata takes very long.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+
+from benchmarks import bench_database, setup
+
+# What the fixture holds: the tables the generator fills
+MODELS = ['auth.user', 'authtoken.token', 'levelupapi.gametype', 'levelupapi.status',
+          'levelupapi.gamer', 'levelupapi.game', 'levelupapi.event']
+
+
+def empty():
+    # pylint: disable=import-outside-toplevel
+    from django.core.management import call_command
+
+    call_command('flush', interactive=False, verbosity=0)
+
+
+def loaders(path):
+    # pylint: disable=import-outside-toplevel
+    from django.core.management import call_command
+
+    return {
+        'loaddata': lambda: call_command('loaddata', path, verbosity=0),
+        'bulk_loaddata': lambda: call_command('bulk_loaddata', path, stdout=StringIO()),
+    }
+
+
+def row_count():
+    # pylint: disable=import-outside-toplevel
+    from django.apps import apps
+
+    return sum(apps.get_model(label).objects.count() for label in MODELS) + \
+        apps.get_model('levelupapi.gamer').signed_up_events.through.objects.count()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=100000, help='events in the fixture')
+    parser.add_argument('--memory', action='store_true', help='also measure the peak memory of each load')
+    parser.add_argument('--skip-loaddata', action='store_true', help='only time bulk_loaddata')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    setup()
+    # pylint: disable=import-outside-toplevel
+    from django.core.management import call_command
+    from django.test import override_settings
+    from levelupapi.synthetic import generate
+
+    results = {}
+    tmp_dir = tempfile.mkdtemp(prefix='levelup-fixture-')
+    path = os.path.join(tmp_dir, 'dataset.json')
+    # DEBUG would log every query
+    with bench_database(), override_settings(DEBUG=False):
+        generate(gamers=max(args.events // 100, 1), games=max(args.events // 10, 1), events=args.events)
+        rows = row_count()
+        call_command('dumpdata', *MODELS, output=path, verbosity=0)
+        results['rows'] = rows
+        results['fixture_mb'] = round(os.path.getsize(path) / 1024 / 1024, 1)
+        print(f'fixture: {rows} rows (sign-ups included), {results["fixture_mb"]} MB')
+
+        for name, run in loaders(path).items():
+            if name == 'loaddata' and args.skip_loaddata:
+                continue
+            empty()
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            assert row_count() == rows, (name, row_count(), rows)
+            results[name] = {'seconds': round(elapsed, 2), 'rows_per_second': round(rows / elapsed)}
+
+            if args.memory:
+                empty()
+                tracemalloc.start()
+                run()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                results[name]['peak_mb'] = round(peak / 1024 / 1024, 1)
+            print(f'{name:>14}: ' + '  '.join(f'{key}={value}' for key, value in results[name].items()))
+
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    if 'loaddata' in results:
+        print(f'bulk_loaddata is {results["loaddata"]["seconds"] / results["bulk_loaddata"]["seconds"]:.1f}x faster')
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
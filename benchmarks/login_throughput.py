@@ -0,0 +1,96 @@
+"""Benchmark: registrations and logins per second per core, for each password hasher
+
+    python -m benchmarks.login_throughput --users 20 --logins 100
+
+Requests go through /register and /login one at a time on a single thread, so the rates are
+per core. `per_cpu_second` divides by the CPU time the process used, which leaves out waiting on
+the database. The argon2 run is skipped when argon2-cffi isn't installed.
+"""
+import argparse
+import json
+import sys
+import time
+
+from benchmarks import bench_database, setup
+
+HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'levelupapi.hashers.TunedArgon2PasswordHasher',
+}
+
+
+def timed(calls):
+    """Run every call, return (wall seconds, cpu seconds)"""
+    wall, cpu = time.perf_counter(), time.process_time()
+    for call in calls:
+        call()
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+def run(name, users, logins):
+    # pylint: disable=import-outside-toplevel
+    from django.conf import settings
+    from django.test import Client, override_settings
+
+    # The hasher under test goes first: it hashes new passwords
+    hashers = [HASHERS[name]] + [path for path in settings.PASSWORD_HASHERS if path != HASHERS[name]]
+    client = Client()
+
+    def register(i):
+        return lambda: client.post('/register', {
+            'username': f'{name}{i}', 'password': 'Admin8*', 'email': f'{name}{i}@example.com',
+            'first_name': 'Bench', 'last_name': str(i), 'bio': '',
+        }, content_type='application/json')
+
+    def login(i):
+        return lambda: client.post('/login', {
+            'username': f'{name}{i % users}', 'password': 'Admin8*',
+        }, content_type='application/json')
+
+    with override_settings(PASSWORD_HASHERS=hashers):
+        register_wall, register_cpu = timed(register(i) for i in range(users))
+        login_wall, login_cpu = timed(login(i) for i in range(logins))
+
+    return {
+        'hasher': hashers[0],
+        'registrations_per_second': round(users / register_wall, 1),
+        'logins_per_second': round(logins / login_wall, 1),
+        'logins_per_cpu_second': round(logins / login_cpu, 1) if login_cpu else None,
+        'registrations_per_cpu_second': round(users / register_cpu, 1) if register_cpu else None,
+    }
+
+
+def argon2_available():
+    try:
+        import argon2  # pylint: disable=import-outside-toplevel,unused-import
+        return True
+    except ImportError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='gamers registered per hasher')
+    parser.add_argument('--logins', type=int, default=100, help='logins per hasher')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    setup()
+    results = {}
+    with bench_database():
+        for name in HASHERS:
+            if name == 'argon2' and not argon2_available():
+                print('argon2: skipped, pip install argon2-cffi to include it')
+                continue
+            results[name] = run(name, args.users, args.logins)
+            for key, value in results[name].items():
+                print(f'{name}: {key:>28}: {value}')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
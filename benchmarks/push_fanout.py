@@ -0,0 +1,134 @@
+"""Benchmark: thousands of idle /events/stream subscribers in one process
+
+    python -m benchmarks.push_fanout --subscribers 5000 --messages 150
+
+Opens --subscribers streams on the ASGI app (levelup/asgi.py) in a single event loop, without an
+HTTP server in front, and reports the memory each idle stream holds. Then it publishes --messages
+event changes from another thread, the way the sync views do, and times how long each takes to
+reach every stream. One subscriber never reads (its send blocks), to show that it neither holds
+up the others nor buffers more than PUSH_MAX_PENDING messages.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+from benchmarks import bench_database, percentile, setup
+
+
+def seed():
+    """A gamer with a token. Returns the token key"""
+    # pylint: disable=import-outside-toplevel
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+    from levelupapi.models import Gamer
+
+    user = User.objects.create(username='subscriber', password='!')
+    Gamer.objects.create(user=user, bio='')
+    return Token.objects.create(user=user).key
+
+
+async def run(token, subscribers, messages):
+    # pylint: disable=import-outside-toplevel
+    from levelup.asgi import application
+    from levelupapi.push import broker, get_backend
+
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': '/events/stream', 'query_string': b'',
+        'headers': [(b'authorization', f'Token {token}'.encode())],
+    }
+    disconnect = asyncio.Event()
+    received = [0] * subscribers
+    # message number -> how many of the reading subscribers got it, and when the last one did
+    delivered = {}
+    all_received = {}
+    stuck = asyncio.Event()
+
+    async def receive():
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    def sender(index):
+        async def send(message):
+            body = message.get('body', b'')
+            if body.startswith(b'id: '):
+                if index == 0:
+                    # The slow client: never takes its first message
+                    await stuck.wait()
+                received[index] += 1
+                count = received[index]
+                delivered[count] = delivered.get(count, 0) + 1
+                if delivered[count] == subscribers - 1:
+                    all_received[count] = time.perf_counter()
+        return send
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(application(scope, receive, sender(i))) for i in range(subscribers)]
+    while len(broker) < subscribers:
+        await asyncio.sleep(0.01)
+    opened = time.perf_counter() - started
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    memory = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+    # Publish from another thread, like a sync view committing a sign-up
+    backend = get_backend()
+    latencies = []
+    for i in range(messages):
+        published = time.perf_counter()
+        thread = threading.Thread(target=backend.publish, args=({
+            'type': 'event', 'action': 'attendance', 'id': i, 'attendeeCount': 1, 'playerLimit': 6,
+        },))
+        thread.start()
+        while i + 1 not in all_received:
+            await asyncio.sleep(0.0005)
+        latencies.append(all_received[i + 1] - published)
+        thread.join()
+
+    # pylint: disable=protected-access
+    subscriptions = [subscription for group in broker._subscriptions.values() for subscription in group]
+    pending = max(len(subscription.pending) for subscription in subscriptions)
+    overflowed = sum(subscription.overflowed for subscription in subscriptions)
+
+    disconnect.set()
+    stuck.set()
+    await asyncio.gather(*tasks)
+
+    return {
+        'subscribers': subscribers,
+        'open_seconds': round(opened, 3),
+        'bytes_per_idle_subscriber': round(memory / subscribers),
+        'fanout_p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'fanout_p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'most_buffered_messages': pending,
+        'overflowed_subscribers': overflowed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=5000, help='streams held open at once')
+    parser.add_argument('--messages', type=int, default=150, help='event changes published to all of them')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    setup()
+    with bench_database():
+        token = seed()
+        results = asyncio.run(run(token, args.subscribers, args.messages))
+
+    for key, value in results.items():
+        print(f'{key:>28}: {value}')
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
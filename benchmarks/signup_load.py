@@ -0,0 +1,116 @@
+"""Load test: hundreds of gamers signing up for the same event at once
+
+    python -m benchmarks.signup_load --gamers 300 --seats 50 --workers 32
+
+Every gamer POSTs /events/<id>/signup from a pool of threads. The run fails (exit code 1) if the
+event ends up with more attendees than seats, if the stored attendee_count disagrees with the
+join table, if any request errors, or if throughput is below --min-throughput requests/second.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import bench_database, percentile, setup
+
+
+def seed(gamers, seats):
+    """One event whose game has `seats` seats, and `gamers` gamers with tokens. Returns (event, tokens)"""
+    # pylint: disable=import-outside-toplevel
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+    from levelupapi.models import Event, Game, Gamer, Gametype, Status
+
+    User.objects.bulk_create([
+        User(username=f'bench{i}', password='!') for i in range(gamers + 1)
+    ])
+    users = list(User.objects.filter(username__startswith='bench').order_by('id'))
+    Gamer.objects.bulk_create([Gamer(user=user, bio='') for user in users])
+    Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+
+    host = Gamer.objects.get(user=users[0])
+    game = Game.objects.create(
+        name='Crowded game', player_limit=seats, created_by=host,
+        gametype=Gametype.objects.create(label='Board game'))
+    event = Event.objects.create(
+        name='Launch party', time='2021-04-20T08:00:00Z', host=host, game=game,
+        status=Status.objects.create(title='Open for signing up'))
+
+    tokens = list(Token.objects.filter(user__in=users[1:]).values_list('key', flat=True))
+    return event, tokens
+
+
+def run(gamers, seats, workers):
+    # pylint: disable=import-outside-toplevel
+    from django.db import connections
+    from django.test import Client
+    from levelupapi.models import Event
+
+    event, tokens = seed(gamers, seats)
+    url = f'/events/{event.id}/signup'
+
+    def sign_up(token):
+        try:
+            started = time.perf_counter()
+            response = Client().post(url, HTTP_AUTHORIZATION=f'Token {token}')
+            return response.status_code, time.perf_counter() - started
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(sign_up, tokens))
+    elapsed = time.perf_counter() - started
+
+    event = Event.objects.get(pk=event.id)
+    latencies = [latency for _, latency in outcomes]
+    return {
+        'requests': len(outcomes),
+        'joined': sum(1 for code, _ in outcomes if code == 201),
+        'full': sum(1 for code, _ in outcomes if code == 400),
+        'errors': sum(1 for code, _ in outcomes if code not in (201, 400)),
+        'attendees': event.signed_up_by.count(),
+        'attendee_count': event.attendee_count,
+        'seats': seats,
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(outcomes) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--gamers', type=int, default=300, help='gamers trying to sign up')
+    parser.add_argument('--seats', type=int, default=50, help="the game's player_limit")
+    parser.add_argument('--workers', type=int, default=32, help='concurrent requests')
+    parser.add_argument('--min-throughput', type=float, default=0, help='fail below this many requests/second')
+    args = parser.parse_args(argv)
+
+    setup()
+    with bench_database():
+        result = run(args.gamers, args.seats, args.workers)
+
+    for key, value in result.items():
+        print(f'{key:>15}: {value}')
+
+    expected = min(args.seats, args.gamers)
+    problems = []
+    if result['attendees'] > args.seats:
+        problems.append(f"overbooked: {result['attendees']} attendees for {args.seats} seats")
+    if result['attendees'] != expected or result['joined'] != expected:
+        problems.append(f"expected {expected} sign-ups, got {result['joined']} (rows: {result['attendees']})")
+    if result['attendee_count'] != result['attendees']:
+        problems.append(f"attendee_count {result['attendee_count']} != {result['attendees']} rows")
+    if result['errors']:
+        problems.append(f"{result['errors']} requests failed")
+    if result['throughput'] < args.min_throughput:
+        problems.append(f"throughput {result['throughput']}/s is below {args.min_throughput}/s")
+
+    for problem in problems:
+        print(f'FAIL: {problem}', file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,6 +2,7 @@
 ASGI config for levelup project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+/events/stream is served by the live updates app (levelupapi/push.py), everything else by Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -13,4 +14,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'levelup.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up, it uses the models and settings
+from levelupapi.push import STREAM_PATH, event_stream  # noqa: E402 pylint: disable=wrong-import-position
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        await event_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
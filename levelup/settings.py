@@ -46,7 +46,8 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication that also sets request.gamer, see levelupapi/authentication.py
+        'levelupapi.authentication.GamerTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -54,17 +55,18 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 10,
     
-    # for rendering camelCase in the ❗️Json response❗️ sent back to the client:
+    # for rendering camelCase in the ❗️Json response❗️ sent back to the client
+    # (levelupapi/camel_case.py: the djangorestframework_camel_case classes, with memoized keys):
     'DEFAULT_RENDERER_CLASSES': (
-        'djangorestframework_camel_case.render.CamelCaseJSONRenderer',
-        'djangorestframework_camel_case.render.CamelCaseBrowsableAPIRenderer',
+        'levelupapi.camel_case.CamelCaseJSONRenderer',
+        'levelupapi.camel_case.CamelCaseBrowsableAPIRenderer',
         # Any other renders
     ),
     'DEFAULT_PARSER_CLASSES': (
         # If you use MultiPartFormParser or FormParser, we also have a camel case version
         'djangorestframework_camel_case.parser.CamelCaseFormParser',
         'djangorestframework_camel_case.parser.CamelCaseMultiPartParser',
-        'djangorestframework_camel_case.parser.CamelCaseJSONParser',
+        'levelupapi.camel_case.CamelCaseJSONParser',
         # Any other parsers
     ),
 }
@@ -78,6 +80,10 @@ CORS_ORIGIN_WHITELIST = (
 )
 
 MIDDLEWARE = [
+    # Per route request metrics, served at /metrics (levelupapi/metrics.py); first, to time the rest
+    'levelupapi.middleware.metrics_middleware',
+    # Sampled request profiles and N+1 query reports (levelupapi/profiling.py)
+    'levelupapi.middleware.profiling_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -86,6 +92,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Under ASGI, GET requests for the read endpoints go to async views (levelupapi/views/asynchronous.py)
+    'levelupapi.middleware.async_read_middleware',
 ]
 
 ROOT_URLCONF = 'levelup.urls'
@@ -138,6 +146,19 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# The first hasher hashes new passwords, the others still verify older hashes.
+# Set the PASSWORD_HASHER=argon2 environment variable (needs `pip install argon2-cffi`) to hash with a
+# cheaper tuned Argon2 (levelupapi/hashers.py); existing hashes are upgraded on each user's next login.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'levelupapi.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+if os.environ.get('PASSWORD_HASHER') == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(2))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -164,3 +185,53 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Database alias the plain SQL reports in levelupreports read from
+REPORTS_DATABASE = 'default'
+
+# Cached lookup tables (Gametype, Status), see levelupapi/lookups.py
+# Seconds before the cached rows are reloaded from the database
+LOOKUP_CACHE_TTL = 300
+# Name of one of the CACHES shared by all the workers (eg. memcached/redis) to keep them in sync;
+# None keeps the cache in-process only
+LOOKUP_CACHE_ALIAS = None
+
+# Token -> user -> gamer lookups cached by GamerTokenAuthentication: how many, and for how many seconds.
+# Without a shared cache, the TTL is how long other workers accept a revoked token
+AUTH_CACHE_SIZE = 1024
+AUTH_CACHE_TTL = 60
+# Name of one of the CACHES shared by all the workers, through which a logout, deleted token or
+# deactivated user reaches every worker right away; None keeps the cache in-process only
+AUTH_CACHE_ALIAS = LOOKUP_CACHE_ALIAS
+
+# Seconds a gamer's /profile document stays in the cache (levelupapi/profile_cache.py); 0 turns it off.
+# Only turn it on with a default cache shared by all the workers: changes drop it in one process only
+PROFILE_CACHE_TIMEOUT = 0
+
+# Days the /events/changes log is kept (levelupapi/changes.py); older sync tokens get 410 and start over
+CHANGE_LOG_RETENTION_DAYS = 30
+
+# Live updates on /events/stream (levelupapi/push.py): the backend that carries messages to the
+# subscribed processes, the messages buffered per slow client, and seconds between keep-alives
+PUSH_BACKEND = 'levelupapi.push.LocalBackend'
+PUSH_MAX_PENDING = 100
+PUSH_HEARTBEAT_SECONDS = 15
+
+# Serve GET /games, /events, /gameTypes and /profile from the async views when running under ASGI
+ASYNC_READ_VIEWS = True
+
+# Request metrics at /metrics (levelupapi/metrics.py): the upper bounds in seconds of the latency
+# histogram buckets, and the client addresses allowed to read them (None for any)
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_ALLOWED_IPS = None
+
+# Request profiles (levelupapi/profiling.py): the fraction of requests profiled, whether an
+# X-Profile header from a staff user asks for one, the directory the reports are written to,
+# and how many times the same query from the same line is an N+1. Each profile is written to
+# disk, so both stay off unless someone is looking into a slow endpoint
+REQUEST_PROFILING_RATE = 0
+REQUEST_PROFILING_HEADER = False
+REQUEST_PROFILING_DIR = BASE_DIR / 'profiles'
+N_PLUS_ONE_THRESHOLD = 5
+
+# Encode (and parse) the JSON with orjson when it is installed (levelupapi/camel_case.py)
+FAST_JSON_ENCODER = True
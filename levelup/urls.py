@@ -1,14 +1,15 @@
 from django.conf.urls import include
 from django.urls import path
-from levelupapi.views import register_user, login_user
+from levelupapi.views import register_user, login_user, prometheus_metrics
 from rest_framework import routers
-from levelupapi.views import GameTypeView, GameView, EventView, ProfileView  # import view classes
+from levelupapi.views import GameTypeView, GameView, EventView, ProfileView, SearchView  # import view classes
 
 router = routers.DefaultRouter(trailing_slash=False)
 router.register(r'gameTypes', GameTypeView, 'gametype')  # part of the controller.  "r" means regex
 router.register(r'games', GameView, 'game')  
 router.register(r'events', EventView, 'event')
 router.register(r'profile', ProfileView, 'profile')
+router.register(r'search', SearchView, 'search')
 
 
 # controller-code
@@ -16,13 +17,16 @@ urlpatterns = [
     path('', include(router.urls)),
     
     # Requests to http://localhost:8000/register will be routed to the register_user function
-    path('register', register_user),
+    path('register', register_user, name='register'),
     
     # Requests to http://localhost:8000/login will be routed to the login_user function
-    path('login', login_user),
+    path('login', login_user, name='login'),
     
     path('api-auth', include('rest_framework.urls', namespace='rest_framework')),
     
     path('', include('levelupreports.urls')),
+
+    # Request metrics of this process for Prometheus (levelupapi/metrics.py)
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
 
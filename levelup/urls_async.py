@@ -0,0 +1,18 @@
+"""URLs for GET requests under ASGI: the async read views first, then everything in levelup/urls.py
+
+Picked per request by levelupapi.middleware.async_read_middleware. The names are those of the
+router's routes, so the request metrics (levelupapi/metrics.py) don't depend on which view served.
+"""
+from django.urls import path
+from levelup.urls import urlpatterns as sync_urlpatterns
+from levelupapi.views import asynchronous
+
+urlpatterns = [
+    path('games', asynchronous.game_list, name='game-list'),
+    path('games/<int:pk>', asynchronous.game_detail, name='game-detail'),
+    path('events', asynchronous.event_list, name='event-list'),
+    path('events/<int:pk>', asynchronous.event_detail, name='event-detail'),
+    path('gameTypes', asynchronous.gametype_list, name='gametype-list'),
+    path('gameTypes/<int:pk>', asynchronous.gametype_detail, name='gametype-detail'),
+    path('profile', asynchronous.profile, name='profile-list'),
+] + sync_urlpatterns
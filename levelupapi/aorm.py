@@ -0,0 +1,34 @@
+"""Async access to the ORM, for the async read views (levelupapi/views/asynchronous.py)
+
+Django 4.1 added QuerySet.aget() and `async for`, and 4.2 aaggregate(). These helpers use them
+when they are there, and on older Django (this project runs 3.2) run the same query through
+sync_to_async instead. Either way the query runs on Django's thread for sync code, where the
+database connections live, while the event loop keeps serving other requests.
+"""
+from asgiref.sync import sync_to_async
+
+
+async def aget(queryset, **kwargs):
+    """queryset.get(**kwargs)"""
+    if hasattr(queryset, 'aget'):
+        return await queryset.aget(**kwargs)
+    return await sync_to_async(queryset.get)(**kwargs)
+
+
+async def alist(queryset):
+    """list(queryset)"""
+    if hasattr(queryset, '__aiter__'):
+        return [row async for row in queryset]
+    return await sync_to_async(list)(queryset)
+
+
+async def aaggregate(queryset, **kwargs):
+    """queryset.aggregate(**kwargs)"""
+    if hasattr(queryset, 'aaggregate'):
+        return await queryset.aaggregate(**kwargs)
+    return await sync_to_async(queryset.aggregate)(**kwargs)
+
+
+async def run(function, *args, **kwargs):
+    """Any other code that reads the database, eg. a paginator evaluating its page"""
+    return await sync_to_async(function)(*args, **kwargs)
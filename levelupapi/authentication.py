@@ -0,0 +1,128 @@
+"""Token authentication that also resolves the gamer
+
+DRF's TokenAuthentication runs one query for the token and its user, and then every view ran
+another one for `Gamer.objects.get(user=request.auth.user)`. GamerTokenAuthentication gets the
+token, the user and the gamer in a single query, keeps the result in a small LRU cache, and puts
+the gamer on `request.gamer` for the views.
+
+Cached entries expire after AUTH_CACHE_TTL seconds, and are dropped right away when the token
+is deleted or the user or gamer is saved or deleted (see levelupapi/signals.py), which
+covers deactivating a user. That only reaches the process making the change: when
+AUTH_CACHE_ALIAS names one of the CACHES shared by all the workers, a version number per user
+kept there is bumped too, and the other workers check it on every request, like the lookup
+tables do (levelupapi/lookups.py). Without it, AUTH_CACHE_TTL is how long the other workers
+may still accept a revoked token, so keep it short.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """Bounded LRU of token key -> (token, expiry time, version of its user)"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return getattr(settings, 'AUTH_CACHE_SIZE', 1024)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AUTH_CACHE_TTL', 60)
+
+    @property
+    def shared(self):
+        """The Django cache used to keep workers coherent, or None for in-process only"""
+        alias = getattr(settings, 'AUTH_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    def version_key(self, user_id):
+        return f'auth:user:{user_id}:version'
+
+    def _shared_version(self, user_id):
+        shared = self.shared
+        return shared.get(self.version_key(user_id), 0) if shared is not None else None
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires, version = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Outside the lock: this may be a round trip to the shared cache
+        if version != self._shared_version(token.user_id):
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return token
+
+    def set(self, key, token):
+        if self.size <= 0:
+            return
+        version = self._shared_version(token.user_id)
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + self.ttl, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard_user(self, user_id, broadcast=True):
+        """Drop every cached token of this user, and tell the other workers to do the same"""
+        with self._lock:
+            for key in [key for key, (token, _, _) in self._entries.items() if token.user_id == user_id]:
+                del self._entries[key]
+        shared = self.shared
+        if broadcast and shared is not None:
+            try:
+                shared.incr(self.version_key(user_id))
+            except ValueError:
+                shared.set(self.version_key(user_id), 1, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class GamerTokenAuthentication(TokenAuthentication):
+    """`Authorization: Token <key>`, resolving the token, user and gamer in one query"""
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            user, _ = result
+            # Users without a gamer (eg. a superuser made with createsuperuser) get None
+            request.gamer = getattr(user, 'gamer', None)
+        return result
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            try:
+                token = Token.objects.select_related('user__gamer').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            token_cache.set(key, token)
+        return self.authenticate_token(token)
+
+    def authenticate_token(self, token):
+        """The (user, token) of a token already looked up, eg. from the token cache"""
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return (token.user, token)
+
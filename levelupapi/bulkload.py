@@ -0,0 +1,244 @@
+"""Bulk fixture loading: `python manage.py bulk_loaddata users gamers games events tokens`
+
+`manage.py loaddata` reads a whole fixture file into memory, then saves its objects one at a
+time, sending the signals of each. This loader takes the same JSON fixtures and:
+
+- parses them an object at a time (stream_objects), so memory follows the batch size rather
+  than the size of the files
+- keeps a buffer of objects per model, and writes a buffer with one bulk_create when it is
+  full; the many-to-many rows (eg. Gamer.signed_up_events) go to their join table the same way.
+  What is left is written at the end, models before the models pointing at them
+- runs in one transaction with the constraint checks deferred, like loaddata, so files and the
+  objects in them can come in any order; the foreign keys are checked once at the end
+- then does what the skipped signals would have done (refresh): counters, search index, caches,
+  and the /events/changes log and live updates for the events added or signed up for
+
+It only adds rows: an object whose primary key is already in its table is an error, where
+loaddata would update that row. Every object needs its primary key (`pk`), the join table rows
+and the change log are written from it; load objects without one with loaddata.
+"""
+import io
+import json
+import os
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from levelupapi import search
+from levelupapi.changes import log_changes
+from levelupapi.lookups import gametype_lookup, status_lookup
+from levelupapi.models import Event, Game, Gamer
+from levelupapi.profile_cache import invalidate_profiles, timeout as profile_cache_timeout
+from levelupapi.push import announce
+
+# Characters read from a fixture file at a time
+READ_SIZE = 1 << 16
+# Events logged to /events/changes and announced per query
+CHANGES_CHUNK = 1000
+
+
+def stream_objects(stream, read_size=READ_SIZE):
+    """The items of the JSON array in a text file, parsed one at a time
+
+    Raises:
+        ValueError -- when the file isn't a JSON array
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, at_end = '', 0, False
+
+    def skip_space():
+        """Move to the next character that isn't whitespace, reading more of the file as needed.
+        Returns that character, or '' at the end of the file"""
+        nonlocal buffer, position, at_end
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or at_end:
+                return buffer[position:position + 1]
+            read_more()
+
+    def read_more():
+        nonlocal buffer, position, at_end
+        chunk = stream.read(read_size)
+        at_end = not chunk
+        # Drop what was parsed already
+        buffer, position = buffer[position:] + chunk, 0
+
+    if skip_space() != '[':
+        raise ValueError('A fixture must be a JSON array')
+    position += 1
+    if skip_space() == ']':
+        return
+
+    while True:
+        skip_space()
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if at_end:
+                raise
+            # The item goes on in the part of the file not read yet
+            read_more()
+            continue
+        yield item
+        position = end
+
+        separator = skip_space()
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f'Expected "," or "]" between the objects of a fixture, got {separator!r}')
+
+
+def fixture_files(labels):
+    """The file of each fixture label: a path, or a name in a fixtures directory like loaddata takes
+
+    Raises:
+        FileNotFoundError -- naming the label that matches no file
+    """
+    directories = [os.path.join(app_config.path, 'fixtures') for app_config in apps.get_app_configs()]
+    directories += [str(directory) for directory in settings.FIXTURE_DIRS]
+    paths = []
+    for label in labels:
+        candidates = [label] + [
+            os.path.join(directory, name)
+            for directory in directories for name in (label, f'{label}.json')
+        ]
+        path = next((candidate for candidate in candidates if os.path.isfile(candidate)), None)
+        if path is None:
+            raise FileNotFoundError(f'No fixture named {label!r}')
+        paths.append(path)
+    return paths
+
+
+def dependency_order(models):
+    """The models with the ones they have foreign keys to first"""
+    ordered, visiting = [], set()
+
+    def visit(model):
+        if model in ordered or model in visiting:
+            return
+        visiting.add(model)
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model in models:
+                visit(field.related_model)
+        ordered.append(model)
+
+    for model in sorted(models, key=lambda model: model._meta.label):
+        visit(model)
+    return ordered
+
+
+class Loader:
+    """Buffers deserialized objects per model and bulk inserts them"""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.counts = {}
+        # Gamers whose cached profiles could show a loaded event
+        self.gamer_ids = set()
+        # Events added, and events gamers were signed up for
+        self.event_ids = []
+        self.signup_event_ids = set()
+
+    def add(self, deserialized):
+        """Buffer a deserialized object and its join table rows
+
+        Raises:
+            ValueError -- when the object has no primary key
+        """
+        instance = deserialized.object
+        if instance.pk is None:
+            raise ValueError(f'A {instance._meta.label} object has no pk, every object needs one')
+        self.append(type(instance), instance)
+        if isinstance(instance, Event):
+            self.gamer_ids.add(instance.host_id)
+            self.event_ids.append(instance.pk)
+
+        for name, values in deserialized.m2m_data.items():
+            field = instance._meta.get_field(name)
+            through = field.remote_field.through
+            source = through._meta.get_field(field.m2m_field_name()).attname
+            target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+            for value in values:
+                self.append(through, through(**{source: instance.pk, target: value}))
+            if isinstance(instance, Gamer) and name == 'signed_up_events' and values:
+                self.gamer_ids.add(instance.pk)
+                self.signup_event_ids.update(values)
+
+    def append(self, model, instance):
+        buffer = self.buffers.setdefault(model, [])
+        buffer.append(instance)
+        if len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model):
+        buffer = self.buffers[model]
+        if buffer:
+            model.objects.bulk_create(buffer, batch_size=self.batch_size)
+            self.counts[model] = self.counts.get(model, 0) + len(buffer)
+            buffer.clear()
+
+    def flush_all(self):
+        for model in dependency_order(set(self.buffers)):
+            self.flush(model)
+
+
+def load(paths, batch_size=5000):
+    """Bulk insert the objects of these JSON fixture files
+
+    Returns:
+        dict -- model -> the number of rows inserted, join tables included
+    """
+    loader = Loader(batch_size)
+    with transaction.atomic():
+        with connection.constraint_checks_disabled():
+            for path in paths:
+                with open(path, encoding='utf-8') as stream:
+                    for deserialized in serializers.deserialize('python', stream_objects(stream)):
+                        loader.add(deserialized)
+            loader.flush_all()
+
+        # Checked once here instead of row by row
+        connection.check_constraints(table_names=[model._meta.db_table for model in loader.counts])
+        refresh(list(loader.counts), loader.gamer_ids, loader.event_ids,
+                loader.signup_event_ids.difference(loader.event_ids))
+    return loader.counts
+
+
+def refresh(models, gamer_ids=(), event_ids=(), signup_event_ids=()):
+    """What the signals would have done for rows added with bulk_create (or raw SQL)
+
+    Arguments:
+        models -- The models rows were added to
+        gamer_ids -- Gamers whose cached profile may be out of date
+        event_ids -- Events added, logged as created in /events/changes and pushed to /events/stream
+        signup_event_ids -- Events that were there before and got gamers signed up
+    """
+    # Rows inserted with their primary key don't move the sequences of the databases that have them
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    # Game.event_count and Event.attendee_count, and the search index
+    if {Game, Event, Gamer.signed_up_events.through} & set(models):
+        call_command('event_counts', stdout=io.StringIO())
+    search.rebuild_index()
+
+    # The change log, so delta-sync clients get the new events, and the live updates
+    for ids, action in ((list(event_ids), 'created'), (list(signup_event_ids), 'attendance')):
+        for start in range(0, len(ids), CHANGES_CHUNK):
+            chunk = ids[start:start + CHANGES_CHUNK]
+            log_changes(chunk)
+            announce(chunk, action)
+
+    gametype_lookup.invalidate()
+    status_lookup.invalidate()
+    if profile_cache_timeout():
+        invalidate_profiles(gamer_ids)
@@ -0,0 +1,158 @@
+"""camelCase JSON renderer and parser, drop-in replacements for djangorestframework_camel_case's
+
+The library's renderer copies the whole response into OrderedDicts before encoding it, running
+a regex on every key of every object: for a list of 10k events, hundreds of thousands of regex
+calls for the same dozen field names. These classes give the same JSON, but:
+
+- key conversions are memoized: the first KEY_CACHE_SIZE keys seen are remembered (the field
+  names), others (eg. keys of a client's JSON) are converted each time
+- the data is walked once, into plain dicts and lists, with type checks ordered for the common
+  cases; json's and orjson's C encoders can't rename keys, so the walk can't be folded into them
+- when orjson is installed (`pip install orjson`) and FAST_JSON_ENCODER is on, it does the
+  encoding; DRF's encoder still handles the types orjson doesn't know, and datetimes, so the
+  bytes stay the same
+"""
+import json
+from django.conf import settings
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from djangorestframework_camel_case import util
+from djangorestframework_camel_case.settings import api_settings as camel_case_settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Converted keys remembered per direction
+KEY_CACHE_SIZE = 4096
+
+SCALARS = (str, int, float, bool, type(None))
+
+
+class KeyCache:
+    """Memoizes a key conversion, for at most `size` keys"""
+
+    def __init__(self, convert, size=KEY_CACHE_SIZE):
+        self.convert = convert
+        self.size = size
+        self.keys = {}
+
+    def __call__(self, key):
+        converted = self.keys.get(key)
+        if converted is None:
+            converted = self.convert(key)
+            if len(self.keys) < self.size:
+                self.keys[key] = converted
+        return converted
+
+
+def to_camel(key):
+    """Same as the library's: first_name -> firstName"""
+    if isinstance(key, Promise):
+        key = force_str(key)
+    if isinstance(key, str) and '_' in key:
+        return util.camelize_re.sub(util.underscore_to_camel, key)
+    return key
+
+
+def to_underscore(key):
+    """Same as the library's: firstName -> first_name"""
+    if isinstance(key, str):
+        return util.camel_to_underscore(key, **camel_case_settings.JSON_UNDERSCOREIZE)
+    return key
+
+
+camel_keys = KeyCache(to_camel)
+underscore_keys = KeyCache(to_underscore)
+
+
+def uses_ignore_options():
+    """Whether JSON_CAMEL_CASE leaves some fields or keys as they are; the library handles those"""
+    options = camel_case_settings.JSON_UNDERSCOREIZE
+    return bool(options.get('ignore_fields') or options.get('ignore_keys'))
+
+
+def camelized(data):
+    if uses_ignore_options():
+        return util.camelize(data, **camel_case_settings.JSON_UNDERSCOREIZE)
+    return camelize(data)
+
+
+def camelize(data):
+    """The data with camelCase keys, as plain dicts and lists"""
+    if isinstance(data, dict):
+        # The cache's dict is read directly: a method call per key costs a third of the walk
+        keys = camel_keys.keys
+        return {(keys.get(key) or camel_keys(key)): camelize(value) for key, value in data.items()}
+    if isinstance(data, SCALARS):
+        return data
+    if isinstance(data, (list, tuple)):
+        return [camelize(item) for item in data]
+    if isinstance(data, Promise):
+        return force_str(data)
+    if util.is_iterable(data):
+        return [camelize(item) for item in data]
+    return data
+
+
+def underscoreize(data):
+    """The data with snake_case keys, for parsed JSON (dicts, lists and scalars)"""
+    if isinstance(data, dict):
+        keys = underscore_keys.keys
+        return {(keys.get(key) or underscore_keys(key)): underscoreize(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [underscoreize(item) for item in data]
+    return data
+
+
+def fast_encoder():
+    return orjson is not None and getattr(settings, 'FAST_JSON_ENCODER', True)
+
+
+class CamelCaseJSONRenderer(JSONRenderer):
+    """JSON with camelCase keys"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        data = camelized(data)
+
+        # orjson writes what JSONRenderer does with the default UNICODE_JSON, COMPACT_JSON and
+        # STRICT_JSON, without indentation
+        if (fast_encoder() and not self.ensure_ascii and self.compact and self.strict
+                and not self.get_indent(accepted_media_type, renderer_context or {})):
+            try:
+                ret = orjson.dumps(data, default=self.encoder_class().default,
+                                   option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+            except orjson.JSONEncodeError:
+                # Something orjson refuses, eg. an int over 64 bits: json says what's wrong, or copes
+                return super().render(data, accepted_media_type, renderer_context)
+            # Like JSONRenderer, escape the two characters that are valid JSON but not JavaScript
+            return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class CamelCaseBrowsableAPIRenderer(BrowsableAPIRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(camelized(data), accepted_media_type, renderer_context)
+
+
+class CamelCaseJSONParser(JSONParser):
+    """Parses JSON with camelCase keys into snake_case ones"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            body = stream.read().decode(encoding)
+            data = orjson.loads(body) if fast_encoder() else json.loads(body)
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}') from exc
+        if uses_ignore_options():
+            return util.underscoreize(data, **camel_case_settings.JSON_UNDERSCOREIZE)
+        return underscoreize(data)
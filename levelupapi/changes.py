@@ -0,0 +1,104 @@
+"""Change feed for events: /events/changes?since=<token>
+
+Every change to an event adds an EventChange row: saving or deleting it (levelupapi/signals.py),
+a change to something shown inside it such as its game's name, and gamers joining or leaving
+it (the sign-up views and the m2m_changed receivers). Joining or leaving only changes the
+`joined` flag of that one gamer, so those rows carry the gamer and only reach their feed.
+
+The token a client gets back holds the last version it has seen and when it was issued. The
+next call only reads log rows after that version, so sync traffic follows the amount of change,
+not the size of the events table. `python manage.py compact_event_changes` drops rows superseded
+by a newer one for the same event, and every row older than CHANGE_LOG_RETENTION_DAYS; a token
+issued before that is refused, and the client starts over from a full snapshot.
+
+Versions are log ids, read back in id order. SQLite runs one write transaction at a time, so
+ids are committed in order; a database with concurrent writers could commit an id below one a
+client has already seen.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import Exists, Max, OuterRef, Q
+from django.utils import timezone
+from levelupapi.models import EventChange
+
+
+def retention():
+    return timedelta(days=getattr(settings, 'CHANGE_LOG_RETENTION_DAYS', 30))
+
+
+def log_changes(event_ids, gamer_id=None):
+    """Record a change to these events, for every gamer or only for `gamer_id`"""
+    EventChange.objects.bulk_create([EventChange(event_id=pk, gamer_id=gamer_id) for pk in event_ids])
+
+
+def log_signups(pairs):
+    """Record gamers joining or leaving events, as (event id, gamer id) pairs"""
+    EventChange.objects.bulk_create([EventChange(event_id=event_id, gamer_id=gamer_id) for event_id, gamer_id in pairs])
+
+
+def latest_version():
+    return EventChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def encode_token(version, issued):
+    data = json.dumps([version, int(issued.timestamp())], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_token(token):
+    """(version, issued time) of a token
+
+    Raises:
+        ValueError -- when the token isn't one of ours
+    """
+    try:
+        version, issued = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        if not isinstance(version, int) or not isinstance(issued, int):
+            raise ValueError(token)
+        return version, datetime.fromtimestamp(issued, tz=dt_timezone.utc)
+    except (TypeError, ValueError, binascii.Error, UnicodeEncodeError):
+        raise ValueError('Invalid sync token.')
+
+
+def expired(issued):
+    """True when log rows the token still needs may have been compacted away"""
+    return issued < timezone.now() - retention()
+
+
+def changed_since(version, gamer, limit):
+    """The events that changed for `gamer` after `version`
+
+    Returns:
+        tuple -- (event ids in the order they last changed, version to continue from, more rows left)
+    """
+    top = latest_version()
+    rows = list(
+        EventChange.objects
+        .filter(id__gt=version, id__lte=top)
+        .filter(Q(gamer_id=None) | Q(gamer_id=gamer.id))
+        .order_by('id')
+        .values_list('id', 'event_id')[:limit + 1])
+
+    # One row more than the limit tells if there is more to read
+    more = len(rows) > limit
+    rows = rows[:limit]
+    event_ids = list(dict.fromkeys(event_id for _, event_id in reversed(rows)))[::-1]
+    return event_ids, rows[-1][0] if more else top, more
+
+
+def compact(now=None):
+    """Drop superseded and expired log rows. Returns (superseded, expired) counts
+
+    A row is superseded by a newer row for the same event that reaches the same gamers: any
+    client that hasn't seen the old one gets the event from the newer one anyway.
+    """
+    now = now or timezone.now()
+    newer = EventChange.objects.filter(
+        event_id=OuterRef('event_id'), id__gt=OuterRef('id')
+    ).filter(Q(gamer_id=None) | Q(gamer_id=OuterRef('gamer_id')))
+    superseded, _ = EventChange.objects.filter(Exists(newer)).delete()
+    old, _ = EventChange.objects.filter(created_at__lt=now - retention()).delete()
+    return superseded, old
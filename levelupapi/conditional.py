@@ -0,0 +1,71 @@
+"""Helpers for HTTP conditional GET (ETag / If-None-Match)
+
+Games and events carry an `updated_at` column, which the signals in levelupapi/signals.py also
+bump when something shown inside them changes (an event's game, a host's name, a seat taken).
+So the ETag of a list is derived from COUNT(*) and MAX(updated_at) of its queryset: one
+aggregate query, without loading or serializing a row. An edit raises the max, a delete lowers
+the count. The URL (filters, ?fields=, ?expand=, the page) and anything else that shapes the
+response go into the ETag as well.
+"""
+import hashlib
+import json
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from levelupapi import aorm
+
+
+def etag_matches(request, etag):
+    """True when the client's If-None-Match already has `etag`"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags or etag.strip('"') in etags
+
+
+def not_modified(etag, last_modified=None):
+    """304 response with no body"""
+    return with_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+
+def make_etag(*parts):
+    content = json.dumps(parts, default=str)
+    return '"{}"'.format(hashlib.md5(content.encode('utf-8')).hexdigest())
+
+
+def validator_aggregates():
+    return {'count': Count('pk'), 'last_modified': Max('updated_at')}
+
+
+def queryset_validators(request, queryset, *vary):
+    """(ETag, last modified time) of the rows in `queryset`, for the response to this request
+
+    Arguments:
+        vary -- anything else the response depends on, eg. the gamer for per-gamer fields
+    """
+    stats = queryset.order_by().aggregate(**validator_aggregates())
+    return validators_from_stats(request, stats, *vary)
+
+
+async def aqueryset_validators(request, queryset, *vary):
+    """queryset_validators for the async views"""
+    stats = await aorm.aaggregate(queryset.order_by(), **validator_aggregates())
+    return validators_from_stats(request, stats, *vary)
+
+
+def validators_from_stats(request, stats, *vary):
+    accepted = getattr(request, 'accepted_renderer', None)
+    etag = make_etag(
+        stats['count'], stats['last_modified'], request.get_full_path(),
+        accepted.format if accepted else None, *vary)
+    return etag, stats['last_modified']
+
+
+def with_validators(response, etag, last_modified=None):
+    """Set the ETag and Last-Modified headers of `response` and return it"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
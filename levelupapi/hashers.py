@@ -0,0 +1,17 @@
+"""Password hashers tuned for the login and registration load
+
+Django's stock Argon2PasswordHasher asks for 100 MiB of memory and 8 lanes per hash, which is
+what maxes out the CPU during tournament registration bursts. TunedArgon2PasswordHasher uses
+the OWASP minimum (19 MiB, 2 passes, 1 lane). It keeps the 'argon2' algorithm name, so hashes
+made with other argon2 parameters still verify, and Django rehashes them on the next login.
+
+Turn it on with the PASSWORD_HASHER=argon2 environment variable (see levelup/settings.py);
+it needs `pip install argon2-cffi`.
+"""
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    time_cost = 2
+    memory_cost = 19 * 1024  # KiB
+    parallelism = 1
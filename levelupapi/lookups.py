@@ -0,0 +1,104 @@
+"""In-process cache for the small lookup tables (Gametype and Status)
+
+These tables have a handful of rows and almost never change, but the views used to query them
+on every request. Each LookupCache keeps all the rows of its table in memory:
+
+- rows are reloaded after LOOKUP_CACHE_TTL seconds
+- post_save/post_delete signals (see levelupapi/signals.py) drop the rows right away
+- when LOOKUP_CACHE_ALIAS names one of the CACHES, a version number kept in that cache is bumped
+  on every change, so the other workers notice and reload too
+"""
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from levelupapi.models import Gametype, Status
+
+
+class LookupCache:
+    """All the rows of a small table, keyed by primary key"""
+
+    def __init__(self, model):
+        self.model = model
+        self.key = f'lookups:{model._meta.label_lower}:version'
+        self._lock = threading.Lock()
+        self._rows = None
+        self._etag = None
+        self._loaded_at = 0
+        self._version = None
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'LOOKUP_CACHE_TTL', 300)
+
+    @property
+    def shared(self):
+        """The Django cache used to keep workers coherent, or None for in-process only"""
+        alias = getattr(settings, 'LOOKUP_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    def all(self):
+        """Every row of the table, ordered by id"""
+        return list(self._load().values())
+
+    def get(self, pk):
+        """Same as `Model.objects.get(pk=pk)`, raises Model.DoesNotExist"""
+        try:
+            return self._load()[int(pk)]
+        except (KeyError, TypeError, ValueError):
+            # Maybe the row was added by another worker since we loaded, ask the database
+            instance = self.model.objects.get(pk=pk)
+            self.invalidate(broadcast=False)
+            return instance
+
+    def etag(self):
+        """Quoted ETag that changes whenever the content of the table changes"""
+        self._load()
+        return self._etag
+
+    def invalidate(self, broadcast=True):
+        """Drop the cached rows, and tell the other workers to do the same"""
+        with self._lock:
+            self._rows = None
+        shared = self.shared
+        if broadcast and shared is not None:
+            try:
+                shared.incr(self.key)
+            except ValueError:
+                shared.set(self.key, 1, None)
+
+    def cached(self):
+        """(every row ordered by id, ETag) when they are in memory and current, else None. Never queries"""
+        rows, etag = self._rows, self._etag
+        if rows is None or not self._current(self._shared_version()):
+            return None
+        return list(rows.values()), etag
+
+    def _shared_version(self):
+        shared = self.shared
+        return shared.get(self.key, 0) if shared is not None else None
+
+    def _current(self, version):
+        return (self._rows is not None and version == self._version
+                and time.monotonic() - self._loaded_at < self.ttl)
+
+    def _load(self):
+        version = self._shared_version()
+        rows = self._rows
+        if rows is not None and self._current(version):
+            return rows
+
+        with self._lock:
+            rows = {instance.pk: instance for instance in self.model.objects.order_by('pk')}
+            fields = self.model._meta.concrete_fields
+            content = repr([[f.value_from_object(row) for f in fields] for row in rows.values()])
+            self._etag = '"{}"'.format(hashlib.md5(content.encode('utf-8')).hexdigest())
+            self._rows = rows
+            self._version = version
+            self._loaded_at = time.monotonic()
+        return rows
+
+
+gametype_lookup = LookupCache(Gametype)
+status_lookup = LookupCache(Status)
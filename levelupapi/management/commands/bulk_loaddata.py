@@ -0,0 +1,38 @@
+"""Load JSON fixtures with bulk inserts, a faster loaddata for large fixtures"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.db import IntegrityError
+from levelupapi.bulkload import fixture_files, load
+
+
+class Command(BaseCommand):
+    help = ('Load JSON fixtures like loaddata, streaming them and inserting in bulk '
+            '(eg. bulk_loaddata users gamers games events tokens). Only adds new rows')
+
+    def add_arguments(self, parser):
+        parser.add_argument('args', metavar='fixture', nargs='+', help='Fixture files, or fixture names in the fixtures directories')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+
+    def handle(self, *fixtures, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        try:
+            paths = fixture_files(fixtures)
+        except FileNotFoundError as ex:
+            raise CommandError(ex.args[0])
+
+        started = time.perf_counter()
+        try:
+            counts = load(paths, batch_size=options['batch_size'])
+        except IntegrityError as ex:
+            raise CommandError(f'Could not load the fixtures (already loaded, or a missing row?): {ex}')
+        except (DeserializationError, ValueError) as ex:
+            raise CommandError(f'Could not read the fixtures: {ex}')
+
+        for model, count in counts.items():
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{model._meta.label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Installed {sum(counts.values())} rows from {len(paths)} fixtures '
+            f'in {time.perf_counter() - started:.1f}s'))
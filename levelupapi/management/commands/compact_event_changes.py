@@ -0,0 +1,15 @@
+"""Compact the /events/changes log"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from levelupapi.changes import compact
+
+
+class Command(BaseCommand):
+    help = ('Drop event change log rows superseded by a newer change to the same event, '
+            'and rows older than CHANGE_LOG_RETENTION_DAYS')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            superseded, expired = compact()
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {superseded} superseded and {expired} expired event changes'))
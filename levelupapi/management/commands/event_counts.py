@@ -0,0 +1,53 @@
+"""Rebuild or verify the denormalized counters: Game.event_count and Event.attendee_count"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from levelupapi.models import Event, Game, Gamer
+
+
+def counted(queryset, column):
+    """COALESCE((SELECT COUNT(*) FROM ... WHERE <column> = outer.id), 0)"""
+    total = Subquery(
+        queryset.filter(**{column: OuterRef('pk')})
+        .order_by().values(column).annotate(total=Count('*')).values('total'),
+        output_field=IntegerField())
+    return Coalesce(total, 0)
+
+
+class Command(BaseCommand):
+    help = 'Recount Game.event_count and Event.attendee_count (use --check to only report mismatches)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report rows whose stored count is wrong, exit with an error if there are any')
+
+    def handle(self, *args, **options):
+        # model, stored column, the actual count
+        counters = (
+            (Game, 'event_count', counted(Event.objects.all(), 'game')),
+            (Event, 'attendee_count', counted(Gamer.signed_up_events.through.objects.all(), 'event')),
+        )
+
+        if options['check']:
+            wrong = 0
+            for model, column, actual in counters:
+                rows = list(model.objects.annotate(actual=actual)
+                            .exclude(**{column: F('actual')})
+                            .values_list('id', column, 'actual'))
+                for pk, stored, total in rows:
+                    self.stdout.write(f'{model._meta.model_name} {pk}: {column} is {stored}, actual {total}')
+                wrong += len(rows)
+            if wrong:
+                raise CommandError(f'{wrong} counts are wrong')
+            self.stdout.write(self.style.SUCCESS('All counts are correct'))
+            return
+
+        # One UPDATE ... SET column = (SELECT COUNT(*) ...) per table,
+        # bumping updated_at so clients holding an ETag with a wrong count download it again
+        with transaction.atomic():
+            for model, column, actual in counters:
+                updated = model.objects.update(**{column: actual, 'updated_at': timezone.now()})
+                self.stdout.write(self.style.SUCCESS(f'Recounted {column} for {updated} {model._meta.verbose_name_plural}'))
@@ -0,0 +1,32 @@
+"""Fill the database with a synthetic dataset, for benchmarks and load tests"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from levelupapi.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = ('Add synthetic gamers, games and events with skewed activity, using bulk inserts '
+            '(eg. --gamers 10000 --games 100000 --events 1000000)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gamers', type=int, default=1000, help='Gamers to add, each with a user and a token')
+        parser.add_argument('--games', type=int, default=10000, help='Games to add')
+        parser.add_argument('--events', type=int, default=100000, help='Events to add')
+        parser.add_argument('--signups', type=float, default=3.0, help='Average gamers signed up per event')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of who creates, hosts and joins, and which games get events; 0 is uniform')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        if min(options['gamers'], options['games'], options['events'], options['batch_size'] - 1) < 0:
+            raise CommandError('The counts must not be negative, and --batch-size must be at least 1')
+
+        started = time.perf_counter()
+        progress = (lambda message: self.stdout.write(message)) if options['verbosity'] > 1 else None
+        added = generate(
+            options['gamers'], options['games'], options['events'], signups=options['signups'],
+            skew=options['skew'], seed=options['seed'], batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            'Added {gamers} gamers, {games} games, {events} events and {signups} sign-ups'.format(**added)
+            + f' in {time.perf_counter() - started:.1f}s'))
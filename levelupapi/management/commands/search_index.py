@@ -0,0 +1,22 @@
+"""Rebuild the full-text search index from the game and event tables"""
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from levelupapi import search
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the search index (after bulk inserts, raw SQL or restoring a backup, '
+            'which skip the signals that keep it in sync)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database to rebuild the index in')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search.has_index(using):
+            self.stdout.write('Nothing to rebuild, this database is searched without an index table')
+            return
+
+        with transaction.atomic(using=using):
+            indexed = search.rebuild_index(using)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} games and events'))
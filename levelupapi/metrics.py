@@ -0,0 +1,212 @@
+"""Per-endpoint request metrics, served at /metrics in the Prometheus text format
+
+levelupapi.middleware.metrics_middleware times every request and records, under the name of
+the route it went to (the DRF router names: `game-list`, `event-signup`, ...):
+
+- requests, by method and status code
+- a histogram of the latencies (METRICS_LATENCY_BUCKETS, in seconds)
+- database queries and the time spent in them, counted by a wrapper on every database
+  connection (the one `connection.execute_wrapper()` adds for a block), installed when the
+  connection is opened (levelupapi/signals.py). It finds the request it counts for in a
+  context variable, which follows the request to the threads sync_to_async runs queries in
+- response bytes
+
+Each thread adds to counters only it writes to, so recording takes no lock; a scrape adds up
+the counters of all the threads. The numbers are those of the worker process that answers the
+scrape: with several processes, scrape each one, like any per-process Prometheus client.
+Responses streamed (?stream=) count their bytes as they are sent, but the time and queries
+only up to the first byte.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Route name of the requests that matched no URL
+UNMATCHED = 'unmatched'
+
+
+def latency_buckets():
+    return tuple(getattr(settings, 'METRICS_LATENCY_BUCKETS', DEFAULT_LATENCY_BUCKETS))
+
+
+class Measurement:
+    """The queries made while serving one request"""
+
+    __slots__ = ('queries', 'db_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# The Measurement of the request being served, None outside requests
+current = ContextVar('levelupapi_metrics_request', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current request's Measurement"""
+    measurement = current.get()
+    if measurement is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        measurement.queries += 1
+        measurement.db_seconds += time.perf_counter() - started
+
+
+def instrument(connection):
+    """Count the queries of this connection from now on"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RouteStats:
+    """Counters of one route, in one thread"""
+
+    __slots__ = ('requests', 'buckets', 'seconds', 'queries', 'db_seconds', 'bytes')
+
+    def __init__(self, bucket_count):
+        # (method, status) -> requests
+        self.requests = {}
+        # Requests per latency bucket, not cumulative; the last one is +Inf
+        self.buckets = [0] * (bucket_count + 1)
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.bytes = 0
+
+
+class Registry:
+    """The counters of every route, kept per thread and added up when read"""
+
+    def __init__(self, buckets=None):
+        self._buckets = buckets
+        self._local = threading.local()
+        # The counters of every thread that recorded something, threads gone included
+        self._shards = []
+
+    @property
+    def buckets(self):
+        return self._buckets if self._buckets is not None else latency_buckets()
+
+    def _stats(self, route):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # list.append is atomic, no lock needed
+            self._shards.append(shard)
+        stats = shard.get(route)
+        if stats is None:
+            stats = shard[route] = RouteStats(len(self.buckets))
+        return stats
+
+    def observe(self, route, method, status, seconds, queries=0, db_seconds=0.0, size=0):
+        """Record one request"""
+        stats = self._stats(route)
+        key = (method, status)
+        stats.requests[key] = stats.requests.get(key, 0) + 1
+        stats.buckets[bisect.bisect_left(self.buckets, seconds)] += 1
+        stats.seconds += seconds
+        stats.queries += queries
+        stats.db_seconds += db_seconds
+        stats.bytes += size
+
+    def add_bytes(self, route, size):
+        self._stats(route).bytes += size
+
+    def collect(self):
+        """route -> RouteStats of all the threads added up"""
+        totals = {}
+        bucket_count = len(self.buckets)
+        for shard in list(self._shards):
+            for route, stats in list(shard.items()):
+                total = totals.get(route)
+                if total is None:
+                    total = totals[route] = RouteStats(bucket_count)
+                for key, count in list(stats.requests.items()):
+                    total.requests[key] = total.requests.get(key, 0) + count
+                for index, count in enumerate(stats.buckets):
+                    total.buckets[index] += count
+                total.seconds += stats.seconds
+                total.queries += stats.queries
+                total.db_seconds += stats.db_seconds
+                total.bytes += stats.bytes
+        return totals
+
+    def reset(self):
+        """Forget every count (for tests)"""
+        for shard in list(self._shards):
+            shard.clear()
+
+    def render(self):
+        """All the metrics in the Prometheus text exposition format"""
+        totals = sorted(self.collect().items())
+        buckets = [format_number(bound) for bound in self.buckets] + ['+Inf']
+        lines = [
+            '# HELP levelup_http_requests_total Requests served, by route, method and status code.',
+            '# TYPE levelup_http_requests_total counter',
+        ]
+        for route, stats in totals:
+            for (method, status), count in sorted(stats.requests.items()):
+                lines.append(f'levelup_http_requests_total{{route="{escape(route)}",method="{escape(method)}",'
+                             f'status="{status}"}} {count}')
+
+        lines += [
+            '# HELP levelup_http_request_duration_seconds Time to serve a request, by route.',
+            '# TYPE levelup_http_request_duration_seconds histogram',
+        ]
+        for route, stats in totals:
+            label = escape(route)
+            cumulative = 0
+            for bound, count in zip(buckets, stats.buckets):
+                cumulative += count
+                lines.append(f'levelup_http_request_duration_seconds_bucket{{route="{label}",le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f'levelup_http_request_duration_seconds_sum{{route="{label}"}} '
+                         f'{format_number(stats.seconds)}')
+            lines.append(f'levelup_http_request_duration_seconds_count{{route="{label}"}} {cumulative}')
+
+        for name, kind, help_text, attribute in (
+            ('levelup_db_queries_total', 'counter', 'Database queries made, by route.', 'queries'),
+            ('levelup_db_query_duration_seconds_total', 'counter', 'Time spent in database queries, by route.',
+             'db_seconds'),
+            ('levelup_http_response_bytes_total', 'counter', 'Response body bytes sent, by route.', 'bytes'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{{route="{escape(route)}"}} {format_number(getattr(stats, attribute))}'
+                      for route, stats in totals]
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    """A label value, escaped for the text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def route_name(request):
+    """Name of the route the request went to: the URL name, with its namespace"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED
+    return match.view_name
+
+
+def allowed(request):
+    """Whether this client may read /metrics (METRICS_ALLOWED_IPS, None for everyone)"""
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    return allowed_ips is None or request.META.get('REMOTE_ADDR') in allowed_ips
+
+
+registry = Registry()
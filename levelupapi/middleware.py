@@ -0,0 +1,133 @@
+"""Middleware for the levelup API"""
+import asyncio
+import os
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.decorators import sync_and_async_middleware
+from levelupapi import metrics, profiling
+
+
+@sync_and_async_middleware
+def async_read_middleware(get_response):
+    """Under ASGI, route GET requests to the async read views (levelupapi/views/asynchronous.py)
+
+    Writes, exports (?stream=, sent whole under ASGI, see levelupapi/streaming.py) and the browsable
+    API (?format=, Accept: text/html) keep going to the ViewSets; so does everything under WSGI,
+    or with ASYNC_READ_VIEWS = False.
+    Async under ASGI, so it doesn't add a trip through sync_to_async to each request; Django
+    3.2 still sends the hooks of its own MiddlewareMixin middleware through one.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            use_async_reads(request)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            use_async_reads(request)
+            return get_response(request)
+    return middleware
+
+
+def use_async_reads(request):
+    """Point the request at levelup/urls_async.py when an async view can serve it"""
+    if not getattr(settings, 'ASYNC_READ_VIEWS', True) or not isinstance(request, ASGIRequest):
+        return
+    if request.method != 'GET' or 'stream' in request.GET or 'format' in request.GET:
+        return
+    if 'text/html' in request.META.get('HTTP_ACCEPT', ''):
+        return
+    request.urlconf = 'levelup.urls_async'
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Record the time, queries and response size of every request (levelupapi/metrics.py)
+
+    Goes first in MIDDLEWARE, so the time covers the other middleware too. Async under ASGI,
+    so the async read views aren't sent to a thread on its account.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            measurement, token, started = start_measuring()
+            try:
+                response = await get_response(request)
+            finally:
+                metrics.current.reset(token)
+            return finish_measuring(request, response, measurement, started)
+    else:
+        def middleware(request):
+            measurement, token, started = start_measuring()
+            try:
+                response = get_response(request)
+            finally:
+                metrics.current.reset(token)
+            return finish_measuring(request, response, measurement, started)
+    return middleware
+
+
+def start_measuring():
+    measurement = metrics.Measurement()
+    return measurement, metrics.current.set(measurement), time.perf_counter()
+
+
+def finish_measuring(request, response, measurement, started):
+    route = metrics.route_name(request)
+    if response.streaming:
+        size = 0
+        response.streaming_content = counted(response.streaming_content, route)
+    else:
+        size = len(response.content)
+    metrics.registry.observe(route, request.method, response.status_code, time.perf_counter() - started,
+                             measurement.queries, measurement.db_seconds, size)
+    return response
+
+
+def counted(chunks, route):
+    """Stream the chunks, adding their size to the route's response bytes"""
+    for chunk in chunks:
+        metrics.registry.add_bytes(route, len(chunk))
+        yield chunk
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    """Profile a sample of the requests, and count the queries of those made in a query_budget block
+    (levelupapi/profiling.py)"""
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            if profiling.header_requested(request):
+                sampled = await sync_to_async(profiling.staff_request)(request) or profiling.sampled_at_random()
+            else:
+                sampled = profiling.sampled_at_random()
+            profile = start_profile(sampled, functions=False)
+            if profile is None:
+                return await get_response(request)
+            with profile:
+                response = await get_response(request)
+            return finish_profile(request, response, profile)
+    else:
+        def middleware(request):
+            profile = start_profile(profiling.sampled(request), functions=True)
+            if profile is None:
+                return get_response(request)
+            with profile:
+                response = get_response(request)
+            return finish_profile(request, response, profile)
+    return middleware
+
+
+def start_profile(sampled, functions):
+    if not sampled and not profiling.budgets:
+        return None
+    return profiling.Profile(functions=functions and sampled, sampled=sampled)
+
+
+def finish_profile(request, response, profile):
+    for budget in profiling.budgets:
+        budget.add(request, profile.log)
+    if profile.sampled:
+        path = profile.dump(request, response, metrics.route_name(request))
+        response['X-Profile-Report'] = os.path.basename(path)
+    return response
@@ -3,3 +3,4 @@ from .event import Event
 from .game import Game
 from .status import Status
 from .gametype import Gametype
+from .event_change import EventChange
@@ -14,7 +14,37 @@ class Event(models.Model):
         #under the hood: status_id = ..; one-to-many relations (show on the one side, not the many side)
     host = models.ForeignKey(Gamer, on_delete=CASCADE, related_name='hosting_events') # alias event_set
     game = models.ForeignKey(Game, on_delete=CASCADE, related_name='events')
+    # number of gamers signed up, so a seat can be claimed with a single conditional UPDATE
+    # (see join_events in levelupapi/views/event.py)
+    attendee_count = models.IntegerField(default=0)
+    # Bumped on every change to the event or to what the API shows inside it (see levelupapi/signals.py),
+    # the ETag of /events is made from it (levelupapi/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # EventView.list filters by game/host/status and a time window, sorted by time:
+        # a (column, time) index turns each of those into one index range scan
+        indexes = [
+            models.Index(fields=['time', 'id'], name='event_time_idx'),
+            models.Index(fields=['game', 'time'], name='event_game_time_idx'),
+            models.Index(fields=['host', 'time'], name='event_host_time_idx'),
+            models.Index(fields=['status', 'time'], name='event_status_time_idx'),
+        ]
     
+    def save(self, *args, **kwargs):
+        """Saving an event loaded earlier leaves attendee_count as it is in the row
+
+        The count only changes through conditional UPDATEs (join_events in levelupapi/views/event.py,
+        levelupapi/signals.py). Writing back the value loaded with the instance would undo the
+        sign-ups made since, and let later ones past player_limit.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'attendee_count'
+            ]
+        super().save(*args, **kwargs)
+
     # for custom properties that are not stored in the database
     @property
     def joined(self):
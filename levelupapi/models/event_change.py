@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class EventChange(models.Model):
+    """One row per change to an event, in the order they happened (see levelupapi/changes.py)
+
+    The id is the version: /events/changes?since=<token> returns what changed after it.
+    There is no foreign key, so the row outlives a deleted event and works as its tombstone.
+    """
+    event_id = models.IntegerField()
+    # Set when the change is only visible to one gamer (they joined or left, so their `joined` flag changed)
+    gamer_id = models.IntegerField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        # compaction looks for newer rows of the same event
+        indexes = [models.Index(fields=['event_id', 'id'], name='event_change_event_idx')]
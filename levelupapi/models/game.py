@@ -13,13 +13,25 @@ class Game(models.Model):
     
     
     #🕹🕹🕹Events per Game with Django
-        
-    #Since the event count is a calculated property, and not something stored in the database, 
-    #create a custom property that will be added to each instance of a Game：
-    @property
-    def event_count(self):
-        return self.__event_count
 
-    @event_count.setter
-    def event_count(self, value):
-        self.__event_count = value
\ No newline at end of file
+    #The event count is stored on the game instead of counted with annotate(Count('events')) on every request.
+    #It is kept up to date with atomic F() updates by the Event signals (levelupapi/signals.py);
+    #`python manage.py event_counts` rebuilds or verifies it.
+    event_count = models.IntegerField(default=0)
+
+    # Bumped on every change to the game or to what the API shows inside it (see levelupapi/signals.py),
+    # the ETag of /games is made from it (levelupapi/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        """Saving a game loaded earlier leaves event_count as it is in the row
+
+        The count only changes through F() updates (levelupapi/signals.py); writing back the
+        value loaded with the instance would undo the events created or deleted since.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'event_count'
+            ]
+        super().save(*args, **kwargs)
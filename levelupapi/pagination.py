@@ -0,0 +1,140 @@
+"""Opt-in pagination for the list endpoints
+
+The ViewSets in this app are plain `ViewSet`s, so DRF never paginates them on its own.
+Each list() asks `get_paginator()` whether the client wants a page:
+
+    /events                       -> the whole list, as before
+    /events?limit=10&offset=20    -> LimitOffsetPagination, as configured in settings
+    /events?pageSize=10           -> first keyset page, the response has a `next` link
+    /events?cursor=<opaque>       -> the page after that cursor
+
+Keyset pages are found with `WHERE (time, id) > (last_time, last_id)` instead of an OFFSET,
+so page 1000 costs the same as page 1.
+"""
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over a unique, ascending ordering such as ('time', 'id')"""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'pageSize'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=('id',)):
+        # The last field has to be unique (the pk) so every row has exactly one position
+        self.ordering = tuple(ordering)
+        self.page_size = api_settings.PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        # Fetch one extra row to find out if there is a next page
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        position = [self.field_value(last, name) for name in self.ordering]
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position))
+
+    def after(self, position):
+        """Build the row-value comparison (a, b, c) > (x, y, z) as
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)"""
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            step = Q(**{f'{name}__gt': position[i]})
+            for prev, value in zip(self.ordering[:i], position[:i]):
+                step &= Q(**{prev: value})
+            condition |= step
+        return condition
+
+    @staticmethod
+    def field_value(instance, name):
+        value = getattr(instance, name)
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def encode_cursor(self, position):
+        data = json.dumps(position, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError(encoded)
+            # Turn the JSON values back into python values (eg. the datetime for `time`)
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class OrderedLimitOffsetPagination(LimitOffsetPagination):
+    """LimitOffsetPagination that pages over the same ordering as the keyset pages"""
+
+    def __init__(self, ordering=('id',)):
+        self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return super().paginate_queryset(queryset.order_by(*self.ordering), request, view)
+
+
+def get_paginator(request, ordering=('id',)):
+    """Pick the pagination the client asked for, or None to return the whole list
+
+    Arguments:
+        request -- The full HTTP request object
+        ordering -- Unique ordering used for keyset pages, eg. ('time', 'id')
+    """
+    params = request.query_params
+    keyset, limit_offset = KeysetPagination, OrderedLimitOffsetPagination
+
+    if keyset.cursor_query_param in params or keyset.page_size_query_param in params:
+        return keyset(ordering)
+
+    if limit_offset.limit_query_param in params or limit_offset.offset_query_param in params:
+        return limit_offset(ordering)
+
+    return None
@@ -0,0 +1,41 @@
+"""Cached /profile documents
+
+The profile is the first call the client makes after logging in, so the whole JSON document
+of each gamer is kept in Django's cache for PROFILE_CACHE_TIMEOUT seconds (0 turns it off).
+It is dropped whenever something in it changes (levelupapi/signals.py and the sign-up views):
+the gamer joins or leaves an event, hosts, edits or deletes one, or edits their account.
+
+It is off by default. Dropping a profile only reaches the cache of the process that made the
+change, so with Django's default per-process cache (LocMemCache) the other workers would keep
+serving the old document until it times out. Turn it on only with a CACHES['default'] all the
+workers share (memcached, redis), or when running a single process.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def profile_key(gamer_id):
+    return f'profile:{gamer_id}'
+
+
+def timeout():
+    return getattr(settings, 'PROFILE_CACHE_TIMEOUT', 0)
+
+
+def get_profile(gamer_id):
+    """The cached profile document, or None"""
+    if not timeout():
+        return None
+    return cache.get(profile_key(gamer_id))
+
+
+def set_profile(gamer_id, profile):
+    if timeout():
+        cache.set(profile_key(gamer_id), profile, timeout())
+
+
+def invalidate_profiles(gamer_ids):
+    """Drop the cached profiles of these gamers"""
+    keys = [profile_key(gamer_id) for gamer_id in set(gamer_ids)]
+    if keys and timeout():
+        cache.delete_many(keys)
@@ -0,0 +1,259 @@
+"""Request profiling and N+1 query detection
+
+levelupapi.middleware.profiling_middleware profiles a sample of the requests: a fraction
+REQUEST_PROFILING_RATE of them, and, when REQUEST_PROFILING_HEADER is on, those sent with an
+`X-Profile` header by a staff user (Authorization: Token of a user with is_staff; the header
+of anyone else is ignored). Both are off by default. For each one it writes to REQUEST_PROFILING_DIR:
+
+- <name>.prof, the cProfile of the request (`python -m pstats <name>.prof`, snakeviz, ...)
+- <name>.json, with the slowest functions, every query with the line of our code that made it,
+  and the repeated queries: the same SQL, up to its parameters, made N_PLUS_ONE_THRESHOLD times
+  or more from the same line, like a query per row of a loop (an N+1 pattern)
+
+Under ASGI only the queries are recorded: the event loop serves other requests in between, so a
+cProfile of it would mix them up.
+
+In tests, `with query_budget(5):` fails when a request made in the block runs more than 5
+queries, naming its repeated queries.
+"""
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from rest_framework.authentication import get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+from levelupapi import metrics
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+# Functions listed in a report, by cumulative time
+REPORT_FUNCTIONS = 30
+
+# Parts of the SQL that change from one call of the same query to the next
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LISTS = re.compile(r'%s(?:\s*,\s*%s)+')
+# The modules of the execute wrappers, skipped when looking for the code that made a query
+WRAPPERS = {__file__, metrics.__file__}
+
+
+def threshold():
+    return getattr(settings, 'N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+
+
+def header_requested(request):
+    """Whether the request asks for a profile with X-Profile, and REQUEST_PROFILING_HEADER allows it"""
+    return getattr(settings, 'REQUEST_PROFILING_HEADER', False) and 'HTTP_X_PROFILE' in request.META
+
+
+def staff_request(request):
+    """Whether the request carries the token of an active staff user. Reads the database (once per
+    token and AUTH_CACHE_TTL), so under ASGI it has to run in a thread"""
+    # pylint: disable=import-outside-toplevel
+    from levelupapi.authentication import GamerTokenAuthentication
+
+    authorization = get_authorization_header(request).split()
+    if len(authorization) != 2 or authorization[0].lower() != b'token':
+        return False
+    try:
+        user, _ = GamerTokenAuthentication().authenticate_credentials(authorization[1].decode())
+    except (AuthenticationFailed, UnicodeError):
+        return False
+    return user.is_staff
+
+
+def sampled_at_random():
+    rate = getattr(settings, 'REQUEST_PROFILING_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def sampled(request):
+    """Whether to profile this request: asked for by a staff user, or picked at random"""
+    if header_requested(request) and staff_request(request):
+        return True
+    return sampled_at_random()
+
+
+def shape(sql):
+    """The SQL with its literals and lists of parameters replaced, the same for every call of a query"""
+    return PLACEHOLDER_LISTS.sub('%s, ...', LITERALS.sub('?', sql))
+
+
+def calling_line():
+    """'file:line in function' of the innermost frame of our own code (not Django's or a library's)"""
+    base = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(2)  # pylint: disable=protected-access
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and 'site-packages' not in filename and filename not in WRAPPERS:
+            return f'{os.path.relpath(filename, base)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class QueryLog:
+    """The queries made while serving one request"""
+
+    def __init__(self):
+        self.queries = []
+
+    def repeated(self, at_least=None):
+        """The queries made `at_least` times with the same shape from the same line, most first"""
+        at_least = threshold() if at_least is None else at_least
+        groups = {}
+        for query in self.queries:
+            group = groups.setdefault((shape(query['sql']), query['where']), [])
+            group.append(query)
+        found = [
+            {'sql': sql, 'where': where, 'count': len(group),
+             'total_ms': round(sum(query['ms'] for query in group), 3)}
+            for (sql, where), group in groups.items() if len(group) >= at_least
+        ]
+        return sorted(found, key=lambda group: -group['count'])
+
+
+# The QueryLog of the request being profiled, None when it isn't
+current = ContextVar('levelupapi_profiling_queries', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the QueryLog of the request being profiled"""
+    log = current.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.queries.append({
+            'sql': sql,
+            'ms': round((time.perf_counter() - started) * 1000, 3),
+            'where': calling_line(),
+        })
+
+
+def instrument(connection):
+    """Record the queries of this connection for the requests being profiled"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# The QueryBudgets of the open query_budget blocks
+budgets = []
+
+
+class QueryBudget:
+    """Query counts of the requests made in a query_budget block"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        # (method, path, QueryLog) of each request
+        self.requests = []
+
+    def add(self, request, log):
+        self.requests.append((request.method, request.get_full_path(), log))
+
+    def check(self):
+        over = [(method, path, log) for method, path, log in self.requests if len(log.queries) > self.limit]
+        if over:
+            raise AssertionError('\n'.join(
+                [f'Requests over the budget of {self.limit} queries:'] +
+                [describe(method, path, log) for method, path, log in over]))
+
+
+@contextmanager
+def query_budget(limit):
+    """Fail when a request made in the block runs more than `limit` queries (for tests)
+
+        with query_budget(4):
+            self.client.get('/events')
+    """
+    budget = QueryBudget(limit)
+    budgets.append(budget)
+    try:
+        yield budget
+    finally:
+        budgets.remove(budget)
+    budget.check()
+
+
+def describe(method, path, log):
+    lines = [f'  {method} {path}: {len(log.queries)} queries']
+    lines += [f'    {group["count"]}x from {group["where"]}: {group["sql"]}' for group in log.repeated(2)]
+    return '\n'.join(lines)
+
+
+class Profile:
+    """Profiles one request: its queries, and the functions it ran unless `functions` is False"""
+
+    def __init__(self, functions=True, sampled=True):
+        # Whether to write a report, rather than only count the queries for a query_budget
+        self.sampled = sampled
+        self.log = QueryLog()
+        self.profiler = cProfile.Profile() if functions else None
+        self.started = None
+        self.seconds = None
+        self._token = None
+
+    def __enter__(self):
+        self._token = current.set(self.log)
+        self.started = time.time()
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.seconds = time.time() - self.started
+        current.reset(self._token)
+
+    def functions(self):
+        """The REPORT_FUNCTIONS functions that took the longest, callees included"""
+        if self.profiler is None:
+            return []
+        stats = pstats.Stats(self.profiler).stats
+        rows = sorted(stats.items(), key=lambda item: -item[1][3])[:REPORT_FUNCTIONS]
+        return [
+            {'function': f'{filename}:{line}({name})', 'calls': calls,
+             'own_ms': round(own * 1000, 3), 'cumulative_ms': round(cumulative * 1000, 3)}
+            for (filename, line, name), (_, calls, own, cumulative, _) in rows
+        ]
+
+    def report(self, request, response, route):
+        return {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': route,
+            'status': response.status_code,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(self.started)),
+            'ms': round(self.seconds * 1000, 3),
+            'query_count': len(self.log.queries),
+            'db_ms': round(sum(query['ms'] for query in self.log.queries), 3),
+            'repeated': self.log.repeated(),
+            'functions': self.functions(),
+            'queries': self.log.queries,
+        }
+
+    def dump(self, request, response, route, directory=None):
+        """Write the report (and the cProfile) to REQUEST_PROFILING_DIR. Returns the report's path"""
+        directory = directory or getattr(settings, 'REQUEST_PROFILING_DIR', None) or \
+            os.path.join(settings.BASE_DIR, 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        name = '{}-{}-{}'.format(
+            time.strftime('%Y%m%d-%H%M%S', time.gmtime(self.started)),
+            re.sub(r'[^\w.-]+', '_', route), uuid.uuid4().hex[:8])
+        path = os.path.join(directory, f'{name}.json')
+        report = self.report(request, response, route)
+        if self.profiler is not None:
+            report['profile'] = f'{name}.prof'
+            self.profiler.dump_stats(os.path.join(directory, report['profile']))
+        with open(path, 'w') as output:
+            json.dump(report, output, indent=2)
+        return path
@@ -0,0 +1,267 @@
+"""Live event updates over server-sent events, served by the ASGI app (levelup/asgi.py)
+
+    GET /events/stream            Authorization: Token <key>, or ?token=<key> for EventSource
+
+Every change to an event is pushed to the open streams as it is committed:
+
+    event: event
+    data: {"action": "updated", "id": 3, "attendeeCount": 4, "playerLimit": 6}
+
+action is created, updated, deleted, or attendance when gamers joined or left. A client keeps
+its copy of /events current from these instead of polling it.
+
+Messages go through a backend (PUSH_BACKEND), which hands them to the Broker of every process
+that has subscribers. The default LocalBackend only reaches the process it runs in, so there is
+nothing to run for tests and a single worker; several workers need a backend that fans out
+between processes (eg. over Redis pub/sub), calling `broker.deliver` with what it receives.
+
+Each stream buffers at most PUSH_MAX_PENDING messages while the client is slow to read them,
+keeping only the newest message per event. When that overflows the buffer is dropped and the
+client gets a `resync` event: it should fetch /events (or /events/changes) again. So a slow
+client costs a bounded amount of memory and never holds up the others, and an idle stream is
+two coroutines waiting on futures, so one worker can hold thousands of them.
+"""
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from levelupapi.authentication import GamerTokenAuthentication
+
+STREAM_PATH = '/events/stream'
+# Events read per query when publishing, under SQLite's limit on query parameters
+PUBLISH_CHUNK = 500
+
+
+def max_pending():
+    return getattr(settings, 'PUSH_MAX_PENDING', 100)
+
+
+def heartbeat_seconds():
+    return getattr(settings, 'PUSH_HEARTBEAT_SECONDS', 15)
+
+
+class Subscription:
+    """The messages waiting to be sent to one client, newest per key, at most `limit` of them"""
+
+    def __init__(self, loop, limit):
+        self.loop = loop
+        self.limit = limit
+        self.pending = OrderedDict()
+        self.overflowed = False
+        self.closed = False
+        self.ready = asyncio.Event()
+
+    def offer(self, key, message):
+        """Queue a message (on the subscription's loop), replacing an older one with the same key"""
+        if self.overflowed:
+            return
+        self.pending.pop(key, None)
+        self.pending[key] = message
+        if len(self.pending) > self.limit:
+            self.pending.clear()
+            self.overflowed = True
+        self.ready.set()
+
+    def close(self):
+        """Wake up get() for good, the client went away"""
+        self.closed = True
+        self.ready.set()
+
+    async def get(self, timeout=None):
+        """The next message, {'type': 'resync'} after an overflow, or None after `timeout` seconds or close()
+
+        An idle subscription is a single waiting future plus a timer, no task of its own.
+        """
+        if not self.pending and not self.overflowed:
+            self.ready.clear()
+            timer = self.loop.call_later(timeout, self.ready.set) if timeout is not None else None
+            await self.ready.wait()
+            if timer is not None:
+                timer.cancel()
+            if not self.pending and not self.overflowed:
+                return None
+        if self.closed:
+            return None
+        if self.overflowed:
+            self.overflowed = False
+            return {'type': 'resync'}
+        _, message = self.pending.popitem(last=False)
+        return message
+
+
+class Broker:
+    """The subscriptions of this process, grouped by the event loop they wait on"""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def subscribe(self):
+        """A new subscription on the running event loop"""
+        subscription = Subscription(asyncio.get_running_loop(), max_pending())
+        with self._lock:
+            self._subscriptions.setdefault(subscription.loop, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.loop, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.loop, None)
+
+    def deliver(self, message):
+        """Hand a message to every subscription. Safe to call from any thread"""
+        with self._lock:
+            groups = [(loop, list(subscriptions)) for loop, subscriptions in self._subscriptions.items()]
+        key = message.get('id')
+        # One callback per loop rather than one per subscriber
+        for loop, subscriptions in groups:
+            loop.call_soon_threadsafe(offer_all, subscriptions, key, message)
+
+
+def offer_all(subscriptions, key, message):
+    for subscription in subscriptions:
+        subscription.offer(key, message)
+
+
+broker = Broker()
+
+
+class LocalBackend:
+    """Delivers to the subscribers of this process only"""
+
+    def active(self):
+        """False when nobody could receive a message, so the app doesn't build any"""
+        return len(broker) > 0
+
+    def publish(self, message):
+        broker.deliver(message)
+
+
+_backends = {}
+
+
+def get_backend():
+    """The PUSH_BACKEND instance, one per process"""
+    path = getattr(settings, 'PUSH_BACKEND', 'levelupapi.push.LocalBackend')
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def announce(event_ids, action):
+    """Push a change to these events once the transaction making it commits"""
+    backend = get_backend()
+    if not backend.active():
+        return
+    event_ids = list(event_ids)
+    if event_ids:
+        transaction.on_commit(lambda: publish_events(backend, event_ids, action))
+
+
+def publish_events(backend, event_ids, action):
+    # pylint: disable=import-outside-toplevel
+    from levelupapi.models import Event
+
+    event_ids = list(event_ids)
+    # In chunks: renaming a game announces every one of its events
+    for start in range(0, len(event_ids), PUBLISH_CHUNK):
+        chunk = event_ids[start:start + PUBLISH_CHUNK]
+        rows = {}
+        if action != 'deleted':
+            rows = {
+                pk: (attendees, limit) for pk, attendees, limit in
+                Event.objects.filter(pk__in=chunk).values_list('id', 'attendee_count', 'game__player_limit')
+            }
+        for pk in chunk:
+            attendees, limit = rows.get(pk, (None, None))
+            backend.publish({
+                'type': 'event', 'action': action, 'id': pk,
+                'attendeeCount': attendees, 'playerLimit': limit,
+            })
+
+
+def format_event(message, counter):
+    """One server-sent event"""
+    name = message.get('type', 'event')
+    data = {key: value for key, value in message.items() if key != 'type'}
+    return f'id: {counter}\nevent: {name}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode('utf-8')
+
+
+def request_token(scope):
+    headers = dict(scope.get('headers') or [])
+    authorization = headers.get(b'authorization', b'').decode('latin-1').split()
+    if len(authorization) == 2 and authorization[0].lower() == 'token':
+        return authorization[1]
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    return (query.get('token') or [None])[0]
+
+
+async def reject(send, status, message):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps({'message': message}).encode('utf-8')})
+
+
+async def event_stream(scope, receive, send):
+    """ASGI app for GET /events/stream"""
+    if scope['method'] != 'GET':
+        await reject(send, 405, 'Method not allowed.')
+        return
+
+    key = request_token(scope)
+    if not key:
+        await reject(send, 401, 'Authentication credentials were not provided.')
+        return
+    try:
+        await sync_to_async(GamerTokenAuthentication().authenticate_credentials)(key)
+    except AuthenticationFailed as ex:
+        await reject(send, 401, str(ex.detail))
+        return
+
+    subscription = broker.subscribe()
+    # The client going away is the only thing the request body can tell us
+    watcher = asyncio.ensure_future(wait_for_disconnect(receive, subscription))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+
+        counter = 0
+        while True:
+            message = await subscription.get(heartbeat_seconds())
+            if subscription.closed:
+                break
+            if message is None:
+                # Keeps proxies from closing an idle stream
+                chunk = b': ping\n\n'
+            else:
+                counter += 1
+                chunk = format_event(message, counter)
+            # Waits while the client reads slowly: the subscription buffers meanwhile
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        broker.unsubscribe(subscription)
+        watcher.cancel()
+
+
+async def wait_for_disconnect(receive, subscription):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            subscription.close()
+            return
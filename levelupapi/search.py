@@ -0,0 +1,197 @@
+"""Full-text search over game names, event names and the names of their hosts
+
+SQLite keeps an FTS5 table next to the model tables:
+
+    levelupapi_search(title, people)    rowid = id * 2 for a game, id * 2 + 1 for an event
+
+`title` is the game or event name, `people` is the name of the gamer who created the game or
+hosts the event. It is kept in sync by the signal receivers in levelupapi/signals.py (writes that
+skip signals, like bulk_create, need `python manage.py search_index`), created after migrate by
+a post_migrate receiver, and ranked with bm25, matches in `title` weighing the most.
+
+PostgreSQL keeps the same table, kept in sync the same way, with a `document` tsvector of the two
+columns (title weighing the most) behind a GIN index, and ranks matches with ts_rank. Other
+databases fall back to a case-insensitive substring match.
+"""
+import re
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Q
+from levelupapi.models import Event, Game
+
+TABLE = 'levelupapi_search'
+KINDS = ('game', 'event')
+# bm25 weight of each column: title, people
+WEIGHTS = (10.0, 1.0)
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def uses_fts5(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == 'sqlite'
+
+
+def has_index(using=DEFAULT_DB_ALIAS):
+    """Whether the database keeps the index table: SQLite's FTS5 or PostgreSQL's tsvector"""
+    return connections[using].vendor in ('sqlite', 'postgresql')
+
+
+def terms(text):
+    """The words of a search, without any FTS syntax the client may have typed"""
+    return WORD.findall(text)
+
+
+def create_index(using=DEFAULT_DB_ALIAS):
+    """Create the index table if it doesn't exist yet"""
+    if not has_index(using):
+        return
+    with connections[using].cursor() as cursor:
+        if uses_fts5(using):
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(title, people, tokenize='unicode61')")
+            return
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {TABLE} (rowid bigint PRIMARY KEY, title text, people text, document tsvector)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {TABLE}_document ON {TABLE} USING GIN (document)')
+
+
+# Rows of the index, as (rowid, title, people), straight from the model tables
+GAME_ROWS = """
+    SELECT g.id * 2, g.name, u.first_name || ' ' || u.last_name
+    FROM levelupapi_game g
+    JOIN levelupapi_gamer gr ON g.created_by_id = gr.id
+    JOIN auth_user u ON gr.user_id = u.id
+"""
+EVENT_ROWS = """
+    SELECT e.id * 2 + 1, e.name, u.first_name || ' ' || u.last_name
+    FROM levelupapi_event e
+    JOIN levelupapi_gamer gr ON e.host_id = gr.id
+    JOIN auth_user u ON gr.user_id = u.id
+"""
+
+# The tsvector of a PostgreSQL index row
+DOCUMENT = "setweight(to_tsvector(coalesce(title, '')), 'A') || setweight(to_tsvector(coalesce(people, '')), 'B')"
+
+REINDEX_CHUNK = 500
+
+
+def insert_rows(rows, using=DEFAULT_DB_ALIAS):
+    """INSERT into the index of the (rowid, title, people) rows of a SELECT"""
+    if uses_fts5(using):
+        return f'INSERT INTO {TABLE} (rowid, title, people) {rows}'
+    return (f'INSERT INTO {TABLE} (rowid, title, people, document) '
+            f'SELECT rowid, title, people, {DOCUMENT} FROM ({rows}) AS indexed (rowid, title, people)')
+
+
+def rebuild_index(using=DEFAULT_DB_ALIAS):
+    """Refill the whole index from the model tables. Returns the number of rows indexed"""
+    if not has_index(using):
+        return 0
+    create_index(using)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(insert_rows(GAME_ROWS, using))
+        cursor.execute(insert_rows(EVENT_ROWS, using))
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def reindex(games=(), events=()):
+    """Write the index rows of these game and event ids again (deleted ones are dropped)"""
+    if not has_index():
+        return
+    games, events = list(games), list(events)
+    with connection.cursor() as cursor:
+        for all_ids, rows, offset in ((games, GAME_ROWS, 0), (events, EVENT_ROWS, 1)):
+            # In chunks, SQLite takes a limited number of query parameters
+            for start in range(0, len(all_ids), REINDEX_CHUNK):
+                ids = all_ids[start:start + REINDEX_CHUNK]
+                marks = ', '.join(['%s'] * len(ids))
+                rowids = [pk * 2 + offset for pk in ids]
+                alias = 'g' if offset == 0 else 'e'
+                cursor.execute(f'DELETE FROM {TABLE} WHERE rowid IN ({marks})', rowids)
+                cursor.execute(insert_rows(f'{rows} WHERE {alias}.id IN ({marks})'), ids)
+
+
+def search(text, kind=None, prefix=False, limit=20, offset=0):
+    """Ranked matches for `text`, best first
+
+    Arguments:
+        text -- What the client typed, every word has to match
+        kind -- 'game' or 'event' to only search one of them
+        prefix -- Typeahead mode: the last word matches as a prefix ("mono" finds "Monopoly")
+        limit, offset -- The page of results
+
+    Returns:
+        list -- dicts with type, id, name, host and rank; one more than `limit` when there is a next page
+    """
+    words = terms(text)
+    if not words:
+        return []
+    if uses_fts5():
+        return _search_fts5(words, kind, prefix, limit, offset)
+    if connection.vendor == 'postgresql':
+        return _search_postgres(words, kind, prefix, limit, offset)
+    return _search_substring(words, kind, limit, offset)
+
+
+def _search_fts5(words, kind, prefix, limit, offset):
+    quoted = ['"{}"'.format(word.replace('"', '""')) for word in words]
+    if prefix:
+        quoted[-1] += '*'
+    where = ''
+    if kind in KINDS:
+        where = f'AND rowid % 2 = {KINDS.index(kind)}'
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT rowid, title, people, bm25({TABLE}, %s, %s) AS rank
+            FROM {TABLE}
+            WHERE {TABLE} MATCH %s {where}
+            ORDER BY rank
+            LIMIT %s OFFSET %s
+        """, [*WEIGHTS, ' '.join(quoted), limit + 1, offset])
+        return [
+            {'type': KINDS[rowid % 2], 'id': rowid // 2, 'name': title, 'host': people, 'rank': -rank}
+            for rowid, title, people, rank in cursor.fetchall()
+        ]
+
+
+def _search_postgres(words, kind, prefix, limit, offset):
+    escaped = [word.replace("'", "''") for word in words]
+    if prefix:
+        escaped[-1] += ':*'
+    where = ''
+    if kind in KINDS:
+        where = f'AND rowid % 2 = {KINDS.index(kind)}'
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT rowid, title, people, ts_rank(document, query) AS rank
+            FROM {TABLE}, to_tsquery(%s) query
+            WHERE document @@ query {where}
+            ORDER BY rank DESC, rowid
+            LIMIT %s OFFSET %s
+        """, [' & '.join(escaped), limit + 1, offset])
+        return [
+            {'type': KINDS[rowid % 2], 'id': rowid // 2, 'name': title, 'host': people, 'rank': rank}
+            for rowid, title, people, rank in cursor.fetchall()
+        ]
+
+
+def _search_substring(words, kind, limit, offset):
+    matches = []
+    for model, person in ((Game, 'created_by__user'), (Event, 'host__user')):
+        type_name = model._meta.model_name
+        if kind in KINDS and kind != type_name:
+            continue
+        rows = model.objects.select_related(person)
+        for word in words:
+            rows = rows.filter(
+                Q(name__icontains=word)
+                | Q(**{f'{person}__first_name__icontains': word})
+                | Q(**{f'{person}__last_name__icontains': word}))
+        for row in rows.order_by('id')[:offset + limit + 1]:
+            user = getattr(row, person.split('__')[0]).user
+            matches.append({'type': type_name, 'id': row.id, 'name': row.name,
+                            'host': f'{user.first_name} {user.last_name}', 'rank': 0})
+    return matches[offset:offset + limit + 1]
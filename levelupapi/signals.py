@@ -0,0 +1,363 @@
+"""Signal receivers that keep the caches and counters in levelupapi in sync with the database"""
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from levelupapi.authentication import token_cache
+from levelupapi.lookups import gametype_lookup, status_lookup
+from levelupapi.models import Event, Game, Gamer, Gametype, Status
+from levelupapi.profile_cache import invalidate_profiles, timeout as profile_cache_timeout
+from levelupapi import metrics, profiling, search
+from levelupapi.changes import log_changes, log_signups
+from levelupapi.push import announce
+
+
+def invalidate_lookup(lookup):
+    """Drop the cached rows now, for the rest of this transaction, and again once it commits:
+    a request reading the table in between reloads the rows from before the change"""
+    lookup.invalidate(broadcast=False)
+    transaction.on_commit(lookup.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Gametype)
+def gametype_changed(sender, **kwargs):
+    """Drop the cached game types when one is created, edited or removed"""
+    invalidate_lookup(gametype_lookup)
+
+
+@receiver([post_save, post_delete], sender=Status)
+def status_changed(sender, **kwargs):
+    """Drop the cached statuses when one is created, edited or removed"""
+    invalidate_lookup(status_lookup)
+
+
+# Game.event_count
+# Every change is a single UPDATE ... SET event_count = event_count +/- 1,
+# so concurrent requests can't overwrite each other's counts
+
+def add_to_event_count(game_id, amount):
+    Game.objects.filter(pk=game_id).update(event_count=F('event_count') + amount, updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=Event)
+def event_saving(sender, instance, **kwargs):
+    """Remember the game and host of an existing event, in case it moves to another one"""
+    if instance.pk is not None:
+        instance._previous_game_id, instance._previous_host_id = (
+            Event.objects.filter(pk=instance.pk).values_list('game_id', 'host_id').first() or (None, None))
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created, **kwargs):
+    """Count a new event, or move the count when an event changes game"""
+    if created:
+        add_to_event_count(instance.game_id, 1)
+        return
+
+    previous_game_id = getattr(instance, '_previous_game_id', None)
+    if previous_game_id is not None and previous_game_id != instance.game_id:
+        add_to_event_count(previous_game_id, -1)
+        add_to_event_count(instance.game_id, 1)
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    """Uncount a deleted event"""
+    add_to_event_count(instance.game_id, -1)
+
+
+# Event.attendee_count
+# The sign-up views write the join table directly and keep the count themselves;
+# these receivers cover everything else that uses .add()/.remove()/.clear() (admin, shell, tests)
+
+@receiver(m2m_changed, sender=Gamer.signed_up_events.through)
+def attendees_changing(sender, instance, action, reverse, pk_set, **kwargs):
+    """Remember which join rows a .remove() or .clear() is about to delete: pk_set is empty for
+    clear(), and remove() lists every id it was given, joined or not"""
+    if action not in ('pre_remove', 'pre_clear'):
+        return
+    rows = sender.objects.filter(**{'event' if reverse else 'gamer': instance})
+    if action == 'pre_remove':
+        rows = rows.filter(**{'gamer_id__in' if reverse else 'event_id__in': pk_set})
+    instance._removed_attendees = list(rows.values_list('gamer_id' if reverse else 'event_id', flat=True))
+
+
+def changed_ids(instance, action, pk_set):
+    """The ids a post_add, post_remove or post_clear actually added or removed"""
+    if action in ('post_remove', 'post_clear'):
+        return getattr(instance, '_removed_attendees', [])
+    return pk_set or []
+
+
+@receiver(m2m_changed, sender=Gamer.signed_up_events.through)
+def attendees_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Follow gamers being added to or removed from events through the ORM relation"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    amount = 1 if action == 'post_add' else -1
+    pk_set = changed_ids(instance, action, pk_set)
+
+    if not pk_set:
+        return
+    if reverse:
+        # event.signed_up_by.add(gamer, ...)
+        Event.objects.filter(pk=instance.pk).update(
+            attendee_count=F('attendee_count') + amount * len(pk_set), updated_at=timezone.now())
+    else:
+        # gamer.signed_up_events.add(event, ...)
+        Event.objects.filter(pk__in=pk_set).update(
+            attendee_count=F('attendee_count') + amount, updated_at=timezone.now())
+
+
+# Game.updated_at and Event.updated_at (the ETags in levelupapi/conditional.py)
+# auto_now covers saving the row itself; these bump the rows that show a related object
+# when that object changes, eg. the events of a renamed game
+
+def touch(queryset):
+    if queryset.model is Event:
+        event_ids = list(queryset.values_list('id', flat=True))
+        log_changes(event_ids)
+        announce(event_ids, 'updated')
+    queryset.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Game)
+def game_saved_touch(sender, instance, created, **kwargs):
+    if not created:
+        touch(Event.objects.filter(game=instance))
+
+
+# The fields of a user that events show of their host, and expanded games of their creator
+HOST_FIELDS = ('first_name', 'last_name', 'email')
+CREATOR_FIELDS = ('first_name', 'last_name', 'username')
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    """Remember the shown fields of an existing user, so a save that changes none of them
+    (last_login, a rehashed password) doesn't touch their events and games"""
+    fields = [name for name in {*HOST_FIELDS, *CREATOR_FIELDS} if update_fields is None or name in update_fields]
+    instance._previous_fields = {}
+    if instance.pk is not None and fields:
+        instance._previous_fields = User.objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+def user_changed(instance, fields):
+    """Whether the save changed one of these fields of the user"""
+    previous = getattr(instance, '_previous_fields', {})
+    return any(name in previous and previous[name] != getattr(instance, name) for name in fields)
+
+
+@receiver(post_save, sender=User)
+def user_saved_touch(sender, instance, created, **kwargs):
+    """Events show their host's name and email, expanded games their creator's name"""
+    if created:
+        return
+    if user_changed(instance, HOST_FIELDS):
+        touch(Event.objects.filter(host__user=instance))
+    if user_changed(instance, CREATOR_FIELDS):
+        touch(Game.objects.filter(created_by__user=instance))
+
+
+@receiver(post_save, sender=Gamer)
+def gamer_saved_touch(sender, instance, created, **kwargs):
+    """Expanded games show their creator's bio"""
+    if not created:
+        touch(Game.objects.filter(created_by=instance))
+
+
+@receiver(post_save, sender=Gametype)
+def gametype_saved_touch(sender, instance, created, **kwargs):
+    if not created:
+        touch(Game.objects.filter(gametype=instance))
+
+
+@receiver(post_save, sender=Status)
+def status_saved_touch(sender, instance, created, **kwargs):
+    if not created:
+        touch(Event.objects.filter(status=instance))
+
+
+# The /events/changes log (levelupapi/changes.py)
+
+@receiver([post_save, post_delete], sender=Event)
+def event_changed_log(sender, instance, **kwargs):
+    log_changes([instance.pk])
+
+
+@receiver(m2m_changed, sender=Gamer.signed_up_events.through)
+def attendees_changed_log(sender, instance, action, reverse, pk_set, **kwargs):
+    """Joining or leaving through .add()/.remove()/.clear() changes `joined` for those gamers"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    pk_set = changed_ids(instance, action, pk_set)
+    if reverse:
+        # event.signed_up_by.add(gamer, ...)
+        log_signups((instance.pk, gamer_id) for gamer_id in pk_set)
+    else:
+        # gamer.signed_up_events.add(event, ...)
+        log_signups((event_id, instance.pk) for event_id in pk_set)
+
+
+# Live updates on /events/stream (levelupapi/push.py)
+
+@receiver(post_save, sender=Event)
+def event_saved_push(sender, instance, created, **kwargs):
+    announce([instance.pk], 'created' if created else 'updated')
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted_push(sender, instance, **kwargs):
+    announce([instance.pk], 'deleted')
+
+
+@receiver(m2m_changed, sender=Gamer.signed_up_events.through)
+def attendees_changed_push(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    pk_set = changed_ids(instance, action, pk_set)
+    if pk_set:
+        # event.signed_up_by.add(gamer, ...) changes one event, gamer.signed_up_events.add(event, ...) these events
+        announce([instance.pk] if reverse else pk_set, 'attendance')
+
+
+# Cached /profile documents (levelupapi/profile_cache.py)
+# A profile shows the events the gamer attends and hosts, with their game's name
+
+def attendee_ids(event_ids):
+    return Gamer.signed_up_events.through.objects.filter(
+        event_id__in=event_ids).values_list('gamer_id', flat=True)
+
+
+@receiver(post_save, sender=Event)
+def event_saved_profiles(sender, instance, created, **kwargs):
+    """A new event only shows on its host's profile, an edited one on its attendees' too"""
+    if not profile_cache_timeout():
+        return
+    gamer_ids = [instance.host_id, getattr(instance, '_previous_host_id', None)]
+    if not created:
+        gamer_ids += attendee_ids([instance.pk])
+    invalidate_profiles(gamer_id for gamer_id in gamer_ids if gamer_id is not None)
+
+
+@receiver(pre_delete, sender=Event)
+def event_deleting_profiles(sender, instance, **kwargs):
+    """The join table rows are gone by post_delete, so collect the attendees now"""
+    if profile_cache_timeout():
+        invalidate_profiles([instance.host_id, *attendee_ids([instance.pk])])
+
+
+@receiver(post_save, sender=Game)
+def game_saved_profiles(sender, instance, created, **kwargs):
+    """A renamed game shows on the profile of everyone hosting or attending one of its events"""
+    if created or not profile_cache_timeout():
+        return
+    events = Event.objects.filter(game=instance)
+    gamer_ids = list(events.values_list('host_id', flat=True))
+    gamer_ids += attendee_ids(events.values('id'))
+    invalidate_profiles(gamer_ids)
+
+
+@receiver(post_save, sender=Gamer)
+def gamer_saved_profiles(sender, instance, **kwargs):
+    invalidate_profiles([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def user_saved_profiles(sender, instance, created, **kwargs):
+    if created or not profile_cache_timeout():
+        return
+    invalidate_profiles(Gamer.objects.filter(user=instance).values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Gamer.signed_up_events.through)
+def attendees_changed_profiles(sender, instance, action, reverse, pk_set, **kwargs):
+    """Joining or leaving through .add()/.remove()/.clear()"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    pk_set = changed_ids(instance, action, pk_set)
+    if not reverse:
+        # gamer.signed_up_events.add(event, ...)
+        if pk_set:
+            invalidate_profiles([instance.pk])
+    else:
+        # event.signed_up_by.add(gamer, ...)
+        invalidate_profiles(pk_set)
+
+
+# Cached tokens (levelupapi/authentication.py)
+
+@receiver(post_delete, sender=Token)
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Gamer)
+def forget_cached_tokens(sender, instance, **kwargs):
+    """The token was revoked, or the user or gamer changed (eg. deactivated): look them up again"""
+    user_id = instance.pk if sender is User else instance.user_id
+    # Now in this process, and for every worker once the change commits (see invalidate_lookup)
+    token_cache.discard_user(user_id, broadcast=False)
+    transaction.on_commit(lambda: token_cache.discard_user(user_id))
+
+
+# The search index (levelupapi/search.py)
+
+@receiver(post_migrate)
+def create_search_index(sender, using, **kwargs):
+    """Create the index with the tables, and fill it when it's added to a database that has data"""
+    if sender.name != 'levelupapi' or not search.has_index(using):
+        return
+    tables = set(connections[using].introspection.table_names())
+    if search.TABLE in tables:
+        return
+    if {Game._meta.db_table, Event._meta.db_table, User._meta.db_table} <= tables:
+        search.rebuild_index(using)
+    else:
+        # migrated back to before the models existed
+        search.create_index(using)
+
+
+@receiver([post_save, post_delete], sender=Game)
+def game_changed_search(sender, instance, **kwargs):
+    search.reindex(games=[instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Event)
+def event_changed_search(sender, instance, **kwargs):
+    search.reindex(events=[instance.pk])
+
+
+@receiver(post_save, sender=User)
+def user_saved_search(sender, instance, created, **kwargs):
+    """A renamed user shows on the games they made and the events they host"""
+    if created or not search.has_index() or not user_changed(instance, ('first_name', 'last_name')):
+        return
+    search.reindex(
+        games=Game.objects.filter(created_by__user=instance).values_list('id', flat=True),
+        events=Event.objects.filter(host__user=instance).values_list('id', flat=True))
+
+
+# bulk_create() and bulk_update() send no signals, the batch write view (POST /games/batch)
+# calls these instead with the ids of the games it wrote
+
+def games_created(game_ids):
+    search.reindex(games=game_ids)
+
+
+def games_updated(game_ids):
+    """What the post_save receivers do for an edited game, for many games at once"""
+    events = Event.objects.filter(game_id__in=game_ids)
+    if profile_cache_timeout():
+        invalidate_profiles([*events.values_list('host_id', flat=True), *attendee_ids(events.values('id'))])
+    touch(events)
+    search.reindex(games=game_ids)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Count the queries of every request in the metrics (levelupapi/metrics.py), and record
+    those of the requests being profiled (levelupapi/profiling.py)"""
+    metrics.instrument(connection)
+    profiling.instrument(connection)
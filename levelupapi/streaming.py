@@ -0,0 +1,75 @@
+"""Streaming export mode for the large list endpoints
+
+`?stream=1` (a JSON array) or `?stream=ndjson` (one JSON object per line) on /events and /games
+walks the queryset with `.iterator()` and serializes it a chunk at a time, so only one chunk of
+model instances and rendered bytes is held in memory no matter how many rows there are.
+The bytes are the same camelCase JSON the regular renderer sends back.
+
+Under ASGI the export is rendered the same way but sent in one piece: Django 3.2's ASGI handler
+reads a streamed body on the event loop, where the queryset can't be read.
+"""
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from levelupapi.camel_case import CamelCaseJSONRenderer
+
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_stream(request):
+    """True when the client asked for the streaming export mode"""
+    return request.query_params.get('stream', '') not in ('', '0', 'false')
+
+
+def stream_response(request, queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+    """Build a StreamingHttpResponse that serializes `queryset` in chunks
+
+    Arguments:
+        request -- The full HTTP request object
+        queryset -- Queryset to export, with any select_related/annotations already applied
+        serializer_class -- ModelSerializer used for each row
+        chunk_size -- Rows fetched from the database and rendered per chunk
+    """
+    if request.query_params.get('stream') == 'ndjson':
+        chunks, content_type = _ndjson(request, queryset, serializer_class, chunk_size), 'application/x-ndjson'
+    else:
+        chunks, content_type = _json_array(request, queryset, serializer_class, chunk_size), 'application/json'
+
+    if isinstance(request._request, ASGIRequest):  # pylint: disable=protected-access
+        # Read every chunk here, in the view's thread
+        return HttpResponse(b''.join(chunks), content_type=content_type)
+    return StreamingHttpResponse(chunks, content_type=content_type)
+
+
+def _chunks(queryset, chunk_size):
+    chunk = []
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(instance)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _json_array(request, queryset, serializer_class, chunk_size):
+    renderer = CamelCaseJSONRenderer()
+    context = {'request': request}
+    first = True
+
+    yield b'['
+    for chunk in _chunks(queryset, chunk_size):
+        data = serializer_class(chunk, many=True, context=context).data
+        # Render the chunk as an array and drop its brackets, so the chunks join into one array
+        body = renderer.render(data)[1:-1]
+        yield body if first else b',' + body
+        first = False
+    yield b']'
+
+
+def _ndjson(request, queryset, serializer_class, chunk_size):
+    renderer = CamelCaseJSONRenderer()
+    context = {'request': request}
+
+    for chunk in _chunks(queryset, chunk_size):
+        data = serializer_class(chunk, many=True, context=context).data
+        yield b''.join(renderer.render(row) + b'\n' for row in data)
@@ -0,0 +1,166 @@
+"""Synthetic datasets for benchmarks and load tests: `python manage.py generate_data`
+
+Adds gamers (users with tokens), games and events at any scale, inserted with bulk_create a
+batch at a time: only the batch and the list of games are held in memory, however many events
+are asked for. The data is shaped like real usage rather than uniform:
+
+- a few gamers do most things: who creates a game, hosts an event or signs up is drawn with
+  weight 1 / rank ** skew (a Zipf distribution), so the top gamers have big profiles
+- games get events with the same skew, a few have thousands and most have a handful
+- sign-ups per event follow an exponential distribution around `signups`, capped by the
+  game's player_limit, so some events are full and many are nearly empty
+- events are spread over a year around today, the past ones closed
+
+The same seed gives the same data. Rows get the ids after the highest ones in the database,
+and since bulk_create sends no signals, the sequences, counters, search index and /events/changes
+log are brought up to date at the end (levelupapi.bulkload.refresh).
+"""
+import random
+from datetime import timedelta
+from itertools import accumulate, islice
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from levelupapi.bulkload import refresh
+from levelupapi.models import Event, Game, Gamer, Gametype, Status
+
+FIRST_NAMES = ['Ada', 'Ben', 'Cleo', 'Dev', 'Emma', 'Finn', 'Gia', 'Hugo', 'Iris', 'Jon',
+               'Kai', 'Lena', 'Milo', 'Nora', 'Omar', 'Pia', 'Quinn', 'Rosa', 'Sam', 'Tess']
+LAST_NAMES = ['Adams', 'Brown', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Ito',
+              'Jones', 'Kim', 'Lopez', 'Moreau', 'Novak', 'Okafor', 'Patel', 'Rossi', 'Silva']
+GAME_WORDS = (
+    ['Settlers', 'Lords', 'Castles', 'Tickets', 'Dragons', 'Pirates', 'Empires', 'Gardens',
+     'Rivers', 'Towers', 'Spies', 'Robots', 'Wizards', 'Trains', 'Islands', 'Mysteries'],
+    ['of', 'and', 'in', 'versus', 'under', 'beyond'],
+    ['Catan', 'the Realm', 'Waterdeep', 'Mars', 'the Deep', 'Avalon', 'Europe', 'the North',
+     'Venice', 'the Moon', 'Carcassonne', 'Arkham', 'Tokyo', 'the Forest', 'Atlantis', 'Giza'],
+)
+EVENT_NAMES = ['{} night', 'Casual {}', '{} tournament', '{} for beginners', 'Weekend {}', '{} marathon']
+PLAYER_LIMITS = [2, 4, 4, 4, 5, 6, 6, 8, 10, 12]
+GAMETYPES = ['Board game', 'Role-playing game', 'MMO game', 'Card game']
+STATUSES = ['Open for signing up', 'In Progress', 'Closed']
+
+
+def batches(rows, size):
+    """Lists of at most `size` of the rows from an iterator"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+class Skewed:
+    """Draws from `ids` with weight 1 / rank ** skew, in a random rank order"""
+
+    def __init__(self, rng, ids, skew):
+        self.rng = rng
+        self.ids = list(ids)
+        rng.shuffle(self.ids)
+        self.cum_weights = list(accumulate(1 / (rank + 1) ** skew for rank in range(len(self.ids))))
+
+    def pick(self, k=1):
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights, k=k)
+
+
+def generate(gamers, games, events, signups=3.0, skew=1.1, seed=42, batch_size=10000, progress=None):
+    """Add this many gamers, games and events, with about `signups` gamers signed up per event
+
+    Arguments:
+        skew -- Exponent of the Zipf distribution, 0 for uniform
+        progress -- Called with a message after every batch
+
+    Returns:
+        dict -- The number of rows added to each table
+    """
+    rng = random.Random(seed)
+    report = progress or (lambda message: None)
+    added = {'gamers': 0, 'games': 0, 'events': 0, 'signups': 0}
+
+    with transaction.atomic():
+        gametype_ids = ensure_rows(Gametype, 'label', GAMETYPES)
+        statuses = ensure_rows(Status, 'title', STATUSES)
+        status_open, status_playing, status_closed = statuses[0], statuses[min(1, len(statuses) - 1)], statuses[-1]
+
+        # Gamers: a user, its gamer and a token each
+        first_id = next_id(User)
+        gamer_id = next_id(Gamer)
+        for batch in batches(range(gamers), batch_size):
+            users = [
+                User(pk=first_id + i, username=f'gamer{first_id + i}', password='!',
+                     first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                     email=f'gamer{first_id + i}@example.com')
+                for i in batch
+            ]
+            User.objects.bulk_create(users)
+            Gamer.objects.bulk_create([Gamer(pk=gamer_id + i, user_id=first_id + i, bio='') for i in batch])
+            Token.objects.bulk_create([Token(key=Token.generate_key(), user_id=user.pk) for user in users])
+            added['gamers'] += len(batch)
+            report(f'{added["gamers"]} gamers')
+
+        all_gamers = Skewed(rng, Gamer.objects.values_list('id', flat=True), skew)
+        if not all_gamers.ids:
+            games = events = 0
+
+        # Games
+        first_id = next_id(Game)
+        for batch in batches(range(games), batch_size):
+            creators = all_gamers.pick(len(batch))
+            Game.objects.bulk_create([
+                Game(pk=first_id + i, name=game_name(rng), player_limit=rng.choice(PLAYER_LIMITS),
+                     gametype_id=rng.choice(gametype_ids), created_by_id=creator)
+                for i, creator in zip(batch, creators)
+            ])
+            added['games'] += len(batch)
+            report(f'{added["games"]} games')
+
+        game_rows = {pk: (name, limit) for pk, name, limit in Game.objects.values_list('id', 'name', 'player_limit')}
+        all_games = Skewed(rng, game_rows, skew)
+        if not all_games.ids:
+            events = 0
+
+        # Events, with their sign-ups
+        now = timezone.now()
+        first_id = next_id(Event)
+        through = Gamer.signed_up_events.through
+        for batch in batches(range(events), batch_size):
+            rows, attendees = [], []
+            for i, game_id, host_id in zip(batch, all_games.pick(len(batch)), all_gamers.pick(len(batch))):
+                name, player_limit = game_rows[game_id]
+                time = now + timedelta(minutes=rng.randrange(-182 * 24 * 60, 182 * 24 * 60))
+                wanted = min(player_limit, round(rng.expovariate(1 / signups))) if signups > 0 else 0
+                joined = list(dict.fromkeys(all_gamers.pick(wanted)))
+                status_id = status_closed if time < now else (status_open if rng.random() < 0.9 else status_playing)
+                rows.append(Event(
+                    pk=first_id + i, name=rng.choice(EVENT_NAMES).format(name)[:55], time=time,
+                    game_id=game_id, host_id=host_id, status_id=status_id, attendee_count=len(joined)))
+                attendees += [through(event_id=first_id + i, gamer_id=gamer) for gamer in joined]
+            Event.objects.bulk_create(rows)
+            through.objects.bulk_create(attendees)
+            added['events'] += len(rows)
+            added['signups'] += len(attendees)
+            report(f'{added["events"]} events, {added["signups"]} sign-ups')
+
+        refresh([User, Gamer, Token, Game, Event, Gamer.signed_up_events.through],
+                event_ids=range(first_id, first_id + added['events']))
+    return added
+
+
+def ensure_rows(model, field, values):
+    """Ids of the rows of a lookup table, after creating the default ones when it's empty"""
+    if not model.objects.exists():
+        model.objects.bulk_create([model(**{field: value}) for value in values])
+    return list(model.objects.order_by('id').values_list('id', flat=True))
+
+
+def game_name(rng):
+    first, joiner, last = (rng.choice(words) for words in GAME_WORDS)
+    return f'{first} {joiner} {last}'
+
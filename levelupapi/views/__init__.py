@@ -1,6 +1,8 @@
 from .auth import login_user
 from .auth import register_user
+from .metrics import prometheus_metrics
 from .gametype import GameTypeView
 from .game import GameView
 from .event import EventView
 from .profile import ProfileView
+from .search import SearchView
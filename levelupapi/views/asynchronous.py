@@ -0,0 +1,228 @@
+"""Async versions of the read endpoints, for when the app runs under ASGI (levelup/asgi.py)
+
+    GET /games, /games/<id>, /events, /events/<id>, /gameTypes, /gameTypes/<id>, /profile
+
+Under ASGI every sync view runs from start to end on the single thread Django keeps for sync
+code, so concurrent requests queue behind each other's queries, serialization and rendering.
+These views send back the same JSON, with the same query params, ETags and errors as the
+ViewSets, but only the queries go to that thread (levelupapi/aorm.py). Token lookups from the
+token cache, the cached game types and profiles, serialization and rendering stay on the event
+loop, and the loop serves other requests while a query runs.
+
+async_read_middleware (levelupapi/middleware.py) routes an ASGI server's GET requests here
+through levelup/urls_async.py; writes, streaming exports (?stream=) and the browsable API
+stay on the ViewSets, as does everything under WSGI.
+"""
+import functools
+from django.http import HttpResponse, HttpResponseServerError
+from rest_framework import exceptions, status
+from rest_framework.authentication import get_authorization_header
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from levelupapi import aorm
+from levelupapi.authentication import GamerTokenAuthentication, token_cache
+from levelupapi.conditional import aqueryset_validators, etag_matches, with_validators
+from levelupapi.lookups import gametype_lookup
+from levelupapi.models import Event, Game, Gametype
+from levelupapi.pagination import get_paginator
+from levelupapi.profile_cache import get_profile, set_profile
+from levelupapi.views.event import EventSerializer, annotate_joined, events_queryset
+from levelupapi.views.game import GameSerializer, games_queryset
+from levelupapi.views.gametype import GameTypeSerializer
+from levelupapi.views.profile import build_profile, profile_events
+
+
+def renderer():
+    """The first DEFAULT_RENDERER_CLASSES, the camelCase JSON renderer the ViewSets answer with"""
+    return api_settings.DEFAULT_RENDERER_CLASSES[0]()
+
+
+def render(request, data, status_code=status.HTTP_200_OK, headers=None):
+    body = request.accepted_renderer.render(data, request.accepted_media_type, {'request': request})
+    response = HttpResponse(body, status=status_code, content_type=request.accepted_media_type)
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    return with_validators(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+
+async def authenticate(http_request):
+    """Wrap the request like a ViewSet sees it, with the token's user, token and gamer
+
+    Raises:
+        APIException -- NotAuthenticated or AuthenticationFailed, like DRF would
+    """
+    request = Request(http_request)
+    request.accepted_renderer = renderer()
+    request.accepted_media_type = request.accepted_renderer.media_type
+
+    authentication = GamerTokenAuthentication()
+    header = get_authorization_header(http_request).split()
+    if not header or header[0].lower() != authentication.keyword.lower().encode():
+        raise exceptions.NotAuthenticated()
+    if len(header) != 2:
+        raise exceptions.AuthenticationFailed('Invalid token header.')
+    try:
+        key = header[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed('Invalid token header.')
+
+    # The token from this one lookup: looking again could miss, and query the database on the loop
+    token = token_cache.get(key)
+    if token is not None:
+        user, token = authentication.authenticate_token(token)
+    else:
+        user, token = await aorm.run(authentication.authenticate_credentials, key)
+    request.user, request.auth = user, token
+    request.gamer = getattr(user, 'gamer', None)
+    return request
+
+
+def read_view(view):
+    """Authenticate, and turn DRF's exceptions into the responses DRF would send"""
+    @functools.wraps(view)
+    async def wrapper(http_request, *args, **kwargs):
+        try:
+            request = await authenticate(http_request)
+            return await view(request, *args, **kwargs)
+        except exceptions.APIException as ex:
+            request = Request(http_request)
+            request.accepted_renderer = renderer()
+            request.accepted_media_type = request.accepted_renderer.media_type
+            headers = {}
+            if isinstance(ex, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                headers['WWW-Authenticate'] = GamerTokenAuthentication().authenticate_header(request)
+            return render(request, {'detail': ex.detail}, ex.status_code, headers)
+    return wrapper
+
+
+async def paginated(request, paginator, queryset, serializer_class):
+    page = await aorm.run(paginator.paginate_queryset, queryset, request)
+    serializer = serializer_class(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data).data
+
+
+@read_view
+async def game_list(request):
+    """GameView.list"""
+    games = games_queryset(request)
+    etag, last_modified = await aqueryset_validators(request, games)
+    if etag_matches(request, etag):
+        return not_modified(etag, last_modified)
+
+    paginator = get_paginator(request, ordering=('id',))
+    if paginator is not None:
+        data = await paginated(request, paginator, games, GameSerializer)
+    else:
+        data = GameSerializer(await aorm.alist(games), many=True, context={'request': request}).data
+    return with_validators(render(request, data), etag, last_modified)
+
+
+@read_view
+async def game_detail(request, pk):
+    """GameView.retrieve"""
+    try:
+        etag, last_modified = await aqueryset_validators(request, Game.objects.filter(pk=pk))
+        if etag_matches(request, etag):
+            return not_modified(etag, last_modified)
+
+        games = GameSerializer.select_related(Game.objects.all(), request)
+        game = await aorm.aget(games, pk=pk)
+        data = GameSerializer(game, context={'request': request}).data
+        return with_validators(render(request, data), etag, last_modified)
+
+    except Game.DoesNotExist as ex:
+        return render(request, {'message': ex.args[0]}, status.HTTP_404_NOT_FOUND)
+
+    except Exception as ex:  # pylint: disable=broad-except
+        return HttpResponseServerError(ex)
+
+
+@read_view
+async def event_list(request):
+    """EventView.list"""
+    try:
+        events = events_queryset(request)
+    except ValueError as ex:
+        return render(request, {'message': ex.args[0]}, status.HTTP_400_BAD_REQUEST)
+
+    etag, last_modified = await aqueryset_validators(request, events, request.gamer.id)
+    if etag_matches(request, etag):
+        return not_modified(etag, last_modified)
+
+    events = annotate_joined(events, request.gamer)
+    paginator = get_paginator(request, ordering=('time', 'id'))
+    if paginator is not None:
+        data = await paginated(request, paginator, events, EventSerializer)
+    else:
+        data = EventSerializer(await aorm.alist(events), many=True, context={'request': request}).data
+    return with_validators(render(request, data), etag, last_modified)
+
+
+@read_view
+async def event_detail(request, pk):
+    """EventView.retrieve"""
+    try:
+        etag, last_modified = await aqueryset_validators(request, Event.objects.filter(pk=pk))
+        if etag_matches(request, etag):
+            return not_modified(etag, last_modified)
+
+        event = await aorm.aget(Event.objects.select_related('host__user', 'game', 'status'), pk=pk)
+        data = EventSerializer(event, context={'request': request}).data
+        return with_validators(render(request, data), etag, last_modified)
+
+    except Exception as ex:  # pylint: disable=broad-except
+        return HttpResponseServerError(ex)
+
+
+async def gametypes():
+    """(game types, ETag), from memory when the lookup cache is current"""
+    cached = gametype_lookup.cached()
+    if cached is None:
+        cached = await aorm.run(lambda: (gametype_lookup.all(), gametype_lookup.etag()))
+    return cached
+
+
+@read_view
+async def gametype_list(request):
+    """GameTypeView.list"""
+    rows, etag = await gametypes()
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    paginator = get_paginator(request, ordering=('id',))
+    if paginator is not None:
+        data = await paginated(request, paginator, Gametype.objects.all(), GameTypeSerializer)
+    else:
+        data = GameTypeSerializer(rows, many=True, context={'request': request}).data
+    return with_validators(render(request, data), etag)
+
+
+@read_view
+async def gametype_detail(request, pk):
+    """GameTypeView.retrieve"""
+    try:
+        rows, _ = await gametypes()
+        game_type = next((row for row in rows if row.pk == int(pk)), None)
+        if game_type is None:
+            game_type = await aorm.run(gametype_lookup.get, pk)
+        return render(request, GameTypeSerializer(game_type, context={'request': request}).data)
+
+    except Exception as ex:  # pylint: disable=broad-except
+        return HttpResponseServerError(ex)
+
+
+@read_view
+async def profile(request):
+    """ProfileView.list"""
+    gamer = request.gamer
+    cached = get_profile(gamer.id)
+    if cached is not None:
+        return render(request, cached)
+
+    document = build_profile(request, gamer, await aorm.alist(profile_events(gamer)))
+    set_profile(gamer.id, document)
+    return render(request, document)
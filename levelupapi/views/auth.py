@@ -1,11 +1,13 @@
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 
+from levelupapi.authentication import token_cache
 from levelupapi.models import Gamer
 
 @api_view(['POST'])
@@ -23,16 +25,20 @@ def login_user(request):
 
     # Use the built-in authenticate method to verify
     # authenticate returns the user object or None if no user is found
+    # (if the stored hash uses older hasher settings, it is upgraded here, see PASSWORD_HASHERS)
     authenticated_user = authenticate(username=username, password=password)
 
     # If authentication was successful, respond with their token
     if authenticated_user is not None:
-        token = Token.objects.get(user=authenticated_user)
+        # The token and the gamer in one query
+        token = Token.objects.select_related('user__gamer').get(user=authenticated_user)
+        # The client's next requests use this token, so the authentication can skip its lookup
+        token_cache.set(token.key, token)
         data = {
             'valid': True,
             'token': token.key,
             # 'user_id': authenticated_user.id  ❗️wrong!!! should always point to the actual gamer object 👇
-            'gamer_id': authenticated_user.gamer.id
+            'gamer_id': token.user.gamer.id
         }
         return Response(data)
     else:
@@ -49,24 +55,34 @@ def register_user(request):
       request -- The full HTTP request object
     '''
 
-    # Create a new user by invoking the `create_user` helper method
-    # on Django's built-in User model
-    new_user = User.objects.create_user(
-        username=request.data['username'],
-        email=request.data['email'],
-        password=request.data['password'],
-        first_name=request.data['first_name'],
-        last_name=request.data['last_name']
-    )
+    # The user, the gamer and the token are saved together or not at all,
+    # so a failure can't leave a user without a gamer or a token behind
+    try:
+        with transaction.atomic():
+            # Create a new user by invoking the `create_user` helper method
+            # on Django's built-in User model
+            new_user = User.objects.create_user(
+                username=request.data['username'],
+                email=request.data['email'],
+                password=request.data['password'],
+                first_name=request.data['first_name'],
+                last_name=request.data['last_name']
+            )
 
-    # Now save the extra info in the levelupapi_gamer table
-    gamer = Gamer.objects.create(
-        bio=request.data['bio'],
-        user=new_user
-    )
+            # Now save the extra info in the levelupapi_gamer table
+            gamer = Gamer.objects.create(
+                bio=request.data['bio'],
+                user=new_user
+            )
 
-    # Use the REST Framework's token generator on the new user account
-    token = Token.objects.create(user=gamer.user)
+            # Use the REST Framework's token generator on the new user account
+            token = Token.objects.create(user=gamer.user)
+
+    except IntegrityError:
+        return Response({'message': 'That username is already taken.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # The new gamer is about to use the token, so the authentication can skip its lookup
+    token_cache.set(token.key, token)
     # Return the token to the client
     data = { 'token': token.key }
     return Response(data, status=status.HTTP_201_CREATED)
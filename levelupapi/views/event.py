@@ -1,7 +1,12 @@
 """View module for handling requests about events"""
+from datetime import datetime
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
 from django.http import HttpResponseServerError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.viewsets import ViewSet
@@ -9,8 +14,19 @@ from rest_framework.response import Response
 from rest_framework import serializers
 from levelupapi.models import Game, Event, Gamer
 from levelupapi.models.status import Status
+from levelupapi import changes as change_log
+from levelupapi.conditional import etag_matches, not_modified, queryset_validators, with_validators
+from levelupapi.lookups import status_lookup
+from levelupapi.pagination import get_paginator
+from levelupapi.profile_cache import invalidate_profiles
+from levelupapi.push import announce
+from levelupapi.streaming import stream_response, wants_stream
 from levelupapi.views.game import GameSerializer
 
+# Log rows read per /events/changes call
+CHANGES_LIMIT = 500
+CHANGES_MAX_LIMIT = 5000
+
 
 class EventView(ViewSet):
     """Level up events"""
@@ -25,14 +41,14 @@ class EventView(ViewSet):
         event = Event()
         event.name = request.data["name"]
         event.time = request.data["time"]
-        gamer = Gamer.objects.get(user=request.auth.user)
+        gamer = request.gamer
         event.host = gamer
         # event.date = request.data["date"]
         # event.description = request.data["description"]
         # event.organizer = gamer
         game = Game.objects.get(pk=request.data["game_id"])
         event.game = game
-        event_status = Status.objects.get(pk=1) #{ "id": 1, "title": "Open for signing up"}
+        event_status = status_lookup.get(1) #{ "id": 1, "title": "Open for signing up"}
         event.status = event_status
 
         try:
@@ -51,9 +67,14 @@ class EventView(ViewSet):
             Response -- JSON serialized game instance
         """
         try:
+            # A client that still has this version of the event gets a 304 without it being loaded
+            etag, last_modified = queryset_validators(request, Event.objects.filter(pk=pk))
+            if etag_matches(request, etag):
+                return not_modified(etag, last_modified)
+
             event = Event.objects.get(pk=pk)
             serializer = EventSerializer(event, context={'request': request})
-            return Response(serializer.data)
+            return with_validators(Response(serializer.data), etag, last_modified)
         
         except Exception as ex:  
         # catch broad/generic server error (eg. got more than one same PK)
@@ -71,12 +92,12 @@ class EventView(ViewSet):
         event.name = request.data["name"]
         # event.date = request.data["date"]
         event.time = request.data["time"]
-        host = Gamer.objects.get(user=request.auth.user)
+        host = request.gamer
         event.host = host
-        game = Game.objects.get(pk=request.data["gameId"])
+        game = Game.objects.get(pk=request.data["game_id"])
         event.game = game
-        status = Status.objects.get(pk=request.data["statusId"]) 
-        event.status = status
+        event_status = status_lookup.get(request.data["status_id"])
+        event.status = event_status
         
         event.save()
 
@@ -104,28 +125,48 @@ class EventView(ViewSet):
 
     def list(self, request):
         """Handle GET requests to events resource
+
+        Filters (all optional, and combinable):
+            ?gameId=3                 events of one game
+            ?from=2021-04-20&to=...   events whose time is in [from, to); dates or ISO datetimes
+            ?status=1                 events with this status id
+            ?host=me or ?host=2       events hosted by the current gamer, or by a gamer id
+        Every combination of game/host/status with a time window is served from a
+        composite (column, time) index, see Event.Meta.indexes.
+
         Returns:
-            Response -- JSON serialized list of events
+            Response -- JSON serialized list of events, sorted by time
         """
-        events = Event.objects.all()
-        gamer = Gamer.objects.get(user=request.auth.user)
-        
-         # Set the `joined` property on every event
-        for event in events:
-            # Check to see if the gamer is in the attendees list on the event
-            event.joined = gamer in event.signed_up_by.all()
-
-        # Support filtering events by game
-        game = self.request.query_params.get('gameId', None)
-        if game is not None:
-            events = events.filter(game__id=game) 
-            # ⭕️get events by host: 
-            # events = Event.objects.filter(host__user=request.auth.user) 
-            # The use of the dunderscore(__) here represents a join operation(foreign-key table / cross table).
+        try:
+            events = events_queryset(request)
+        except ValueError as ex:
+            return Response({'message': ex.args[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Polling clients send back the ETag they got: when no event in the list changed since,
+        # they get a 304 from one COUNT/MAX(updated_at) query, and no event is loaded or serialized.
+        # `joined` differs per gamer, so the gamer is part of the ETag
+        etag, last_modified = queryset_validators(request, events, request.gamer.id)
+        if etag_matches(request, etag):
+            return not_modified(etag, last_modified)
+
+        # Set the `joined` property on every event in the same query
+        events = annotate_joined(events, request.gamer)
+
+        # Large exports: ?stream=1 (JSON array) or ?stream=ndjson, serialized chunk by chunk
+        if wants_stream(request):
+            return with_validators(stream_response(request, events, EventSerializer), etag, last_modified)
+
+        # Opt-in pages: ?limit=&offset= or keyset ?pageSize=&cursor= ordered by (time, id)
+        paginator = get_paginator(request, ordering=('time', 'id'))
+        if paginator is not None:
+            page = paginator.paginate_queryset(events, request, view=self)
+            serializer = EventSerializer(
+                page, many=True, context={'request': request})
+            return with_validators(paginator.get_paginated_response(serializer.data), etag, last_modified)
 
         serializer = EventSerializer(
             events, many=True, context={'request': request})
-        return Response(serializer.data)    
+        return with_validators(Response(serializer.data), etag, last_modified)
 
 
     # ⭕️⭕️⭕️ Custom Action for the specific url '/signup'
@@ -134,7 +175,7 @@ class EventView(ViewSet):
         """Managing gamers signing up for events"""
         # Django uses the `Authorization` header to determine
         # which user is making the request to sign up
-        gamer = Gamer.objects.get(user=request.auth.user)
+        gamer = request.gamer
 
         try:
             # Handle the case if the client specifies a game
@@ -150,9 +191,14 @@ class EventView(ViewSet):
         # A gamer wants to sign up for an event
         if request.method == "POST":
             try:
-                # Using the attendees field on the event makes it simple to add a gamer to the event
-                # .add(gamer) will insert into the join table a new row the gamer_id and the event_id
-                event.signed_up_by.add(gamer)
+                # Inserts into the join table a new row with the gamer_id and the event_id,
+                # if the game's player_limit still has room (see join_events below)
+                result = join_events(gamer, [event.id])[event.id]
+                if result == 'full':
+                    return Response(
+                        {'message': 'Event is full.'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
                 return Response({}, status=status.HTTP_201_CREATED)
             
             except Exception as ex:
@@ -161,15 +207,264 @@ class EventView(ViewSet):
         # User wants to leave a previously joined event
         elif request.method == "DELETE":
             try:
-                # The many to many relationship has a .remove method that removes the gamer from the attendees list
-                # The method deletes the row in the join table that has the gamer_id and event_id
-                event.signed_up_by.remove(gamer)
+                # Deletes the row in the join table that has the gamer_id and event_id, and gives the seat back
+                leave_events(gamer, [event.id])
                 return Response(None, status=status.HTTP_204_NO_CONTENT)
             
             except Exception as ex:
                 return Response({'message': ex.args[0]})
-    
-    
+
+
+    # ⭕️⭕️⭕️ Custom Action for the url '/signups': join or leave many events in one request
+    @action(methods=['post', 'delete'], detail=False)
+    def signups(self, request):
+        """Sign the gamer up for (POST), or remove them from (DELETE), a list of events
+
+        Request body:
+            { "eventIds": [1, 2, 3] }
+
+        Returns:
+            Response -- 200 with a result per event:
+                { "results": [{ "eventId": 1, "result": "joined" }, ...] }
+            joined / already_joined / full / left / not_joined / not_found
+        """
+        event_ids = request.data.get("event_ids")
+        if not isinstance(event_ids, list) or not all(isinstance(pk, int) for pk in event_ids):
+            return Response(
+                {'message': 'eventIds must be a list of event ids.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Drop duplicates but keep the order the client sent
+        event_ids = list(dict.fromkeys(event_ids))
+        gamer = request.gamer
+
+        if request.method == "POST":
+            results = join_events(gamer, event_ids)
+        else:
+            results = leave_events(gamer, event_ids)
+
+        return Response({'results': [
+            {'event_id': pk, 'result': results[pk]} for pk in event_ids
+        ]})
+
+
+    # ⭕️⭕️⭕️ Custom Action for the url '/changes': delta sync
+    @action(methods=['get'], detail=False)
+    def changes(self, request):
+        """Handle GET requests for the events that changed since the client last synced
+
+        Query params:
+            since -- The token from the previous call. Without it the response is a full snapshot
+            limit -- How many log rows to read per call (500 by default)
+
+        Returns:
+            Response -- JSON with the changed events, the ids of deleted ones, and the next token:
+                { "changes": [...], "deleted": [3], "since": "<token>", "more": false }
+            Call again with `since` right away while `more` is true.
+            410 when the token is older than the log, start over without `since`.
+        """
+        gamer = request.gamer
+        now = timezone.now()
+        token = request.query_params.get('since')
+
+        if not token:
+            # The version is read first: anything that changes while the snapshot is taken
+            # comes again with the next call
+            version = change_log.latest_version()
+            events = annotate_joined(
+                Event.objects.select_related('host__user', 'game', 'status').order_by('time', 'id'), gamer)
+            serializer = EventSerializer(events, many=True, context={'request': request})
+            return Response({
+                'changes': serializer.data,
+                'deleted': [],
+                'since': change_log.encode_token(version, now),
+                'more': False,
+            })
+
+        try:
+            version, issued = change_log.decode_token(token)
+        except ValueError as ex:
+            return Response({'message': ex.args[0]}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', CHANGES_LIMIT)), CHANGES_MAX_LIMIT)
+            if limit < 1:
+                raise ValueError(limit)
+        except ValueError:
+            return Response({'message': 'limit must be a positive number.'}, status=status.HTTP_400_BAD_REQUEST)
+        if change_log.expired(issued):
+            return Response(
+                {'message': 'The sync token expired, sync again without since.'},
+                status=status.HTTP_410_GONE
+            )
+
+        event_ids, version, more = change_log.changed_since(version, gamer, limit)
+        events = annotate_joined(
+            Event.objects.select_related('host__user', 'game', 'status').filter(pk__in=event_ids), gamer)
+        events = {event.id: event for event in events}
+        serializer = EventSerializer(
+            [events[pk] for pk in event_ids if pk in events], many=True, context={'request': request})
+
+        # While there are rows left the token keeps its issue time: they were written after it,
+        # so compaction can't remove them before the token expires
+        return Response({
+            'changes': serializer.data,
+            'deleted': [pk for pk in event_ids if pk not in events],
+            'since': change_log.encode_token(version, issued if more else now),
+            'more': more,
+        })
+
+
+def events_queryset(request):
+    """The events EventView.list sends back for this request, before the `joined` annotation
+    (the async view uses it too)
+
+    Raises:
+        ValueError -- with a message for the client when a filter can't be parsed
+    """
+    events = Event.objects.select_related('host__user', 'game', 'status').order_by('time', 'id')
+
+    # Support filtering events by game
+    # Filter first so the `joined` annotation is only computed for the rows we send back
+    game = request.query_params.get('gameId', None)
+    if game is not None:
+        events = events.filter(game__id=game)
+        # The use of the dunderscore(__) here represents a join operation(foreign-key table / cross table).
+
+    return filter_events(events, request.query_params, request.gamer)
+
+
+def annotate_joined(events, gamer):
+    """Set the `joined` property of every event:
+    EXISTS (SELECT 1 FROM levelupapi_gamer_signed_up_events WHERE event_id = event.id AND gamer = me)"""
+    attendee = Gamer.signed_up_events.through.objects.filter(event=OuterRef('pk'), gamer=gamer)
+    return events.annotate(joined=Exists(attendee))
+
+
+def filter_events(events, params, gamer):
+    """Apply the ?from= ?to= ?status= ?host= filters of EventView.list
+
+    Raises:
+        ValueError -- with a message for the client when a value can't be parsed
+    """
+    for name, lookup in (('from', 'time__gte'), ('to', 'time__lt')):
+        value = params.get(name)
+        if value:
+            events = events.filter(**{lookup: parse_time(name, value)})
+
+    event_status = params.get('status')
+    if event_status:
+        events = events.filter(status_id=parse_id('status', event_status))
+
+    host = params.get('host')
+    if host == 'me':
+        events = events.filter(host=gamer)
+    elif host:
+        events = events.filter(host_id=parse_id('host', host))
+
+    return events
+
+
+def parse_time(name, value):
+    """A query param holding an ISO datetime, or a date meaning its midnight"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{name} must be a date or an ISO datetime.')
+        parsed = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_id(name, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an id.')
+
+
+def join_events(gamer, event_ids):
+    """Sign `gamer` up for every event that still has a seat, in one transaction
+
+    A seat is claimed with a single conditional UPDATE:
+        UPDATE event SET attendee_count = attendee_count + 1 WHERE id = %s AND attendee_count < player_limit
+    so concurrent requests can never take more seats than the game allows, and no row is
+    read-then-written. The statements that write come first in the transaction, so SQLite takes
+    its write lock up front instead of failing to upgrade a read lock.
+
+    Returns:
+        dict -- event id -> result
+    """
+    attendees = Gamer.signed_up_events.through
+    results = dict.fromkeys(event_ids, 'not_found')
+
+    limits = dict(Event.objects.filter(pk__in=event_ids).values_list('id', 'game__player_limit'))
+    mine = set(attendees.objects.filter(event_id__in=limits, gamer=gamer).values_list('event_id', flat=True))
+
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                new_rows = []
+                for pk, limit in limits.items():
+                    if pk in mine:
+                        results[pk] = 'already_joined'
+                    elif claim_seat(pk, limit):
+                        results[pk] = 'joined'
+                        new_rows.append(attendees(gamer=gamer, event_id=pk))
+                    else:
+                        results[pk] = 'full'
+
+                attendees.objects.bulk_create(new_rows)
+                change_log.log_signups((row.event_id, gamer.id) for row in new_rows)
+                announce((row.event_id for row in new_rows), 'attendance')
+
+            if new_rows:
+                invalidate_profiles([gamer.id])
+            return results
+
+        except IntegrityError:
+            # The same gamer joined one of these events in a concurrent request:
+            # the seats claimed here were rolled back, look again at what they joined and retry once
+            mine = set(attendees.objects.filter(event_id__in=limits, gamer=gamer).values_list('event_id', flat=True))
+
+    raise IntegrityError('Could not sign up for the events, try again.')
+
+
+def claim_seat(event_id, player_limit):
+    """Take one seat on the event if there is one left, returns True when it did"""
+    return Event.objects.filter(
+        pk=event_id, attendee_count__lt=player_limit
+    ).update(attendee_count=F('attendee_count') + 1, updated_at=timezone.now()) == 1
+
+
+def leave_events(gamer, event_ids):
+    """Remove `gamer` from every event in the list, in one transaction
+
+    Returns:
+        dict -- event id -> result
+    """
+    attendees = Gamer.signed_up_events.through
+    results = dict.fromkeys(event_ids, 'not_found')
+    for pk in Event.objects.filter(pk__in=event_ids).values_list('id', flat=True):
+        results[pk] = 'not_joined'
+
+    with transaction.atomic():
+        for pk in event_ids:
+            # Only give the seat back if this request is the one that deleted the row
+            deleted, _ = attendees.objects.filter(gamer=gamer, event_id=pk).delete()
+            if deleted:
+                Event.objects.filter(pk=pk).update(attendee_count=F('attendee_count') - 1, updated_at=timezone.now())
+                results[pk] = 'left'
+        left = [pk for pk, result in results.items() if result == 'left']
+        change_log.log_signups((pk, gamer.id) for pk in left)
+        announce(left, 'attendance')
+
+    if 'left' in results.values():
+        invalidate_profiles([gamer.id])
+    return results
+
+
 # User
 class EventUserSerializer(serializers.ModelSerializer):
     """JSON serializer for event organizer's related Django user"""
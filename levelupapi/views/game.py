@@ -1,13 +1,24 @@
 """View module for handling requests about games"""
 from django.core.exceptions import ValidationError
 from rest_framework import status
+from django.db import connection, transaction
 from django.http import HttpResponseServerError
+from django.utils import timezone
+from rest_framework.decorators import action
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response # 📌 Response will attach the headers, status to the JSON data.
 from rest_framework import serializers # 📌 serializers will serialize the data (make it a dictionary), and make it JSON format.
-from rest_framework import status
-from levelupapi.models import Game, Gametype, Gamer
-from django.db.models import Count
+from django.contrib.auth.models import User
+from djangorestframework_camel_case.util import camel_to_underscore
+from levelupapi.models import Game, Gamer, Gametype
+from levelupapi.conditional import etag_matches, not_modified, queryset_validators, with_validators
+from levelupapi.lookups import gametype_lookup
+from levelupapi.pagination import get_paginator
+from levelupapi.signals import games_created, games_updated
+from levelupapi.streaming import stream_response, wants_stream
+
+# Most operations one POST /games/batch takes
+BATCH_MAX_OPERATIONS = 5000
 
 class GameView(ViewSet):
     """Level up games"""
@@ -20,7 +31,7 @@ class GameView(ViewSet):
         """
 
         # Uses the token passed in the `Authorization` header
-        gamer = Gamer.objects.get(user=request.auth.user)
+        gamer = request.gamer
 
         game = Game() #❗️Create a new Python instance of the Game class
         game.name = request.data["name"] # and set its properties from what was sent in the body of the request from the client.
@@ -30,7 +41,7 @@ class GameView(ViewSet):
 
         # Use the Django ORM to get the record from the database
         # whose `id` is what the client passed as the `gameTypeId` in the body of the request.
-        gametype = Gametype.objects.get(pk=request.data["gametype_id"])
+        gametype = gametype_lookup.get(request.data["gametype_id"])
         game.gametype = gametype
 
         # Try to save the new game to the database, then serialize the game instance as JSON, 
@@ -58,9 +69,16 @@ class GameView(ViewSet):
             #   http://localhost:8000/games/2
             #
             # The `2` at the end of the route becomes `pk`
-            game = Game.objects.get(pk=pk)
+
+            # A client that still has this version of the game gets a 304 without it being loaded
+            etag, last_modified = queryset_validators(request, Game.objects.filter(pk=pk))
+            if etag_matches(request, etag):
+                return not_modified(etag, last_modified)
+
+            games = GameSerializer.select_related(Game.objects.all(), request)
+            game = games.get(pk=pk)
             serializer = GameSerializer(game, context={'request': request})
-            return Response(serializer.data)
+            return with_validators(Response(serializer.data), etag, last_modified)
         
         except Game.DoesNotExist as ex:
             return Response({'message': ex.args[0]}, status=status.HTTP_404_NOT_FOUND)
@@ -75,9 +93,9 @@ class GameView(ViewSet):
         Returns:
             Response -- Empty body with 204 status code
         """
-        gamer = Gamer.objects.get(user=request.auth.user)
+        gamer = request.gamer
         # import pdb; pdb.set_trace()
-        game_type = Gametype.objects.get(pk=request.data["gametype_id"])
+        game_type = gametype_lookup.get(request.data["gametype_id"])
         
 
         # Do mostly the same thing as POST, but instead of
@@ -123,33 +141,302 @@ class GameView(ViewSet):
         """ Handle GET requests to games resource
         Returns:
             Response -- JSON serialized list of games  """
-        # Get all game records from the database
-        games = Game.objects.all()
-        # count how many events are there for each game
-        games = Game.objects.annotate(event_count=Count('events'))
-        
-        # Support filtering games by type： http://localhost:8000/games?type=1
-        # That URL will retrieve all tabletop games
-        game_type = self.request.query_params.get('type', None)
-        if game_type is not None:
-            games = games.filter(gametype__id=game_type)
-            # gametype__id has to be a double-underscore.
-            # The use of the dunderscore (__) here represents a join operation (foreign-key table).
-            # for it's own table, do one underscore
+        games = games_queryset(request)
+
+        # Polling clients send back the ETag they got: when no game in the list changed since,
+        # they get a 304 from one COUNT/MAX(updated_at) query, and no game is loaded or serialized
+        etag, last_modified = queryset_validators(request, games)
+        if etag_matches(request, etag):
+            return not_modified(etag, last_modified)
+
+        # Large exports: ?stream=1 (JSON array) or ?stream=ndjson, serialized chunk by chunk
+        if wants_stream(request):
+            return with_validators(
+                stream_response(request, games.order_by('id'), GameSerializer), etag, last_modified)
+
+        # Opt-in pages: ?limit=&offset= or keyset ?pageSize=&cursor= ordered by id
+        paginator = get_paginator(request, ordering=('id',))
+        if paginator is not None:
+            page = paginator.paginate_queryset(games, request, view=self)
+            serializer = GameSerializer(
+                page, many=True, context={'request': request})
+            return with_validators(paginator.get_paginated_response(serializer.data), etag, last_modified)
 
         serializer = GameSerializer(
             games, many=True, context={'request': request})
         
         # serializer.data.append(gamer)
-        return Response(serializer.data)
-    
-    
+        return with_validators(Response(serializer.data), etag, last_modified)
+
+
+    # ⭕️⭕️⭕️ Custom Action for the url '/games/batch': create, update and delete many games in one request
+    @action(methods=['post'], detail=False)
+    def batch(self, request):
+        """Handle POST requests with a list of operations, for catalog imports
+
+        Request body:
+            {
+                "atomic": false,
+                "operations": [
+                    { "op": "create", "name": "Clue", "playerLimit": 6, "gametypeId": 1 },
+                    { "op": "update", "id": 3, "name": "Clue", "playerLimit": 6, "gametypeId": 1 },
+                    { "op": "delete", "id": 4 }
+                ]
+            }
+        create and update take the same fields as POST /games and PUT /games/<id>
+        (and, like PUT, an updated game becomes the sender's).
+
+        Returns:
+            Response -- 200 with a result per operation, in the order they were sent:
+                { "results": [{ "index": 0, "op": "create", "id": 12, "result": "created" }, ...] }
+            created / updated / deleted, or invalid / not_found with a "message".
+            The valid operations are applied even when others fail, unless "atomic" is true:
+            then nothing is applied when any of them fails, the response is a 400,
+            and the valid operations come back as not_applied.
+        """
+        operations = request.data.get("operations")
+        if not isinstance(operations, list) or not operations:
+            return Response(
+                {'message': 'operations must be a list of operations.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            return Response(
+                {'message': f'At most {BATCH_MAX_OPERATIONS} operations per batch.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results, creates, updates, deletes = plan_batch(request.gamer, operations)
+        failed = any('message' in result for result in results)
+        if failed and request.data.get("atomic") is True:
+            for result in results:
+                if 'message' not in result:
+                    result['result'] = 'not_applied'
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+        apply_batch(creates, updates, deletes)
+        for index, game in creates:
+            results[index].update(id=game.id, result='created')
+        for index, game in updates:
+            results[index]['result'] = 'updated'
+        for index, _ in deletes:
+            results[index]['result'] = 'deleted'
+        return Response({'results': results})
+
+
+def plan_batch(gamer, operations):
+    """Check the operations of a batch, with one query for the games and at most one for the game types
+
+    Returns:
+        (results, creates, updates, deletes) -- a result per operation, with a "message" for the
+        invalid ones, and (index, unsaved Game) for the valid creates and updates, (index, id) for the deletes
+    """
+    results = []
+    creates, updates, deletes = [], [], []
+
+    # Every game and game type the batch refers to, loaded at once instead of a get() per operation
+    game_ids = [
+        operation.get('id') for operation in operations
+        if isinstance(operation, dict) and isinstance(operation.get('id'), int)
+    ]
+    games = Game.objects.in_bulk(game_ids)
+    gametypes = {gametype.id: gametype for gametype in gametype_lookup.all()}
+    missing = {
+        operation.get('gametype_id') for operation in operations
+        if isinstance(operation, dict) and isinstance(operation.get('gametype_id'), int)
+    } - set(gametypes)
+    if missing:
+        # Maybe added by another worker since the lookup cache loaded
+        gametypes.update(Gametype.objects.in_bulk(missing))
+
+    seen = set()
+    for index, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        result = {'index': index, 'op': op}
+        results.append(result)
+        if op not in ('create', 'update', 'delete'):
+            result.update(result='invalid', message='op must be create, update or delete.')
+            continue
+
+        if op != 'create':
+            pk = operation.get('id')
+            if not isinstance(pk, int) or isinstance(pk, bool):
+                result.update(result='invalid', message='id must be a game id.')
+                continue
+            result['id'] = pk
+            if pk in seen:
+                result.update(result='invalid', message='The game is already in another operation of the batch.')
+                continue
+            seen.add(pk)
+            if pk not in games:
+                result.update(result='not_found', message='Game does not exist.')
+                continue
+            if op == 'delete':
+                deletes.append((index, pk))
+                continue
+
+        message = check_game_fields(operation, gametypes)
+        if message is not None:
+            result.update(result='invalid', message=message)
+            continue
+
+        game = Game() if op == 'create' else games[operation['id']]
+        game.name = operation['name']
+        game.player_limit = operation['player_limit']
+        game.gametype = gametypes[operation['gametype_id']]
+        game.created_by = gamer
+        (creates if op == 'create' else updates).append((index, game))
+
+    return results, creates, updates, deletes
+
+
+def check_game_fields(operation, gametypes):
+    """The message for the client when the fields of a create or update aren't valid, else None"""
+    name = operation.get('name')
+    max_length = Game._meta.get_field('name').max_length
+    if not isinstance(name, str) or not name.strip() or len(name) > max_length:
+        return f'name must be text of at most {max_length} characters.'
+    player_limit = operation.get('player_limit')
+    if not isinstance(player_limit, int) or isinstance(player_limit, bool) or player_limit < 1:
+        return 'playerLimit must be a positive whole number.'
+    if operation.get('gametype_id') not in gametypes:
+        return 'gametypeId must be the id of a game type.'
+    return None
+
+
+def apply_batch(creates, updates, deletes):
+    """Write the games of a batch in one transaction, with a few bulk queries instead of a save() each
+
+    bulk_create() and bulk_update() send no signals, so the search index, the events showing
+    the games and the cached profiles are brought up to date through games_created() and games_updated().
+    """
+    with transaction.atomic():
+        if updates:
+            now = timezone.now()
+            games = [game for _, game in updates]
+            for game in games:
+                # auto_now isn't applied by bulk_update()
+                game.updated_at = now
+            Game.objects.bulk_update(games, ['name', 'player_limit', 'gametype', 'created_by', 'updated_at'])
+            games_updated([game.id for game in games])
+
+        if deletes:
+            # A queryset delete still sends the signals of every game and cascaded event
+            Game.objects.filter(pk__in=[pk for _, pk in deletes]).delete()
+
+        if creates:
+            games = [game for _, game in creates]
+            insert_games(games)
+            games_created([game.id for game in games])
+
+
+def insert_games(games):
+    """bulk_create() the games and set their ids"""
+    if connection.features.can_return_rows_from_bulk_insert:
+        Game.objects.bulk_create(games)
+    elif connection.vendor == 'sqlite':
+        # SQLite can't return the ids of a bulk insert. But the transaction holds the database's
+        # write lock from the insert on, so the newest rows are these, in the same order
+        Game.objects.bulk_create(games)
+        ids = list(Game.objects.order_by('-id').values_list('id', flat=True)[:len(games)])
+        for game, pk in zip(games, reversed(ids)):
+            game.id = pk
+    else:
+        for game in games:
+            game.save()
+
+
+def games_queryset(request):
+    """The games GameView.list sends back for this request (the async view uses it too)"""
+    # Get all game records from the database
+    # (event_count is a stored column kept up to date by the Event signals, no GROUP BY needed)
+    games = Game.objects.all()
+    # join only the related tables the client asked to ?expand=
+    games = GameSerializer.select_related(games, request)
+
+    # Support filtering games by type： http://localhost:8000/games?type=1
+    # That URL will retrieve all tabletop games
+    game_type = request.query_params.get('type', None)
+    if game_type is not None:
+        games = games.filter(gametype__id=game_type)
+        # gametype__id has to be a double-underscore.
+        # The use of the dunderscore (__) here represents a join operation (foreign-key table).
+        # for it's own table, do one underscore
+    return games
+
+
+# User
+class GameUserSerializer(serializers.ModelSerializer):
+    """JSON serializer for the Django user who created a game (never the password hash)"""
+    class Meta:
+        model = User
+        fields = ('id', 'first_name', 'last_name', 'username')
+
+
+# Gamer
+class GameGamerSerializer(serializers.ModelSerializer):
+    """JSON serializer for the gamer who created a game"""
+    user = GameUserSerializer(many=False)
+
+    class Meta:
+        model = Gamer
+        fields = ('id', 'user', 'bio')
+
+
+# Game type
+class GameGametypeSerializer(serializers.ModelSerializer):
+    """JSON serializer for a game's type"""
+    class Meta:
+        model = Gametype
+        fields = ('id', 'label')
+
+
 class GameSerializer(serializers.ModelSerializer):
     """ JSON serializer for games
+
+    By default `created_by` and `gametype` are ids. The query string can change the shape:
+        ?fields=id,name,eventCount     only send these fields
+        ?expand=createdBy,gametype     send these related objects instead of their ids
     Arguments:
         serializer type  """
+    # field -> (serializer for the nested object, what to select_related for it)
+    expandable = {
+        'created_by': (GameGamerSerializer, 'created_by__user'),
+        'gametype': (GameGametypeSerializer, 'gametype'),
+    }
+
     class Meta:
         model = Game
         fields = ('id', 'name', 'player_limit', 'created_by', 'gametype', 'event_count') #the properties in the model
-        depth = 2  # relationship depth  <10
+        read_only_fields = ('event_count',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+
+        wanted = query_param_list(request, 'fields')
+        if wanted:
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+        for name in query_param_list(request, 'expand') & set(self.fields) & set(self.expandable):
+            nested, _ = self.expandable[name]
+            self.fields[name] = nested(many=False, read_only=True)
+
+    @classmethod
+    def select_related(cls, games, request):
+        """Join the tables needed by the ?expand= objects, so each page is a single query"""
+        related = [
+            cls.expandable[name][1]
+            for name in query_param_list(request, 'expand') if name in cls.expandable
+        ]
+        return games.select_related(*related) if related else games
+
+
+def query_param_list(request, name):
+    """A comma separated query param (eg. ?fields=id,eventCount) as a set of snake_case names"""
+    value = request.query_params.get(name, '')
+    return {camel_to_underscore(item.strip()) for item in value.split(',') if item.strip()}
         
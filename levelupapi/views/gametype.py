@@ -8,6 +8,9 @@ from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers
 from levelupapi.models import Gametype
+from levelupapi.conditional import etag_matches, not_modified
+from levelupapi.lookups import gametype_lookup
+from levelupapi.pagination import get_paginator
 
 
 # part of the controller
@@ -24,7 +27,7 @@ class GameTypeView(ViewSet):
             Response -- JSON serialized game type
         """
         try:
-            game_type = Gametype.objects.get(pk=pk)  # model-layer
+            game_type = gametype_lookup.get(pk)  # model-layer (cached, see levelupapi/lookups.py)
             serializer = GameTypeSerializer(game_type, context={'request': request}) # view-layer
             return Response(serializer.data)
         except Exception as ex:
@@ -36,13 +39,31 @@ class GameTypeView(ViewSet):
         Returns:
             Response -- JSON serialized list of game types
         """
-        gametypes = Gametype.objects.all()
+        # The game types are served from the in-process cache, and the client can skip
+        # the download entirely when its copy is still current (If-None-Match -> 304)
+        etag = gametype_lookup.etag()
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        # Opt-in pages: ?limit=&offset= or keyset ?pageSize=&cursor= ordered by id
+        paginator = get_paginator(request, ordering=('id',))
+        if paginator is not None:
+            page = paginator.paginate_queryset(Gametype.objects.all(), request, view=self)
+            serializer = GameTypeSerializer(
+                page, many=True, context={'request': request})
+            response = paginator.get_paginated_response(serializer.data)
+            response['ETag'] = etag
+            return response
+
+        gametypes = gametype_lookup.all()
 
         # Note the additional `many=True` argument to the serializer. 
         # It's needed when you are serializing a list of objects instead of a single object.
         serializer = GameTypeSerializer(
             gametypes, many=True, context={'request': request})
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        response['ETag'] = etag
+        return response
     
     
 class GameTypeSerializer(serializers.ModelSerializer):
@@ -0,0 +1,16 @@
+"""View for /metrics"""
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+from levelupapi import metrics
+
+
+@require_GET
+def prometheus_metrics(request):
+    '''Handles GET requests from the Prometheus scraper: the request metrics of this process
+
+    Method arguments:
+      request -- The full HTTP request object
+    '''
+    if not metrics.allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
@@ -5,7 +5,9 @@ from rest_framework.decorators import action
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers
+from django.db.models import Exists, OuterRef, Q
 from levelupapi.models import Event, Gamer, Game
+from levelupapi.profile_cache import get_profile, set_profile
 
 
 # BEND THE RULE: The ❗️list() method isn't going to return a list of anything, but rather ❗️a single thing. 
@@ -22,26 +24,44 @@ class ProfileView(ViewSet):
         Returns:
             Response -- JSON representation of user info and events
         """
-        gamer = Gamer.objects.get(user=request.auth.user)
-        attend_events = Event.objects.filter(signed_up_by=gamer)
-        host_events = Event.objects.filter(host=gamer)
-
-        attend_events = EventSerializer(
-            attend_events, many=True, context={'request': request})
-        host_events = EventSerializer(
-            host_events, many=True, context={'request': request})
-        gamer = GamerSerializer(
-            gamer, many=False, context={'request': request})
-
-        # Manually construct the JSON structure you want in the response
-        # There are two keys on the response object: 
-        # gamer - {an object}; events - [an array]
-        profile = {}
-        profile["gamer"] = gamer.data
-        profile["attend_events"] = attend_events.data
-        profile["host_events"] = host_events.data
-        
+        gamer = request.gamer
+
+        cached = get_profile(gamer.id)
+        if cached is not None:
+            return Response(cached)
+
+        profile = build_profile(request, gamer, list(profile_events(gamer)))
+        set_profile(gamer.id, profile)
         return Response(profile)
+
+
+def profile_events(gamer):
+    """The events the gamer attends and the ones they host come back in one query,
+    with the game joined in so the serializer doesn't load it per event"""
+    attendee = Gamer.signed_up_events.through.objects.filter(event=OuterRef('pk'), gamer=gamer)
+    return (Event.objects.select_related('game')
+            .annotate(attending=Exists(attendee))
+            .filter(Q(attending=True) | Q(host=gamer))
+            .order_by('id'))
+
+
+def build_profile(request, gamer, events):
+    """The /profile document, from the gamer (with their user) and their profile_events()"""
+    attend_events = EventSerializer(
+        [event for event in events if event.attending], many=True, context={'request': request})
+    host_events = EventSerializer(
+        [event for event in events if event.host_id == gamer.id], many=True, context={'request': request})
+    gamer = GamerSerializer(
+        gamer, many=False, context={'request': request})
+
+    # Manually construct the JSON structure you want in the response
+    # There are two keys on the response object: 
+    # gamer - {an object}; events - [an array]
+    profile = {}
+    profile["gamer"] = gamer.data
+    profile["attend_events"] = attend_events.data
+    profile["host_events"] = host_events.data
+    return profile
     
 
 class UserSerializer(serializers.ModelSerializer):
@@ -0,0 +1,48 @@
+"""View module for searching games and events"""
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.viewsets import ViewSet
+from levelupapi import search
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class SearchView(ViewSet):
+    """Level up full-text search over game names, event names and their hosts"""
+
+    def list(self, request):
+        """Handle GET requests to search games and events
+
+        Query params:
+            q -- The words to look for, all of them have to match
+            type -- game or event, to only search one of them
+            prefix -- true for typeahead, the last word matches as the start of a word
+            limit, offset -- The page of results, 20 at a time by default
+
+        Returns:
+            Response -- JSON with the best matches first and the URL of the next page
+        """
+        text = request.query_params.get('q', '')
+        kind = request.query_params.get('type')
+        prefix = request.query_params.get('prefix', '').lower() in ('1', 'true', 'yes')
+
+        if kind is not None and kind not in search.KINDS:
+            return Response({'message': 'type has to be game or event'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({'message': 'limit and offset have to be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1 or offset < 0:
+            return Response({'message': 'limit and offset have to be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One more row than the page tells if there is a next one
+        results = search.search(text, kind=kind, prefix=prefix, limit=limit, offset=offset)
+        next_url = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_url = replace_query_param(request.build_absolute_uri(), 'offset', offset + limit)
+
+        return Response({'next': next_url, 'results': results})
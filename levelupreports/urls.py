@@ -2,5 +2,5 @@ from django.urls import path
 from .views import usergame_list
 
 urlpatterns = [
-    path('reports/usergames', usergame_list),
+    path('reports/usergames', usergame_list, name='usergame-list'),
 ]
\ No newline at end of file
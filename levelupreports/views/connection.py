@@ -1,4 +1,89 @@
+"""Database connections for the report views
+
+The reports run plain SQL, so they need a DB-API cursor. The database comes from
+settings.DATABASES (the alias in settings.REPORTS_DATABASE, 'default' if unset):
+
+- SQLite files get one read-only connection per thread, opened once and reused across requests,
+  in WAL mode (readers don't wait on writers) with a memory mapped file and a prepared
+  statement cache
+- every other backend, and in-memory SQLite databases (the test database), use Django's
+  own connection for that alias
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connections
+
+# Bytes of the database file to memory map
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+# Prepared statements kept per connection
+SQLITE_CACHED_STATEMENTS = 256
 
 
 class Connection:
-    db_path = "/Users/ruobingz/workspace/levelup-server-Django/db.sqlite3"
\ No newline at end of file
+    """Per-thread pool of report connections"""
+    _local = threading.local()
+    _wal_enabled = set()
+    _wal_lock = threading.Lock()
+
+    @staticmethod
+    def alias():
+        return getattr(settings, 'REPORTS_DATABASE', 'default')
+
+    @classmethod
+    @contextmanager
+    def cursor(cls):
+        """Context manager giving a cursor on the reports database"""
+        django_connection = connections[cls.alias()]
+        if django_connection.vendor != 'sqlite' or django_connection.is_in_memory_db():
+            with django_connection.cursor() as db_cursor:
+                yield db_cursor
+            return
+
+        db_cursor = cls.sqlite_connection(str(django_connection.settings_dict['NAME'])).cursor()
+        try:
+            yield db_cursor
+        finally:
+            db_cursor.close()
+
+    @classmethod
+    def sqlite_connection(cls, db_path):
+        """The read-only connection to `db_path` for the current thread"""
+        pool = getattr(cls._local, 'connections', None)
+        if pool is None:
+            pool = cls._local.connections = {}
+
+        conn = pool.get(db_path)
+        if conn is None:
+            cls.enable_wal(db_path)
+            conn = sqlite3.connect(
+                f'file:{db_path}?mode=ro',
+                uri=True,
+                cached_statements=SQLITE_CACHED_STATEMENTS,
+            )
+            conn.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_SIZE}')
+            pool[db_path] = conn
+        return conn
+
+    @classmethod
+    def enable_wal(cls, db_path):
+        """Switch the database file to WAL mode, once per process.
+        The journal mode is stored in the file, but a read-only connection can't change it."""
+        with cls._wal_lock:
+            if db_path in cls._wal_enabled:
+                return
+            conn = sqlite3.connect(db_path)
+            try:
+                conn.execute('PRAGMA journal_mode = WAL')
+            finally:
+                conn.close()
+            cls._wal_enabled.add(db_path)
+
+    @classmethod
+    def close(cls):
+        """Close the current thread's connections"""
+        pool = getattr(cls._local, 'connections', None) or {}
+        while pool:
+            _, conn = pool.popitem()
+            conn.close()
@@ -6,93 +6,94 @@
 
 
 """Module for generating games by user report"""
-import sqlite3
-from django.shortcuts import render
-from levelupapi.models import Game, Gametype
+from collections import namedtuple
+from itertools import groupby, islice
+from operator import itemgetter
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template.loader import get_template
 from levelupreports.views import Connection
 
+# Rows fetched from the database at a time
+REPORT_BATCH_SIZE = 1000
+# Users rendered into the response at a time
+REPORT_USERS_PER_CHUNK = 100
 
-def usergame_list(request):
-    """Function to build an HTML report of games by user"""
-    if request.method == 'GET':
-        # Connect to project database
-        with sqlite3.connect(Connection.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            db_cursor = conn.cursor()
-
-            # Query for all games, with related user info.
-            db_cursor.execute("""
-                SELECT
-                    g.id,
-                    g.name,
-                    g.gametype_id,
-                    g.player_limit,
-                    u.id user_id,
-                    u.first_name || ' ' || u.last_name AS full_name
-                FROM
-                    levelupapi_game g
-                JOIN
-                    levelupapi_gamer gr ON g.created_by_id = gr.id
-                JOIN
-                    auth_user u ON gr.user_id = u.id
-            """)
-
-            dataset = db_cursor.fetchall()
-
-            # Take the flat data from the database, and build the
-            # following data structure for each gamer.
-            #
-            # {
-            #     1: {
-            #         "id": 1,
-            #         "full_name": "Admina Straytor",
-            #         "games": [
-            #             {
-            #                 "id": 1,
-            #                 "title": "Foo",
-            #                 "maker": "Bar Games",
-            #                 "skill_level": 3,
-            #                 "number_of_players": 4,
-            #                 "gametype_id": 2
-            #             }
-            #         ]
-            #     }
-            # }
-
-            games_by_user = {}
+# Lightweight rows for the template, instead of unsaved Game() instances
+GameRow = namedtuple('GameRow', ['id', 'name', 'player_limit', 'gametype'])
+UserGames = namedtuple('UserGames', ['id', 'full_name', 'games'])
 
-            for row in dataset:
-                # Crete a Game instance and set its properties
-                game = Game()
-                game.name = row["name"]
-                # game.maker = row["maker"]
-                # game.skill_level = row["skill_level"]
-                game.player_limit = row["player_limit"]
-                game.gametype = Gametype.objects.get(pk=(row["gametype_id"])) 
 
-                # Store the user's id
-                uid = row["user_id"]
+def fetch_in_batches(db_cursor, size=REPORT_BATCH_SIZE):
+    """Yield the rows of an executed cursor, fetching `size` rows at a time"""
+    while True:
+        rows = db_cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
 
-                # If the user's id is already a key in the dictionary...
-                if uid in games_by_user:
 
-                    # Add the current game to the `games` list for it
-                    games_by_user[uid]['games'].append(game)
-
-                else:
-                    # Otherwise, create the key and dictionary value
-                    games_by_user[uid] = {}
-                    games_by_user[uid]["id"] = uid
-                    games_by_user[uid]["full_name"] = row["full_name"]
-                    games_by_user[uid]["games"] = [game]
-
-        # Get only the values from the dictionary and create a list from them
-        list_of_users_with_games = games_by_user.values()
-
-        # Specify the Django template and provide data context
-        template = 'users/list_with_games.html'
-        context = {
-            'usergame_list': list_of_users_with_games
-        }
-
-        return render(request, template, context)
\ No newline at end of file
+def usergame_list(request):
+    """Function to stream an HTML report of games by user"""
+    if request.method == 'GET':
+        content_type = 'text/html; charset=utf-8'
+        if isinstance(request, ASGIRequest):
+            # Django 3.2's ASGI handler reads a streamed body on the event loop, where the
+            # database can't be read: render it all here, in the view's thread
+            return HttpResponse(b''.join(chunk.encode() for chunk in render_report(request)),
+                                content_type=content_type)
+        return StreamingHttpResponse(render_report(request), content_type=content_type)
+
+
+def render_report(request):
+    """Yield the report's HTML: the header, each batch of users with their games, and the footer"""
+    header, users, footer = (
+        get_template(f'users/list_with_games_{part}.html') for part in ('header', 'users', 'footer'))
+    yield header.render({}, request)
+
+    # Get a cursor on the project database (see levelupreports/views/connection.py).
+    # It stays open while the response is sent, rows being read as the batches are rendered.
+    with Connection.cursor() as db_cursor:
+        # Query for all games, with related user info and the game type label.
+        # Sorted by user, so every user's games come out next to each other.
+        db_cursor.execute("""
+            SELECT
+                u.id user_id,
+                u.first_name || ' ' || u.last_name AS full_name,
+                g.id,
+                g.name,
+                g.player_limit,
+                t.label gametype
+            FROM
+                levelupapi_game g
+            JOIN
+                levelupapi_gamer gr ON g.created_by_id = gr.id
+            JOIN
+                auth_user u ON gr.user_id = u.id
+            JOIN
+                levelupapi_gametype t ON g.gametype_id = t.id
+            ORDER BY
+                u.id, g.id
+        """)
+
+        # Take the flat, sorted rows from the database, and build the
+        # following data structure for each gamer as the rows come in:
+        #
+        # UserGames(
+        #     id=1,
+        #     full_name="Admina Straytor",
+        #     games=[
+        #         GameRow(id=1, name="Foo", player_limit=4, gametype="Board game")
+        #     ]
+        # )
+        users_with_games = (
+            UserGames(uid, full_name, [GameRow._make(row[2:]) for row in rows])
+            for (uid, full_name), rows in groupby(fetch_in_batches(db_cursor), key=itemgetter(0, 1))
+        )
+        while True:
+            batch = list(islice(users_with_games, REPORT_USERS_PER_CHUNK))
+            if not batch:
+                break
+            yield users.render({'usergame_list': batch}, request)
+
+    yield footer.render({}, request)
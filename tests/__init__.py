@@ -1 +1,13 @@
-from .game_tests import GameTests
\ No newline at end of file
+from .game_tests import GameTests
+from .event_tests import EventTests
+from .gametype_tests import GameTypeTests
+from .report_tests import ReportTests
+from .profile_tests import ProfileTests
+from .auth_tests import AuthTests
+from .search_tests import SearchTests
+from .push_tests import PushTests
+from .async_tests import AsyncReadTests
+from .data_tests import DataTests
+from .metrics_tests import MetricsTests
+from .profiling_tests import ProfilingTests
+from .camel_case_tests import CamelCaseTests
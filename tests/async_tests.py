@@ -0,0 +1,173 @@
+import json
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from django.test import AsyncClient
+from django.urls import resolve
+from rest_framework import status
+from rest_framework.test import APITestCase
+from levelup.asgi import application
+from levelupapi.authentication import token_cache
+from levelupapi.models import Gametype, Game, Gamer, Event, Status
+
+
+class AsyncReadTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account, and seed games and events to read
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = json.loads(response.content)["token"]
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        gamer = Gamer.objects.get(pk=1)
+        gametype = Gametype.objects.create(label="Board game")
+        status_open = Status.objects.create(title="Open")
+        for i in range(3):
+            game = Game.objects.create(name=f"Game {i}", player_limit=6, gametype=gametype, created_by=gamer)
+            event = Event.objects.create(name=f"Night {i}", time="2021-04-20T08:00:00Z",
+                                         host=gamer, game=game, status=status_open)
+        event.signed_up_by.add(gamer)
+
+    async def get_both(self, url):
+        """GET `url` from the ViewSets (WSGI) and from the async views (ASGI)"""
+        sync_response = await sync_to_async(self.client.get)(url)
+        async_response = await AsyncClient().get(url, **self.headers())
+        return sync_response, async_response
+
+    def headers(self, **extra):
+        """Request headers: Django 3.2's AsyncClient sends its keyword arguments as they are, not HTTP_*"""
+        return {'authorization': 'Token ' + self.token, **extra}
+
+    def asgi_get(self, path, query_string=b""):
+        """GET through levelup.asgi.application, reading the body the way a server does: returns (status, body)"""
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http", "method": "GET", "path": path, "query_string": query_string,
+            "headers": [(b"host", b"testserver"), (b"authorization", f"Token {self.token}".encode())],
+        }
+        # Like the test client: closing the connection at the end would end the test's transaction
+        request_finished.disconnect(close_old_connections)
+        try:
+            async_to_sync(application)(scope, receive, send)
+        finally:
+            request_finished.connect(close_old_connections)
+        return sent[0]["status"], b"".join(message.get("body", b"") for message in sent[1:])
+
+    def view_module(self, response):
+        """Module of the view that served an AsyncClient request, with the urlconf the middleware picked"""
+        request = response.asgi_request
+        return resolve(request.path, urlconf=getattr(request, 'urlconf', None)).func.__module__
+
+    async def test_async_views_match_viewsets(self):
+        """
+        Ensure the async read views send back what the ViewSets do
+        """
+        urls = [
+            "/games", "/games/1", "/games?expand=createdBy,gametype&fields=id,createdBy,gametype",
+            "/games?pageSize=2", "/games?limit=1&offset=1",
+            "/events", "/events/1", "/events?host=me&pageSize=2", "/events?from=nonsense",
+            "/gameTypes", "/gameTypes/1", "/profile", "/games/99",
+        ]
+        for url in urls:
+            sync_response, async_response = await self.get_both(url)
+            self.assertEqual(self.view_module(async_response), "levelupapi.views.asynchronous", url)
+            self.assertEqual(async_response.status_code, sync_response.status_code, url)
+            self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content), url)
+            self.assertEqual(async_response.get("ETag"), sync_response.get("ETag"), url)
+
+    async def test_async_views_conditional_and_auth(self):
+        """
+        Ensure the async views answer If-None-Match with 304 and refuse missing or bad tokens
+        """
+        client = AsyncClient()
+        response = await client.get("/events", **self.headers())
+        response = await client.get("/events", **self.headers(**{'if-none-match': response["ETag"]}))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = await client.get("/games")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+        response = await client.get("/games", authorization='Token nope')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(json.loads(response.content), {"detail": "Invalid token."})
+
+    async def test_async_views_cached_token(self):
+        """
+        Ensure a cached token is looked up once, and still checked for an inactive user
+        """
+        client = AsyncClient()
+        response = await client.get("/games", **self.headers())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # The entry goes (expired, evicted, or discarded by another thread) right after the lookup
+        lookup = token_cache.get
+        with mock.patch.object(token_cache, "get", side_effect=[lookup(self.token), None]) as get:
+            response = await client.get("/games", **self.headers())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get.call_count, 1)
+
+        token = lookup(self.token)
+        token.user.is_active = False
+        try:
+            response = await client.get("/games", **self.headers())
+        finally:
+            token.user.is_active = True
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_writes_and_streams_stay_on_viewsets(self):
+        """
+        Ensure only plain GET requests are routed to the async views
+        """
+        client = AsyncClient()
+        response = await client.get("/events?stream=1", **self.headers())
+        self.assertEqual(self.view_module(response), "levelupapi.views.event")
+
+        response = await client.post("/games", {"name": "Clue", "playerLimit": 6, "gametypeId": 1},
+                                     content_type="application/json", **self.headers())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.view_module(response), "levelupapi.views.game")
+
+    def test_streams_under_asgi(self):
+        """
+        Ensure the ?stream= exports send the whole list when served by the ASGI app
+        """
+        expected = json.loads(self.client.get("/games").content)
+
+        response_status, body = self.asgi_get("/games", b"stream=1")
+        self.assertEqual(response_status, status.HTTP_200_OK)
+        self.assertEqual(json.loads(body), expected)
+
+        response_status, body = self.asgi_get("/games", b"stream=ndjson")
+        self.assertEqual([json.loads(line) for line in body.splitlines()], expected)
+
+    def test_report_under_asgi(self):
+        """
+        Ensure the games by user report is sent whole when served by the ASGI app
+        """
+        response_status, body = self.asgi_get("/reports/usergames")
+        html = body.decode()
+        self.assertEqual(response_status, status.HTTP_200_OK)
+        self.assertTrue(html.endswith("</html>"))
+        for i in range(3):
+            self.assertIn(f"Game Name: Game {i}", html)
@@ -0,0 +1,134 @@
+import importlib.util
+import json
+import unittest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from levelupapi.authentication import TokenCache, token_cache
+
+
+class AuthTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = json.loads(response.content)["token"]
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def test_token_resolved_in_one_query(self):
+        """
+        Ensure the token, user and gamer come back in one query, and are cached after that
+        """
+        # registering already cached the new token
+        token_cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/gameTypes")
+        self.assertEqual(sum("authtoken_token" in query["sql"] for query in queries), 1)
+        self.assertFalse(any("levelupapi_gamer" in query["sql"] and "authtoken_token" not in query["sql"]
+                             for query in queries))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/gameTypes")
+        self.assertFalse(any("authtoken_token" in query["sql"] for query in queries))
+
+    def test_deleted_token_rejected(self):
+        """
+        Ensure a cached token stops working as soon as it is deleted
+        """
+        self.assertEqual(self.client.get("/gameTypes").status_code, status.HTTP_200_OK)
+        Token.objects.get(key=self.token).delete()
+        self.assertEqual(self.client.get("/gameTypes").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_CACHE_ALIAS="shared", CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+    })
+    def test_revoked_token_rejected_by_other_workers(self):
+        """
+        Ensure a token revoked in one worker stops working in the others, through the shared cache
+        """
+        token = Token.objects.select_related("user__gamer").get(key=self.token)
+        other_worker = TokenCache()
+        other_worker.set(token.key, token)
+        self.assertIsNotNone(other_worker.get(token.key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            token.delete()
+        self.assertIsNone(other_worker.get(token.key))
+
+    def test_deactivated_user_rejected(self):
+        """
+        Ensure a cached token stops working as soon as its user is deactivated
+        """
+        self.assertEqual(self.client.get("/gameTypes").status_code, status.HTTP_200_OK)
+        user = User.objects.get(username="steve")
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get("/gameTypes").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login(self):
+        """
+        Ensure logging in returns the token and the gamer, and a wrong password doesn't
+        """
+        self.client.credentials()
+        data = {"username": "steve", "password": "Admin8*"}
+        json_response = json.loads(self.client.post("/login", data, format="json").content)
+        self.assertTrue(json_response["valid"])
+        self.assertEqual(json_response["token"], self.token)
+        self.assertEqual(json_response["gamerId"], 1)
+
+        data = {"username": "steve", "password": "wrong"}
+        json_response = json.loads(self.client.post("/login", data, format="json").content)
+        self.assertFalse(json_response["valid"])
+
+    def test_register_taken_username(self):
+        """
+        Ensure registering a taken username fails without leaving anything behind
+        """
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post("/register", data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(User.objects.count(), 1)
+
+    @unittest.skipUnless(importlib.util.find_spec("argon2"), "argon2-cffi is not installed")
+    def test_login_rehashes_with_tuned_argon2(self):
+        """
+        Ensure turning on the tuned Argon2 hasher upgrades a PBKDF2 hash on the next login
+        """
+        self.assertTrue(User.objects.get(username="steve").password.startswith("pbkdf2_sha256$"))
+
+        hashers = [
+            'levelupapi.hashers.TunedArgon2PasswordHasher',
+            'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        ]
+        with override_settings(PASSWORD_HASHERS=hashers):
+            data = {"username": "steve", "password": "Admin8*"}
+            json_response = json.loads(self.client.post("/login", data, format="json").content)
+
+        self.assertTrue(json_response["valid"])
+        self.assertTrue(User.objects.get(username="steve").password.startswith("argon2$argon2id$v=19$m=19456,t=2,p=1$"))
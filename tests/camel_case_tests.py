@@ -0,0 +1,82 @@
+import io
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from django.test import override_settings
+from django.utils.translation import gettext_lazy
+from djangorestframework_camel_case.parser import CamelCaseJSONParser as LibraryParser
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer as LibraryRenderer
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APITestCase
+from levelupapi.camel_case import CamelCaseJSONParser, CamelCaseJSONRenderer
+from levelupapi.models import Gametype, Game, Gamer, Event, Status
+
+
+class CamelCaseTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account, with a game and an event to read
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = json.loads(response.content)["token"]
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        gamer = Gamer.objects.get(pk=1)
+        gametype = Gametype.objects.create(label="Board game")
+        game = Game.objects.create(name="Clue ünïcode", player_limit=6, gametype=gametype, created_by=gamer)
+        event = Event.objects.create(name="Night", time="2021-04-20T08:00:00Z", host=gamer, game=game,
+                                     status=Status.objects.create(title="Open"))
+        event.signed_up_by.add(gamer)
+
+    def test_renderer_matches_library(self):
+        """
+        Ensure the renderer sends the same bytes as djangorestframework_camel_case's, with and without orjson
+        """
+        payloads = [self.client.get(url).data for url in ["/games", "/events", "/events/1", "/profile"]]
+        payloads.append({
+            "snake_case_key": [{"nested_key_2": "line\u2028separator", "is_ok": True}],
+            7: None,
+            "time_stamp": datetime(2021, 4, 20, 8, 0, 0, 123456, tzinfo=timezone.utc),
+            "price_value": Decimal("1.50"),
+            "lazy_text": gettext_lazy("Closed"),
+            "tuple_value": (1, 2.5, "three"),
+            "the_uuid": uuid.UUID(int=1),
+        })
+
+        for fast in (True, False):
+            with override_settings(FAST_JSON_ENCODER=fast):
+                for payload in payloads:
+                    self.assertEqual(CamelCaseJSONRenderer().render(payload), LibraryRenderer().render(payload))
+                # Indented for the browsable API and ?format=json with indent
+                self.assertEqual(
+                    CamelCaseJSONRenderer().render(payloads[0], "application/json; indent=2"),
+                    LibraryRenderer().render(payloads[0], "application/json; indent=2"))
+
+    def test_parser_matches_library(self):
+        """
+        Ensure the parser reads camelCase JSON into the same snake_case data as djangorestframework_camel_case's
+        """
+        body = json.dumps({
+            "playerLimit": 4, "gameTypeId": 1, "name": "Clue",
+            "operations": [{"op": "create", "playerLimit": 2, "customField1": "x", "HTMLContent": None}],
+        }).encode()
+        for fast in (True, False):
+            with override_settings(FAST_JSON_ENCODER=fast):
+                self.assertEqual(CamelCaseJSONParser().parse(io.BytesIO(body)),
+                                 LibraryParser().parse(io.BytesIO(body)))
+                with self.assertRaises(ParseError):
+                    CamelCaseJSONParser().parse(io.BytesIO(b'{"playerLimit": '))
@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, F
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from levelupapi.bulkload import stream_objects
+from levelupapi.models import Game, Gamer, Gametype, Event
+
+
+class DataTests(APITestCase):
+    def test_generate_data(self):
+        """
+        Ensure the generator adds consistent, skewed data on top of what is there, and the API serves it
+        """
+        call_command("generate_data", gamers=30, games=60, events=400, batch_size=70, stdout=StringIO())
+        self.assertEqual((Gamer.objects.count(), Game.objects.count(), Event.objects.count()), (30, 60, 400))
+        self.assertEqual(Token.objects.count(), 30)
+
+        # The stored counters match the rows, and no event has more attendees than seats
+        call_command("event_counts", check=True, stdout=StringIO())
+        self.assertFalse(Event.objects.filter(attendee_count__gt=F("game__player_limit")).exists())
+
+        # Skewed: the busiest game has far more events than an even share
+        busiest = Game.objects.order_by("-event_count").first()
+        self.assertGreater(busiest.event_count, 3 * 400 / 60)
+
+        # Runs again on top of the data, with new ids
+        call_command("generate_data", gamers=5, games=5, events=20, seed=1, stdout=StringIO())
+        self.assertEqual(Event.objects.count(), 420)
+        call_command("event_counts", check=True, stdout=StringIO())
+
+        gamer = Gamer.objects.annotate(hosted=Count("hosting_events")).order_by("-hosted").first()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get(user=gamer.user).key)
+        response = self.client.get("/profile")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(response.content)["hostEvents"]), gamer.hosted)
+        response = self.client.get(f"/search?q={busiest.name.split()[0]}&type=game")
+        self.assertIn(busiest.id, [result["id"] for result in json.loads(response.content)["results"]])
+
+    def test_stream_objects(self):
+        """
+        Ensure fixtures are parsed an object at a time, whatever the read size
+        """
+        objects = [{"model": "levelupapi.gametype", "pk": pk, "fields": {"label": "Board [game], {" + str(pk) + "}"}}
+                   for pk in range(1, 40)]
+        text = json.dumps(objects, indent=4)
+        for read_size in (1, 7, 64, 100000):
+            self.assertEqual(list(stream_objects(StringIO(text), read_size)), objects)
+        self.assertEqual(list(stream_objects(StringIO(" [ ] "))), [])
+
+        for broken in ('{"model": "x"}', '[{"model": "x"} {"model": "y"}]', '[{"model": "x"'):
+            with self.assertRaises(ValueError):
+                list(stream_objects(StringIO(broken), 4))
+
+    def test_bulk_loaddata(self):
+        """
+        Ensure bulk_loaddata installs the fixtures like loaddata, and the API serves them
+        """
+        call_command("bulk_loaddata", "users", "tokens", "gamers", "gametypes", "status", "games", "events",
+                     batch_size=2, stdout=StringIO())
+        self.assertEqual((Gamer.objects.count(), Gametype.objects.count(), Game.objects.count(), Event.objects.count()),
+                         (1, 3, 2, 2))
+        call_command("event_counts", check=True, stdout=StringIO())
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.get().key)
+        response = self.client.get("/events")
+        self.assertEqual([event["name"] for event in json.loads(response.content)], ["Who loves Catan?", "Uno party"])
+        response = self.client.get("/gameTypes")
+        self.assertEqual(len(json.loads(response.content)), 3)
+        response = self.client.get("/search?q=catan&type=event")
+        self.assertEqual(len(json.loads(response.content)["results"]), 1)
+
+        # New rows only
+        with self.assertRaises(CommandError):
+            call_command("bulk_loaddata", "users", stdout=StringIO())
+
+    def test_bulk_loaddata_signups_and_missing_rows(self):
+        """
+        Ensure sign-ups go to the join table and are counted, and a reference to a missing row is refused
+        """
+        call_command("bulk_loaddata", "users", "gamers", "gametypes", "status", "games", "events", stdout=StringIO())
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user_id=1).key)
+        since = json.loads(self.client.get("/events/changes").content)["since"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "more.json")
+            with open(path, "w") as fixture:
+                json.dump([
+                    {"model": "levelupapi.event", "pk": 3, "fields": {
+                        "name": "Late night", "time": "2021-12-22T19:30:00Z", "game": 99, "host": 1, "status": 1}},
+                ], fixture)
+            with self.assertRaises(CommandError):
+                call_command("bulk_loaddata", path, stdout=StringIO())
+            self.assertFalse(Event.objects.filter(pk=3).exists())
+
+            # Rows are written from their primary key, an object without one is refused
+            with open(path, "w") as fixture:
+                json.dump([
+                    {"model": "levelupapi.gamer", "fields": {"user": 2, "bio": "", "signed_up_events": [1]}},
+                ], fixture)
+            with self.assertRaisesMessage(CommandError, "A levelupapi.Gamer object has no pk"):
+                call_command("bulk_loaddata", path, stdout=StringIO())
+
+            with open(path, "w") as fixture:
+                json.dump([
+                    # The attendee comes before the event, and the event before its game: order doesn't matter
+                    {"model": "levelupapi.gamer", "pk": 2, "fields": {"user": 2, "bio": "", "signed_up_events": [1, 3]}},
+                    {"model": "levelupapi.event", "pk": 3, "fields": {
+                        "name": "Late night", "time": "2021-12-22T19:30:00Z", "game": 3, "host": 1, "status": 1}},
+                    {"model": "levelupapi.game", "pk": 3, "fields": {
+                        "name": "Risk", "player_limit": 5, "created_by": 1, "gametype": 1}},
+                    {"model": "auth.user", "pk": 2, "fields": {"username": "joe", "password": "!"}},
+                ], fixture)
+            call_command("bulk_loaddata", path, stdout=StringIO())
+
+        self.assertEqual(sorted(Gamer.objects.get(pk=2).signed_up_events.values_list("id", flat=True)), [1, 3])
+        self.assertEqual(Event.objects.get(pk=3).attendee_count, 1)
+        self.assertEqual(Game.objects.get(pk=3).event_count, 1)
+        call_command("event_counts", check=True, stdout=StringIO())
+
+        # A client syncing from before the load gets the new event and the one signed up for
+        response = self.client.get(f"/events/changes?since={since}")
+        self.assertEqual(sorted(event["id"] for event in json.loads(response.content)["changes"]), [1, 3])
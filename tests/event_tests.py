@@ -0,0 +1,499 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from levelupapi.changes import encode_token
+from levelupapi.models import Gametype, Game, Gamer, Event, EventChange, Status
+
+
+class EventTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account, and seed a game and a status for events
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        json_response = json.loads(response.content)
+        self.token = json_response["token"]
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.gamer = Gamer.objects.get(pk=1)
+
+        gametype = Gametype()
+        gametype.label = "Board game"
+        gametype.save()
+
+        self.game = Game()
+        self.game.gametype = gametype
+        self.game.name = "Clue"
+        self.game.player_limit = 6
+        self.game.created_by = self.gamer
+        self.game.save()
+
+        self.status = Status()
+        self.status.title = "Open for signing up"
+        self.status.save()
+
+    def create_events(self, count):
+        """Seed the database with `count` events hosted by the test gamer"""
+        for i in range(count):
+            event = Event()
+            event.name = f"Game night {i}"
+            event.time = "2021-04-20T08:00:00Z"
+            event.host = self.gamer
+            event.game = self.game
+            event.status = self.status
+            event.save()
+
+    def count_list_queries(self):
+        """Request the events list and return how many queries it took"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/events")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_list_events_joined(self):
+        """
+        Ensure the list flags only the events the gamer signed up for
+        """
+        self.create_events(2)
+        joined_event = Event.objects.first()
+        joined_event.signed_up_by.add(self.gamer)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.get("/events")
+        json_response = json.loads(response.content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json_response), 2)
+        for event in json_response:
+            self.assertEqual(event["joined"], event["id"] == joined_event.id)
+
+    def test_list_events_query_count(self):
+        """
+        Ensure listing events takes the same number of queries no matter how many events there are
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        # the first request also caches the token
+        self.client.get("/events")
+
+        self.create_events(1)
+        few = self.count_list_queries()
+
+        self.create_events(20)
+        many = self.count_list_queries()
+
+        self.assertEqual(few, many)
+
+    def test_list_events_keyset_pages(self):
+        """
+        Ensure following the `next` cursors returns every event once, in (time, id) order
+        """
+        self.create_events(5)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        seen = []
+        url = "/events?pageSize=2"
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            json_response = json.loads(response.content)
+            self.assertLessEqual(len(json_response["results"]), 2)
+            seen += [event["id"] for event in json_response["results"]]
+            url = json_response["next"]
+
+        expected = list(Event.objects.order_by('time', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_list_events_invalid_cursor(self):
+        """
+        Ensure a tampered cursor is rejected
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.get("/events?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_events_limit_offset(self):
+        """
+        Ensure the limit/offset mode still works
+        """
+        self.create_events(5)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.get("/events?limit=2&offset=4")
+        json_response = json.loads(response.content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json_response["count"], 5)
+        self.assertEqual(len(json_response["results"]), 1)
+
+    def test_stream_events(self):
+        """
+        Ensure the streaming export is the same camelCase JSON as the regular list
+        """
+        self.create_events(3)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        expected = json.loads(self.client.get("/events").content)
+
+        response = self.client.get("/events?stream=1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected)
+
+        response = self.client.get("/events?stream=ndjson")
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_change_event(self):
+        """
+        Ensure we can change an existing event, with the status read from the lookup cache
+        """
+        self.create_events(1)
+        event = Event.objects.first()
+
+        data = {
+            "name": "Murder mystery",
+            "time": "2021-05-01T19:00:00Z",
+            "gameId": self.game.id,
+            "statusId": self.status.id
+        }
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.put(f"/events/{event.id}", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.get(f"/events/{event.id}")
+        json_response = json.loads(response.content)
+        self.assertEqual(json_response["name"], "Murder mystery")
+        self.assertEqual(json_response["status"]["title"], "Open for signing up")
+
+    def test_event_count(self):
+        """
+        Ensure the stored event count follows events being created and deleted
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        data = {
+            "name": "Game night",
+            "time": "2021-04-20T08:00:00Z",
+            "gameId": self.game.id
+        }
+        response = self.client.post("/events", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        event_id = json.loads(response.content)["id"]
+
+        response = self.client.get(f"/games/{self.game.id}")
+        self.assertEqual(json.loads(response.content)["eventCount"], 1)
+
+        response = self.client.delete(f"/events/{event_id}")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.get("/games")
+        self.assertEqual(json.loads(response.content)[0]["eventCount"], 0)
+
+        # The stored counts match a full recount
+        call_command('event_counts', '--check', stdout=StringIO())
+
+        # and the command repairs a wrong count
+        self.create_events(2)
+        Game.objects.update(event_count=7)
+        call_command('event_counts', stdout=StringIO())
+        self.assertEqual(Game.objects.get(pk=self.game.id).event_count, 2)
+
+    def test_bulk_signups(self):
+        """
+        Ensure a gamer can join and leave many events at once, and full events are refused
+        """
+        self.create_events(2)
+        first, second = Event.objects.order_by('id')
+
+        # Fill every seat of the second event with other gamers
+        self.game.player_limit = 1
+        self.game.save()
+        other = Gamer.objects.create(
+            user=User.objects.create_user(username="other", password="Admin8*"), bio="")
+        second.signed_up_by.add(other)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        data = {"eventIds": [first.id, second.id, 999, first.id]}
+        response = self.client.post("/events/signups", data, format="json")
+        json_response = json.loads(response.content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json_response["results"], [
+            {"eventId": first.id, "result": "joined"},
+            {"eventId": second.id, "result": "full"},
+            {"eventId": 999, "result": "not_found"},
+        ])
+        self.assertTrue(first.signed_up_by.filter(pk=self.gamer.pk).exists())
+
+        response = self.client.post("/events/signups", {"eventIds": [first.id]}, format="json")
+        self.assertEqual(json.loads(response.content)["results"][0]["result"], "already_joined")
+
+        data = {"eventIds": [first.id, second.id]}
+        response = self.client.delete("/events/signups", data, format="json")
+        self.assertEqual(json.loads(response.content)["results"], [
+            {"eventId": first.id, "result": "left"},
+            {"eventId": second.id, "result": "not_joined"},
+        ])
+        self.assertFalse(first.signed_up_by.filter(pk=self.gamer.pk).exists())
+
+    def test_bulk_signups_bad_request(self):
+        """
+        Ensure the event ids have to be a list of ids
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.post("/events/signups", {"eventIds": "1,2"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_signup_full_event(self):
+        """
+        Ensure a single sign-up is refused once the game's player limit is reached, and leaving frees the seat
+        """
+        self.create_events(1)
+        event = Event.objects.first()
+        self.game.player_limit = 1
+        self.game.save()
+        other = Gamer.objects.create(
+            user=User.objects.create_user(username="other", password="Admin8*"), bio="")
+        event.signed_up_by.add(other)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.post(f"/events/{event.id}/signup")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        event.signed_up_by.remove(other)
+        response = self.client.post(f"/events/{event.id}/signup")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Event.objects.get(pk=event.id).attendee_count, 1)
+
+        response = self.client.delete(f"/events/{event.id}/signup")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Event.objects.get(pk=event.id).attendee_count, 0)
+
+    def test_remove_non_attendee(self):
+        """
+        Ensure removing a gamer who never joined doesn't uncount a seat, or log a change
+        """
+        self.create_events(1)
+        event = Event.objects.first()
+        self.game.player_limit = 1
+        self.game.save()
+        other = Gamer.objects.create(
+            user=User.objects.create_user(username="other", password="Admin8*"), bio="")
+        logged = EventChange.objects.count()
+
+        event.signed_up_by.remove(other)
+        other.signed_up_events.remove(event)
+        self.assertEqual(Event.objects.get(pk=event.id).attendee_count, 0)
+        self.assertEqual(EventChange.objects.count(), logged)
+
+        event.signed_up_by.add(other)
+        event.signed_up_by.remove(self.gamer, other)
+        self.assertEqual(Event.objects.get(pk=event.id).attendee_count, 0)
+
+        # The one seat can be taken, once
+        event.signed_up_by.add(other)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.post(f"/events/{event.id}/signup")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_save_touches_shown_changes_only(self):
+        """
+        Ensure saving a user only touches their events and games when it changes what they show
+        """
+        self.create_events(1)
+        user = User.objects.get(username="steve")
+        logged = EventChange.objects.count()
+        event_updated = Event.objects.get().updated_at
+        game_updated = Game.objects.get(pk=self.game.id).updated_at
+
+        # Like a login rehashing the password, or a save with nothing changed
+        user.set_password("Other8*")
+        user.save(update_fields=["password"])
+        user.save()
+        self.assertEqual(EventChange.objects.count(), logged)
+        self.assertEqual(Event.objects.get().updated_at, event_updated)
+        self.assertEqual(Game.objects.get(pk=self.game.id).updated_at, game_updated)
+
+        # Events show the host's email, games don't
+        user.email = "steve@example.com"
+        user.save(update_fields=["email"])
+        self.assertEqual(EventChange.objects.count(), logged + 1)
+        self.assertGreater(Event.objects.get().updated_at, event_updated)
+        self.assertEqual(Game.objects.get(pk=self.game.id).updated_at, game_updated)
+
+        user.first_name = "Stevie"
+        user.save()
+        self.assertEqual(EventChange.objects.count(), logged + 2)
+        self.assertGreater(Game.objects.get(pk=self.game.id).updated_at, game_updated)
+
+    def test_stale_event_save_keeps_attendee_count(self):
+        """
+        Ensure saving an event loaded before a sign-up doesn't write the old attendee count back
+        """
+        self.create_events(1)
+        stale = Event.objects.get()
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.post(f"/events/{stale.id}/signup")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        stale.name = "Renamed"
+        stale.save()
+        event = Event.objects.get(pk=stale.id)
+        self.assertEqual(event.name, "Renamed")
+        self.assertEqual(event.attendee_count, 1)
+
+        # The game loaded in setUp, before the event was created, keeps its event count too
+        self.game.name = "Cluedo"
+        self.game.save()
+        self.assertEqual(Game.objects.get(pk=self.game.id).event_count, 1)
+
+    def test_list_events_time_window(self):
+        """
+        Ensure events can be filtered by a time window, status and host, sorted by time
+        """
+        other = Gamer.objects.create(
+            user=User.objects.create_user(username="other", password="Admin8*"), bio="")
+        for name, time, host in (
+                ("Late", "2021-04-22T20:00:00Z", self.gamer),
+                ("Early", "2021-04-20T08:00:00Z", self.gamer),
+                ("Middle", "2021-04-21T12:00:00Z", other),
+                ("Too late", "2021-04-30T08:00:00Z", self.gamer)):
+            Event.objects.create(name=name, time=time, host=host, game=self.game, status=self.status)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        response = self.client.get(f"/events?gameId={self.game.id}&from=2021-04-20&to=2021-04-23")
+        self.assertEqual([event["name"] for event in json.loads(response.content)], ["Early", "Middle", "Late"])
+
+        response = self.client.get("/events?host=me&to=2021-04-23T00:00:00Z")
+        self.assertEqual([event["name"] for event in json.loads(response.content)], ["Early", "Late"])
+
+        response = self.client.get(f"/events?status={self.status.id}&host={other.id}")
+        self.assertEqual([event["name"] for event in json.loads(response.content)], ["Middle"])
+
+        response = self.client.get("/events?from=next-week")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_events_conditional_get(self):
+        """
+        Ensure an unchanged event list is answered with 304, and a sign up gives a new ETag
+        """
+        self.create_events(2)
+        event = Event.objects.first()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        response = self.client.get("/events")
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/events", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+
+        # Joining changes `joined` and bumps the event
+        response = self.client.post(f"/events/{event.id}/signup")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get("/events", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        # So does renaming the game shown in the events
+        self.game.name = "Cluedo"
+        self.game.save()
+        response = self.client.get("/events", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)[0]["game"]["name"], "Cluedo")
+
+        response = self.client.get(f"/events/{event.id}")
+        response = self.client.get(f"/events/{event.id}", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_event_changes_feed(self):
+        """
+        Ensure /events/changes returns only what changed since the token, with tombstones
+        """
+        self.create_events(3)
+        first, second, third = Event.objects.order_by('id')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        response = self.client.get("/events/changes")
+        json_response = json.loads(response.content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json_response["changes"]), 3)
+        since = json_response["since"]
+
+        # Nothing changed
+        json_response = json.loads(self.client.get(f"/events/changes?since={since}").content)
+        self.assertEqual((json_response["changes"], json_response["deleted"]), ([], []))
+
+        first.name = "Renamed"
+        first.save()
+        third_id = third.id
+        third.delete()
+        self.client.post(f"/events/{second.id}/signup")
+
+        json_response = json.loads(self.client.get(f"/events/changes?since={since}").content)
+        self.assertEqual([event["id"] for event in json_response["changes"]], [first.id, second.id])
+        self.assertEqual(json_response["changes"][0]["name"], "Renamed")
+        self.assertTrue(json_response["changes"][1]["joined"])
+        self.assertEqual(json_response["deleted"], [third_id])
+        self.assertFalse(json_response["more"])
+        since = json_response["since"]
+
+        # Another gamer joining doesn't change anything this gamer sees
+        other = User.objects.create_user(username="other", password="x")
+        second.signed_up_by.add(Gamer.objects.create(user=other, bio=""))
+        json_response = json.loads(self.client.get(f"/events/changes?since={since}").content)
+        self.assertEqual(json_response["changes"], [])
+
+        # A small limit reads the log in several calls
+        Event.objects.filter(pk=first.pk).first().save()
+        second.save()
+        json_response = json.loads(self.client.get(f"/events/changes?since={since}&limit=1").content)
+        self.assertEqual(len(json_response["changes"]), 1)
+        self.assertTrue(json_response["more"])
+        json_response = json.loads(self.client.get(f"/events/changes?since={json_response['since']}&limit=1").content)
+        self.assertEqual([event["id"] for event in json_response["changes"]], [second.id])
+        self.assertFalse(json_response["more"])
+
+        response = self.client.get("/events/changes?since=nonsense")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_event_changes_compaction(self):
+        """
+        Ensure compaction keeps the latest change per event, and expired tokens start over
+        """
+        self.create_events(1)
+        event = Event.objects.get()
+        for name in ("One", "Two", "Three"):
+            event.name = name
+            event.save()
+        event.signed_up_by.add(self.gamer)
+        self.assertEqual(EventChange.objects.filter(event_id=event.id).count(), 5)
+
+        out = StringIO()
+        call_command("compact_event_changes", stdout=out)
+        self.assertIn("Removed 3 superseded", out.getvalue())
+        # the last save, and the sign up that only this gamer sees
+        self.assertEqual(EventChange.objects.filter(event_id=event.id).count(), 2)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        old_token = encode_token(0, timezone.now() - timedelta(days=31))
+        response = self.client.get(f"/events/changes?since={old_token}")
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
@@ -1,7 +1,9 @@
 import json
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
-from levelupapi.models import Gametype, Game, Gamer
+from levelupapi.models import Gametype, Game, Gamer, Event, Status
 
 
 class GameTests(APITestCase):
@@ -176,4 +178,164 @@ class GameTests(APITestCase):
 
         # GET GAME AGAIN TO VERIFY 404 response
         response = self.client.get(f"/games/{game.id}")
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_games_fields_and_expand(self):
+        """
+        Ensure ?fields= trims the games and ?expand= nests related objects without extra queries
+        """
+        gamer = Gamer.objects.get(pk=1)
+        for name in ("Clue", "Monopoly", "Sorry"):
+            game = Game()
+            game.gametype_id = 1
+            game.name = name
+            game.player_limit = 4
+            game.created_by = gamer
+            game.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        # By default related objects are ids
+        response = self.client.get("/games")
+        json_response = json.loads(response.content)
+        self.assertEqual(json_response[0]["createdBy"], 1)
+        self.assertEqual(json_response[0]["gametype"], 1)
+
+        response = self.client.get("/games?fields=id,name,eventCount")
+        json_response = json.loads(response.content)
+        self.assertEqual(set(json_response[0]), {"id", "name", "eventCount"})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/games?expand=createdBy,gametype")
+        json_response = json.loads(response.content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json_response[0]["createdBy"]["user"]["firstName"], "Steve")
+        self.assertNotIn("password", json_response[0]["createdBy"]["user"])
+        self.assertEqual(json_response[0]["gametype"]["label"], "Board game")
+        # the ETag aggregate and the games: the token, user and gamer are cached from the requests above
+        self.assertEqual(len(queries), 2)
+
+    def test_games_conditional_get(self):
+        """
+        Ensure an unchanged game list or game is answered with 304, and any change gives a new ETag
+        """
+        gamer = Gamer.objects.get(pk=1)
+        game = Game.objects.create(name="Clue", player_limit=6, gametype_id=1, created_by=gamer)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        response = self.client.get("/games")
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        # Only the ETag aggregate runs, no game is loaded
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/games", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(len(queries), 1)
+
+        # Another shape of the list is another ETag
+        response = self.client.get("/games?expand=createdBy", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(f"/games/{game.id}")
+        game_etag = response["ETag"]
+        response = self.client.get(f"/games/{game.id}", HTTP_IF_NONE_MATCH=game_etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Renaming the creator changes the expanded games
+        response = self.client.get("/games?expand=createdBy")
+        expanded_etag = response["ETag"]
+        gamer.user.first_name = "Stephen"
+        gamer.user.save()
+        response = self.client.get("/games?expand=createdBy", HTTP_IF_NONE_MATCH=expanded_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        game.name = "Cluedo"
+        game.save()
+        response = self.client.get(f"/games/{game.id}", HTTP_IF_NONE_MATCH=game_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)["name"], "Cluedo")
+
+        game.delete()
+        response = self.client.get("/games", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), [])
+
+    def test_games_batch(self):
+        """
+        Ensure a batch creates, updates and deletes games, reports each operation,
+        and applies nothing in atomic mode when one operation fails
+        """
+        gamer = Gamer.objects.get(pk=1)
+        kept = Game.objects.create(name="Clue", player_limit=6, gametype_id=1, created_by=gamer)
+        doomed = Game.objects.create(name="Sorry", player_limit=4, gametype_id=1, created_by=gamer)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        etag = self.client.get(f"/games/{kept.id}")["ETag"]
+
+        operations = [
+            {"op": "create", "name": "Monopoly", "playerLimit": 8, "gametypeId": 1},
+            {"op": "update", "id": kept.id, "name": "Cluedo", "playerLimit": 6, "gametypeId": 1},
+            {"op": "delete", "id": doomed.id},
+            {"op": "create", "name": "Risk", "playerLimit": 0, "gametypeId": 1},
+            {"op": "create", "name": "Uno", "playerLimit": 10, "gametypeId": 99},
+            {"op": "delete", "id": 999},
+            {"op": "rename", "id": kept.id},
+            {"op": "create", "name": "Catan", "playerLimit": 4, "gametypeId": 1},
+        ]
+
+        # Atomic: one failure and nothing is written
+        response = self.client.post("/games/batch", {"atomic": True, "operations": operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        results = json.loads(response.content)["results"]
+        self.assertEqual([result["result"] for result in results], [
+            "not_applied", "not_applied", "not_applied", "invalid", "invalid", "not_found", "invalid", "not_applied"])
+        self.assertEqual(Game.objects.count(), 2)
+
+        # Otherwise the valid operations are applied, with a few bulk queries
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/games/batch", {"operations": operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = json.loads(response.content)["results"]
+        self.assertEqual([result["result"] for result in results], [
+            "created", "updated", "deleted", "invalid", "invalid", "not_found", "invalid", "created"])
+        self.assertEqual(results[3]["message"], "playerLimit must be a positive whole number.")
+        self.assertLess(len(queries), 30)
+
+        self.assertEqual(
+            sorted(Game.objects.values_list("name", flat=True)), ["Catan", "Cluedo", "Monopoly"])
+        self.assertEqual(Game.objects.get(pk=results[0]["id"]).name, "Monopoly")
+        self.assertEqual(Game.objects.get(pk=results[7]["id"]).name, "Catan")
+
+        # bulk_update() skips auto_now and the signals: the ETag and the search index still follow
+        response = self.client.get(f"/games/{kept.id}", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get("/search?q=catan")
+        self.assertEqual([result["id"] for result in json.loads(response.content)["results"]], [results[7]["id"]])
+        response = self.client.get("/search?q=cluedo")
+        self.assertEqual(len(json.loads(response.content)["results"]), 1)
+
+        # The same game twice in a batch is refused
+        response = self.client.post("/games/batch", {"operations": [
+            {"op": "delete", "id": kept.id}, {"op": "delete", "id": kept.id},
+        ]}, format='json')
+        results = json.loads(response.content)["results"]
+        self.assertEqual([result["result"] for result in results], ["deleted", "invalid"])
+
+        response = self.client.post("/games/batch", {"operations": {}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stale_game_save_keeps_event_count(self):
+        """
+        Ensure saving a game loaded before an event was created doesn't write the old event count back
+        """
+        gamer = Gamer.objects.get(pk=1)
+        stale = Game.objects.create(name="Clue", player_limit=6, gametype_id=1, created_by=gamer)
+        Event.objects.create(name="Night", time="2021-04-20T08:00:00Z", host=gamer, game=stale,
+                             status=Status.objects.create(title="Open"))
+
+        stale.player_limit = 4
+        stale.save()
+        game = Game.objects.get(pk=stale.id)
+        self.assertEqual(game.player_limit, 4)
+        self.assertEqual(game.event_count, 1)
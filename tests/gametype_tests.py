@@ -0,0 +1,86 @@
+import json
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from levelupapi.lookups import gametype_lookup, status_lookup
+from levelupapi.models import Gametype, Status
+
+
+class GameTypeTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account and seed the game types
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        json_response = json.loads(response.content)
+        self.token = json_response["token"]
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        for label in ("Board game", "Card game"):
+            gametype = Gametype()
+            gametype.label = label
+            gametype.save()
+
+    def test_list_gametypes_from_cache(self):
+        """
+        Ensure a warm cache serves the game types without querying the table
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.client.get("/gameTypes")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/gameTypes")
+        json_response = json.loads(response.content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([gametype["label"] for gametype in json_response], ["Board game", "Card game"])
+        self.assertFalse(any("levelupapi_gametype" in query["sql"] for query in queries))
+
+    def test_list_gametypes_not_modified(self):
+        """
+        Ensure a client with a current ETag gets a 304, and a new one after a change
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        response = self.client.get("/gameTypes")
+        etag = response["ETag"]
+
+        response = self.client.get("/gameTypes", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        gametype = Gametype()
+        gametype.label = "Video game"
+        gametype.save()
+
+        response = self.client.get("/gameTypes", HTTP_IF_NONE_MATCH=etag)
+        json_response = json.loads(response.content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(json_response), 3)
+
+    def test_lookups_invalidated_on_commit(self):
+        """
+        Ensure rows cached while a change is being committed are dropped once it commits
+        """
+        for lookup, create in ((gametype_lookup, lambda: Gametype.objects.create(label="Dice game")),
+                               (status_lookup, lambda: Status.objects.create(title="Closed"))):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                create()
+                # Another request reading the table before the commit
+                lookup.all()
+            self.assertIsNotNone(lookup.cached())
+
+            for callback in callbacks:
+                callback()
+            self.assertIsNone(lookup.cached())
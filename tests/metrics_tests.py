@@ -0,0 +1,98 @@
+import json
+import re
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from levelupapi.metrics import registry
+from levelupapi.models import Gametype, Game, Gamer
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account and a game, with the metrics counted from zero
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = json.loads(response.content)["token"]
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        gametype = Gametype.objects.create(label="Board game")
+        Game.objects.create(name="Clue", player_limit=6, gametype=gametype, created_by=Gamer.objects.get(pk=1))
+        registry.reset()
+
+    def scrape(self):
+        """The samples of /metrics: 'name{labels}' -> value"""
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if line and not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_metrics_per_route(self):
+        """
+        Ensure requests are counted under their route name, with their queries and bytes
+        """
+        sizes = [len(self.client.get("/games").content) for _ in range(2)]
+        self.client.get("/games/1")
+        self.client.get("/games/999")
+        self.client.get("/nothing/here")
+
+        samples = self.scrape()
+        self.assertEqual(samples['levelup_http_requests_total{route="game-list",method="GET",status="200"}'], 2)
+        self.assertEqual(samples['levelup_http_requests_total{route="game-detail",method="GET",status="200"}'], 1)
+        self.assertEqual(samples['levelup_http_requests_total{route="game-detail",method="GET",status="404"}'], 1)
+        self.assertEqual(samples['levelup_http_requests_total{route="unmatched",method="GET",status="404"}'], 1)
+
+        self.assertEqual(samples['levelup_http_request_duration_seconds_count{route="game-list"}'], 2)
+        self.assertEqual(samples['levelup_http_request_duration_seconds_bucket{route="game-list",le="+Inf"}'], 2)
+        self.assertGreater(samples['levelup_http_request_duration_seconds_sum{route="game-list"}'], 0)
+        self.assertEqual(samples['levelup_http_response_bytes_total{route="game-list"}'], sum(sizes))
+        self.assertGreater(samples['levelup_db_queries_total{route="game-list"}'], 0)
+        self.assertGreater(samples['levelup_db_query_duration_seconds_total{route="game-list"}'], 0)
+
+        # The buckets are cumulative
+        buckets = [value for name, value in samples.items()
+                   if name.startswith('levelup_http_request_duration_seconds_bucket{route="game-detail"')]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 2)
+
+    async def test_metrics_of_async_views(self):
+        """
+        Ensure the async read views are counted under the same route names, queries included
+        """
+        response = await AsyncClient().get("/games", authorization='Token ' + self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.asgi_request.urlconf, 'levelup.urls_async')
+
+        samples = await sync_to_async(self.scrape)()
+        self.assertEqual(samples['levelup_http_requests_total{route="game-list",method="GET",status="200"}'], 1)
+        self.assertGreater(samples['levelup_db_queries_total{route="game-list"}'], 0)
+
+    def test_metrics_allowed_ips(self):
+        """
+        Ensure /metrics only answers the addresses in METRICS_ALLOWED_IPS
+        """
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.1']):
+            response = self.client.get("/metrics")
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.get("/metrics", REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(re.search(r'^# TYPE levelup_http_requests_total counter$',
+                                      response.content.decode(), re.M))
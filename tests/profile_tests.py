@@ -0,0 +1,114 @@
+import json
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from levelupapi.models import Gametype, Game, Gamer, Event, Status
+
+
+class ProfileTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account, and seed a game and a status for events
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = json.loads(response.content)["token"]
+        self.gamer = Gamer.objects.get(pk=1)
+
+        gametype = Gametype()
+        gametype.label = "Board game"
+        gametype.save()
+
+        self.game = Game()
+        self.game.gametype = gametype
+        self.game.name = "Clue"
+        self.game.player_limit = 100
+        self.game.created_by = self.gamer
+        self.game.save()
+
+        self.status = Status()
+        self.status.title = "Open for signing up"
+        self.status.save()
+
+    def create_events(self, count, join=False):
+        """Seed the database with `count` events hosted by the test gamer"""
+        for i in range(count):
+            event = Event()
+            event.name = f"Game night {i}"
+            event.time = "2021-04-20T08:00:00Z"
+            event.host = self.gamer
+            event.game = self.game
+            event.status = self.status
+            event.save()
+            if join:
+                event.signed_up_by.add(self.gamer)
+
+    def count_profile_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/profile")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    @override_settings(PROFILE_CACHE_TIMEOUT=0)
+    def test_profile_query_count(self):
+        """
+        Ensure the profile takes the same number of queries no matter how many events the gamer has
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        # the first request also caches the token
+        self.client.get("/profile")
+
+        self.create_events(1, join=True)
+        few = self.count_profile_queries()
+
+        self.create_events(10, join=True)
+        many = self.count_profile_queries()
+
+        self.assertEqual(few, many)
+
+        json_response = json.loads(self.client.get("/profile").content)
+        self.assertEqual(len(json_response["attendEvents"]), 11)
+        self.assertEqual(len(json_response["hostEvents"]), 11)
+        self.assertEqual(json_response["attendEvents"][0]["game"]["name"], "Clue")
+
+    @override_settings(PROFILE_CACHE_TIMEOUT=300)
+    def test_profile_cache_invalidated_by_signup(self):
+        """
+        Ensure the cached profile is dropped when the gamer joins an event
+        """
+        self.create_events(1)
+        event = Event.objects.first()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        json_response = json.loads(self.client.get("/profile").content)
+        self.assertEqual(len(json_response["attendEvents"]), 0)
+
+        response = self.client.post(f"/events/{event.id}/signup")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        json_response = json.loads(self.client.get("/profile").content)
+        self.assertEqual(len(json_response["attendEvents"]), 1)
+
+        # renaming the event shows up too
+        data = {
+            "name": "Murder mystery",
+            "time": "2021-05-01T19:00:00Z",
+            "gameId": self.game.id,
+            "statusId": self.status.id
+        }
+        self.client.put(f"/events/{event.id}", data, format="json")
+        json_response = json.loads(self.client.get("/profile").content)
+        self.assertEqual(json_response["attendEvents"][0]["name"], "Murder mystery")
@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import tempfile
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from levelupapi.authentication import token_cache
+from levelupapi.models import Gametype, Game, Gamer, Event, Status
+from levelupapi.profiling import Profile, query_budget
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account, with games and events to read
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = json.loads(response.content)["token"]
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        gamer = Gamer.objects.get(pk=1)
+        status_open = Status.objects.create(title="Open")
+        for i in range(8):
+            gametype = Gametype.objects.create(label=f"Type {i}")
+            game = Game.objects.create(name=f"Game {i}", player_limit=6, gametype=gametype, created_by=gamer)
+            event = Event.objects.create(name=f"Night {i}", time="2021-04-20T08:00:00Z",
+                                         host=gamer, game=game, status=status_open)
+            event.signed_up_by.add(gamer)
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_profile_report(self):
+        """
+        Ensure a request sent with X-Profile by a staff user gets its profile and queries written out
+        """
+        with override_settings(REQUEST_PROFILING_HEADER=True, REQUEST_PROFILING_DIR=self.directory):
+            # Anyone else's header is ignored
+            response = self.client.get("/games", HTTP_X_PROFILE="1")
+            self.assertNotIn("X-Profile-Report", response)
+            self.assertEqual(os.listdir(self.directory), [])
+
+            User.objects.filter(username="steve").update(is_staff=True)
+            token_cache.clear()
+            response = self.client.get("/games", HTTP_X_PROFILE="1")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("X-Profile-Report", self.client.get("/games"))
+
+        with open(os.path.join(self.directory, response["X-Profile-Report"])) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report["route"], "game-list")
+        self.assertEqual(report["status"], 200)
+        self.assertEqual(report["query_count"], len(report["queries"]))
+        self.assertGreater(report["query_count"], 0)
+        self.assertTrue(report["functions"])
+        self.assertEqual(report["repeated"], [])
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, report["profile"])))
+
+        # Without the setting the header does nothing
+        with override_settings(REQUEST_PROFILING_HEADER=False, REQUEST_PROFILING_DIR=self.directory):
+            response = self.client.get("/games", HTTP_X_PROFILE="1")
+        self.assertNotIn("X-Profile-Report", response)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_repeated_queries(self):
+        """
+        Ensure a query per row of a loop is reported with the line that makes it
+        """
+        with Profile(functions=False) as profile:
+            labels = [game.gametype.label for game in Game.objects.all()]
+        self.assertEqual(len(labels), 8)
+
+        repeated = profile.log.repeated()
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]["count"], 8)
+        self.assertIn("levelupapi_gametype", repeated[0]["sql"])
+        self.assertTrue(repeated[0]["where"].startswith("tests/profiling_tests.py:"), repeated[0]["where"])
+
+        with Profile(functions=False) as profile:
+            labels = [game.gametype.label for game in Game.objects.select_related("gametype")]
+        self.assertEqual(profile.log.repeated(), [])
+
+    def test_query_budget(self):
+        """
+        Ensure the read endpoints stay within a few queries however many rows they send back
+        """
+        with query_budget(6):
+            for url in ["/games", "/games/1", "/events", "/events/1", "/gameTypes", "/profile",
+                        "/events/changes", "/search?q=Game"]:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+
+        with self.assertRaisesRegex(AssertionError, r"GET /games: \d+ queries"):
+            with query_budget(0):
+                self.client.get("/games")
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from levelup.asgi import application
+from levelupapi.models import Gametype, Game, Gamer, Event, Status
+from levelupapi.push import Subscription, broker, publish_events
+
+
+class PushTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account, and seed an event to sign up for
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = json.loads(response.content)["token"]
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        gamer = Gamer.objects.get(pk=1)
+        game = Game.objects.create(name="Clue", player_limit=6,
+                                   gametype=Gametype.objects.create(label="Board game"), created_by=gamer)
+        self.event = Event.objects.create(name="Game night", time="2021-04-20T08:00:00Z", host=gamer,
+                                          game=game, status=Status.objects.create(title="Open"))
+
+    def open_stream(self, headers=None, query_string=b""):
+        """Start the ASGI app on /events/stream, returns (task, sent messages, disconnect)"""
+        sent = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        scope = {
+            "type": "http", "method": "GET", "path": "/events/stream",
+            "headers": headers if headers is not None else [(b"authorization", f"Token {self.token}".encode())],
+            "query_string": query_string,
+        }
+        task = asyncio.ensure_future(application(scope, receive, sent.put))
+        return task, sent, disconnected
+
+    def test_stream_pushes_changes(self):
+        """
+        Ensure a subscriber gets events as they are changed and signed up for
+        """
+        async def scenario():
+            task, sent, disconnect = self.open_stream()
+            start = await sent.get()
+            self.assertEqual(start["status"], 200)
+            self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+            self.assertEqual((await sent.get())["body"], b": connected\n\n")
+
+            def sign_up():
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(f"/events/{self.event.id}/signup")
+
+            def rename():
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.event.name = "Game night!"
+                    self.event.save()
+
+            # Each runs in the test's thread and transaction, like sync views do under ASGI.
+            # One at a time: messages about the same event that the client hasn't read yet
+            # are replaced by the newest
+            chunks = []
+            for change in (sign_up, rename):
+                await sync_to_async(change)()
+                chunks.append((await asyncio.wait_for(sent.get(), 1))["body"].decode())
+            disconnect.set()
+            await asyncio.wait_for(task, 1)
+            return chunks
+
+        chunks = async_to_sync(scenario)()
+
+        self.assertTrue(chunks[0].startswith("id: 1\nevent: event\ndata: "))
+        data = json.loads(chunks[0].split("data: ")[1])
+        self.assertEqual(data, {"action": "attendance", "id": self.event.id, "attendeeCount": 1, "playerLimit": 6})
+        self.assertEqual(json.loads(chunks[1].split("data: ")[1])["action"], "updated")
+        self.assertEqual(len(broker), 0)
+
+    def test_stream_requires_token(self):
+        """
+        Ensure the stream refuses requests without a valid token
+        """
+        async def scenario(headers, query_string=b""):
+            task, sent, _ = self.open_stream(headers, query_string)
+            await asyncio.wait_for(task, 1)
+            return (await sent.get())["status"]
+
+        self.assertEqual(async_to_sync(scenario)([]), 401)
+        self.assertEqual(async_to_sync(scenario)([(b"authorization", b"Token nope")]), 401)
+
+    def test_subscription_backpressure(self):
+        """
+        Ensure a slow subscriber keeps the newest message per event, and resyncs when too far behind
+        """
+        async def scenario():
+            subscription = Subscription(asyncio.get_running_loop(), limit=3)
+            subscription.offer(1, {"id": 1, "attendeeCount": 1})
+            subscription.offer(2, {"id": 2, "attendeeCount": 1})
+            subscription.offer(1, {"id": 1, "attendeeCount": 2})
+            received = [await subscription.get(), await subscription.get(), await subscription.get(0.01)]
+
+            for pk in range(5):
+                subscription.offer(pk, {"id": pk})
+            received += [await subscription.get(), await subscription.get(0.01)]
+            return received
+
+        self.assertEqual(async_to_sync(scenario)(), [
+            {"id": 2, "attendeeCount": 1}, {"id": 1, "attendeeCount": 2}, None,
+            {"type": "resync"}, None,
+        ])
+
+    def test_publish_reads_events_in_chunks(self):
+        """
+        Ensure announcing many events reads them a chunk at a time
+        """
+        for i in range(2):
+            Event.objects.create(name=f"Night {i}", time="2021-04-20T08:00:00Z", host=self.event.host,
+                                 game=self.event.game, status=self.event.status)
+        event_ids = list(Event.objects.order_by("id").values_list("id", flat=True))
+        backend = mock.Mock()
+
+        with mock.patch("levelupapi.push.PUBLISH_CHUNK", 2), CaptureQueriesContext(connection) as queries:
+            publish_events(backend, event_ids, "updated")
+
+        self.assertEqual(len(queries), 2)
+        messages = [call.args[0] for call in backend.publish.call_args_list]
+        self.assertEqual([message["id"] for message in messages], event_ids)
+        self.assertEqual({message["playerLimit"] for message in messages}, {6})
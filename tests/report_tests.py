@@ -0,0 +1,58 @@
+import json
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from levelupapi.models import Gametype, Game, Gamer
+
+
+class ReportTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account and seed a few games
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = json.loads(response.content)["token"]
+
+        gametype = Gametype()
+        gametype.label = "Board game"
+        gametype.save()
+
+        gamer = Gamer.objects.get(pk=1)
+        for name in ("Clue", "Monopoly", "Sorry"):
+            game = Game()
+            game.gametype = gametype
+            game.name = name
+            game.player_limit = 4
+            game.created_by = gamer
+            game.save()
+
+    def test_usergames_report(self):
+        """
+        Ensure the report streams every game under its creator in a single query
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/reports/usergames")
+            # The query runs as the response is sent
+            html = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertTrue(html.strip().startswith("<!DOCTYPE html>"))
+        self.assertTrue(html.endswith("</html>"))
+        self.assertIn("Steve Brownlee", html)
+        for name in ("Clue", "Monopoly", "Sorry"):
+            self.assertIn(f"Game Name: {name}", html)
+        self.assertEqual(len(queries), 1)
@@ -0,0 +1,143 @@
+import json
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.test import APITestCase
+from levelupapi.models import Gametype, Game, Gamer, Event, Status
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        """
+        Create a new account, and seed games and events to search
+        """
+        url = "/register"
+        data = {
+            "username": "steve",
+            "password": "Admin8*",
+            "email": "steve@stevebrownlee.com",
+            "address": "100 Infinity Way",
+            "phone_number": "555-1212",
+            "first_name": "Steve",
+            "last_name": "Brownlee",
+            "bio": "Love those gamez!!"
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = json.loads(response.content)["token"]
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.gamer = Gamer.objects.get(pk=1)
+
+        gametype = Gametype.objects.create(label="Board game")
+        self.status = Status.objects.create(title="Open for signing up")
+        self.monopoly = Game.objects.create(
+            name="Monopoly", player_limit=6, gametype=gametype, created_by=self.gamer)
+        self.clue = Game.objects.create(
+            name="Clue", player_limit=6, gametype=gametype, created_by=self.gamer)
+        self.event = Event.objects.create(
+            name="Monopoly marathon", time="2021-04-20T08:00:00Z",
+            host=self.gamer, game=self.clue, status=self.status)
+
+    def search(self, query):
+        response = self.client.get(f"/search?{query}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content)
+
+    def test_search_names_ranked(self):
+        """
+        Ensure games and events are found by name, the closest match first
+        """
+        json_response = self.search("q=monopoly")
+
+        self.assertEqual([(row["type"], row["id"]) for row in json_response["results"]],
+                         [("game", self.monopoly.id), ("event", self.event.id)])
+        self.assertEqual(json_response["results"][0]["host"], "Steve Brownlee")
+        self.assertIsNone(json_response["next"])
+
+        json_response = self.search("q=monopoly&type=event")
+        self.assertEqual([row["id"] for row in json_response["results"]], [self.event.id])
+
+    def test_search_host_names(self):
+        """
+        Ensure events and games are found by the name of the gamer behind them, also after a rename
+        """
+        self.assertEqual(len(self.search("q=brownlee")["results"]), 3)
+
+        user = User.objects.get(username="steve")
+        user.last_name = "Jobs"
+        user.save()
+
+        self.assertEqual(self.search("q=brownlee")["results"], [])
+        self.assertEqual(len(self.search("q=steve jobs")["results"]), 3)
+
+    def test_search_prefix(self):
+        """
+        Ensure typeahead matches the start of the last word only when asked
+        """
+        self.assertEqual(self.search("q=mono")["results"], [])
+        json_response = self.search("q=mono&prefix=true")
+        self.assertEqual(len(json_response["results"]), 2)
+
+        # FTS syntax in the query is treated as plain words
+        self.assertEqual(self.search('q="mono* OR"&prefix=true')["results"], [])
+
+    def test_search_follows_changes(self):
+        """
+        Ensure renamed and deleted games and events are reindexed
+        """
+        self.clue.name = "Cluedo"
+        self.clue.save()
+        self.assertEqual([row["id"] for row in self.search("q=cluedo")["results"]], [self.clue.id])
+
+        self.event.delete()
+        self.assertEqual([row["type"] for row in self.search("q=marathon")["results"]], [])
+
+    def test_search_follows_user_renames(self):
+        """
+        Ensure a renamed user's games and events are reindexed, and other user saves reindex nothing
+        """
+        user = User.objects.get(username="steve")
+        with mock.patch("levelupapi.search.reindex") as reindex:
+            user.set_password("Other8*")
+            user.save(update_fields=["password"])
+            user.email = "steve@example.com"
+            user.save()
+        reindex.assert_not_called()
+
+        user.last_name = "Wozniak"
+        user.save()
+        self.assertEqual([row["type"] for row in self.search("q=wozniak")["results"]], ["game", "game", "event"])
+
+    def test_search_pages(self):
+        """
+        Ensure results come a page at a time with a link to the next one
+        """
+        for i in range(3):
+            Event.objects.create(name=f"Clue night {i}", time="2021-04-20T08:00:00Z",
+                                 host=self.gamer, game=self.clue, status=self.status)
+
+        json_response = self.search("q=clue&limit=2")
+        self.assertEqual(len(json_response["results"]), 2)
+        self.assertIn("offset=2", json_response["next"])
+
+        json_response = self.search("q=clue&limit=2&offset=2")
+        self.assertEqual(len(json_response["results"]), 2)
+        self.assertIsNone(json_response["next"])
+
+        response = self.client.get("/search?q=clue&limit=none")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_index(self):
+        """
+        Ensure the command indexes rows written without signals
+        """
+        Game.objects.bulk_create([Game(name="Scrabble", player_limit=4,
+                                       gametype=self.clue.gametype, created_by=self.gamer)])
+        self.assertEqual(self.search("q=scrabble")["results"], [])
+
+        out = StringIO()
+        call_command("search_index", stdout=out)
+        self.assertIn("Indexed 4", out.getvalue())
+        self.assertEqual(len(self.search("q=scrabble")["results"]), 1)